@@ -0,0 +1,139 @@
+import datetime as dt
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from cache import cached_map
+from get_filepaths import FILEPATH_COLS, FILE_STAT_COLS
+from info_schema import set_info_dtypes
+
+# Columns added to the session info data frame by get_bdf_info
+BDF_INFO_COLS = ('bdf_start', 'bdf_end', 'bdf_n_channels', 'bdf_sample_rate')
+
+
+def read_bdf_header(path):
+    """
+    Reads the recording information from the header of a BDF (or EDF) file. Only the fixed 256-byte header and the
+    256-byte-per-signal headers are read, never the sample data.
+
+    :param path: The path to a BDF file.
+    :return: A dictionary containing the start date and time of the recording, its duration in seconds, the number of
+        channels (including the status channel), and the sample rate in Hz.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(256)
+        if len(header) < 256:
+            raise ValueError('Truncated BDF header: %s' % path)
+        n_signals = int(header[252:256])
+        signal_header = f.read(256 * n_signals)
+        if len(signal_header) < 256 * n_signals:
+            raise ValueError('Truncated BDF signal header: %s' % path)
+
+    # Start date (dd.mm.yy) and time (hh.mm.ss), using the EDF convention that years 85-99 are in the 1900s
+    day, month, year = (int(x) for x in header[168:176].split(b'.'))
+    hour, minute, second = (int(x) for x in header[176:184].split(b'.'))
+    year += 1900 if year >= 85 else 2000
+    start = dt.datetime(year, month, day, hour, minute, second)
+
+    # The number of samples per data record is stored for each signal after the first 216 bytes of signal headers
+    n_records = int(header[236:244])
+    record_duration = float(header[244:252])
+    offset = 216 * n_signals
+    samples_per_record = [int(signal_header[offset + 8 * i: offset + 8 * (i + 1)]) for i in range(n_signals)]
+
+    return dict(
+        start=start,
+        duration=n_records * record_duration,
+        n_channels=n_signals,
+        sample_rate=max(samples_per_record) / record_duration
+    )
+
+
+def read_bdf_headers(files, n_workers=1, cache_dir=None):
+    """
+    Reads the headers of many BDF files in parallel. Results are cached by each file's path, size, and modification
+    time, so unchanged files are never opened again.
+
+    :param files: A list of (path, size, mtime) tuples, e.g. taken from the data file columns added by get_filepaths.
+    :param n_workers: The number of files to read concurrently (Default=1).
+    :param cache_dir: The path to a local cache of BDF headers (Default=None, i.e. always read the files).
+    :return: A dictionary mapping each (path, size, mtime) tuple to the header information from read_bdf_header, or to
+        None if the header could not be read.
+    """
+    with ThreadPoolExecutor(max_workers=max(n_workers, 1)) as pool:
+        return cached_map(_try_read_bdf_header, files, cache_dir, 'bdf_headers', pool)
+
+
+def get_bdf_info(info, n_workers=1, cache_dir=None):
+    """
+    Reads the header of every BDF file found by get_filepaths, and adds each session's recording start and end time,
+    channel count, and sample rate to the data frame. For sessions with multiple BDF files, the recording is taken to
+    run from the start of the earliest file to the end of the latest one.
+
+    :param info: Data frame containing one row for each session's information, including data file paths.
+    :param n_workers: The number of files to read concurrently (Default=1).
+    :param cache_dir: The path to a local cache of BDF headers (Default=None, i.e. always read the files).
+    :return: The session info data frame with recording information added.
+    """
+    # Collect each session's BDF files along with their sizes and modification times
+    files = []
+    for n in range(4):
+        path, size, mtime = info[FILEPATH_COLS[2 * n]], info[FILE_STAT_COLS[2 * n]], info[FILE_STAT_COLS[2 * n + 1]]
+        is_bdf = path.fillna('').str.endswith('.bdf').to_numpy()
+        files.extend(zip(info.index[is_bdf], zip(path[is_bdf], size[is_bdf], mtime[is_bdf])))
+
+    # Read all headers and organize them into a table with one row per file
+    headers = read_bdf_headers([f[1] for f in files], n_workers=n_workers, cache_dir=cache_dir)
+    rows = [dict(row=i, **headers[f]) for i, f in files if headers[f] is not None]
+    headers = pd.DataFrame(rows, columns=['row', 'start', 'duration', 'n_channels', 'sample_rate'])
+    headers['start'] = pd.to_datetime(headers.start)
+    headers['end'] = headers.start + pd.to_timedelta(headers.duration, unit='s')
+
+    # Combine each session's files and add the results to the data frame
+    sess = headers.groupby('row').agg(bdf_start=('start', 'min'), bdf_end=('end', 'max'),
+                                      bdf_n_channels=('n_channels', 'max'), bdf_sample_rate=('sample_rate', 'max'))
+    sess = set_info_dtypes(sess.reindex(info.index))
+    for col in BDF_INFO_COLS:
+        info[col] = sess[col]
+
+    return info
+
+
+def check_recording_times(info, tolerance=10):
+    """
+    Compares the recording start and end times stored in the session info (from CMLDB) with those read from the BDF
+    headers by get_bdf_info, and prints every session where they differ by more than the given tolerance. Sessions
+    without a BDF file or without a readable CMLDB time are not checked.
+
+    :param info: Data frame containing one row for each session's information, including BDF recording information.
+    :param tolerance: The largest allowed difference between the two sources, in minutes (Default=10).
+    :return: A data frame listing the sessions with mismatched times.
+    """
+    tolerance = pd.Timedelta(minutes=tolerance)
+    start_diff = (info.bdf_start - info.session_start).abs()
+    end_diff = (info.bdf_end - info.session_end).abs()
+    mismatch = ((start_diff > tolerance) | (end_diff > tolerance)).to_numpy()
+
+    mismatches = info.loc[mismatch, ['subject', 'experiment', 'session', 'date', 'start_time', 'end_time',
+                                     'bdf_start', 'bdf_end']]
+    for _, sess in mismatches.iterrows():
+        print('Recording time mismatch: %s %s session %s (CMLDB %s %s-%s, BDF %s to %s)' %
+              (sess.subject, sess.experiment, sess.session, sess.date.strftime('%m/%d/%Y'), sess.start_time,
+               sess.end_time, sess.bdf_start, sess.bdf_end))
+    n_missing = int(np.sum(info.bdf_start.isna() & info[FILEPATH_COLS[0]].fillna('').str.endswith('.bdf')))
+    if n_missing > 0:
+        print('Warning: Could not read the BDF header for %s sessions' % n_missing)
+
+    return mismatches
+
+
+def _try_read_bdf_header(file):
+    """
+    Reads the BDF header of a (path, size, mtime) tuple's file, returning None and printing a warning if the file cannot
+    be read or parsed.
+    """
+    path = file[0]
+    try:
+        return read_bdf_header(path)
+    except (OSError, ValueError) as e:
+        print('Warning: Could not read BDF header of %s (%s)' % (path, e))
+        return None
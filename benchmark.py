@@ -0,0 +1,133 @@
+import os
+import time
+import shutil
+import tempfile
+import datetime as dt
+import pandas as pd
+from contextlib import contextmanager
+from get_info import get_info
+from get_extra_info import get_extra_info
+from get_filepaths import get_filepaths
+from fill_info import fill_info
+from write_info import write_info
+from synthetic_data import make_synthetic_tree
+from instrumentation import patch_fs_calls
+
+#####
+# SETTINGS
+#####
+scales = (1, 10, 100)  # Sizes of the synthetic trees to benchmark, in multiples of a typical semester
+latency = 0.  # Seconds of delay added to every file system call, to simulate the Rhino mount (0 for none)
+n_workers = 16  # Number of sessions to look up concurrently in get_filepaths
+repeats = 3  # Number of times to run each stage (the fastest run is reported)
+bdf_size = 1048576  # Size of each synthetic BDF file in bytes
+bench_dir = None  # Directory in which to build the synthetic trees (None to use a temporary directory)
+keep_trees = False  # If True, leave the synthetic trees in bench_dir after benchmarking
+date_range_start = dt.date(year=2023, month=3, day=1)  # Earliest session date to include (inclusive)
+date_range_end = dt.date(year=2023, month=8, day=1)  # Latest session date to include (inclusive)
+
+# Stages of the pipeline, in the order they are run
+STAGES = ('get_info', 'get_extra_info', 'get_filepaths', 'fill_info', 'write_info')
+
+
+def run_stages(paths, out_dir, n_workers=1):
+    """
+    Runs each stage of the pipeline once on a synthetic tree, timing each one separately. Caches are not used, so every
+    stage reads from the tree.
+
+    :param paths: A dictionary of paths to the synthetic tree, as returned by make_synthetic_tree.
+    :param out_dir: The directory in which to write the spreadsheets. Must not be the directory containing the tree's
+        spreadsheet templates, which would be overwritten.
+    :param n_workers: The number of sessions to look up concurrently in get_filepaths (Default=1).
+    :return: A dictionary mapping each stage name to its wall time in seconds, and a count of the sessions processed.
+    """
+    times = dict()
+    ed = pd.read_csv(paths['eeg_details_path'], header=1, nrows=0)
+    esf = pd.read_csv(paths['eeg_sub_files_path'], header=1, nrows=0)
+
+    t = time.perf_counter()
+    info = get_info(date_range_start, date_range_end, ltp_path=paths['ltp_path'])
+    times['get_info'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    info = get_extra_info(info, paths['extra_info_path'])
+    times['get_extra_info'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    info = get_filepaths(info, ltp_path=paths['ltp_path'], protocols_path=paths['protocols_path'], n_workers=n_workers)
+    times['get_filepaths'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    ed_filled, esf_filled = fill_info(ed, esf, info)
+    times['fill_info'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    write_info(ed_filled, os.path.join(out_dir, 'eeg_details01.csv'), ed.columns,
+               esf_filled, os.path.join(out_dir, 'eeg_sub_files01.csv'), esf.columns)
+    times['write_info'] = time.perf_counter() - t
+
+    return times, len(info)
+
+
+@contextmanager
+def inject_latency(seconds):
+    """
+    Context manager that adds a fixed delay to every low-level file system call (stat, scandir, listdir, and open; see
+    instrumentation.patch_fs_calls), to simulate a slow network mount. Functions built on these, such as glob.glob and
+    os.path.exists, are slowed down accordingly. Has no effect if seconds is 0.
+
+    :param seconds: The delay to add to each call, in seconds.
+    :return: None
+    """
+    if seconds <= 0:
+        yield
+        return
+
+    def delay(kind):
+        if kind not in ('glob', 'exists'):
+            time.sleep(seconds)
+
+    with patch_fs_calls(delay):
+        yield
+
+
+#####
+# BENCHMARK
+#####
+if __name__ == "__main__":
+
+    root = tempfile.mkdtemp(prefix='nimh_benchmark_') if bench_dir is None else os.path.expanduser(bench_dir)
+    results = []
+    try:
+        for scale in scales:
+            # Build the synthetic tree for this scale
+            tree_dir = os.path.join(root, 'scale_%s' % scale)
+            t = time.perf_counter()
+            paths = make_synthetic_tree(tree_dir, scale=scale, start_date=date_range_start, end_date=date_range_end,
+                                        bdf_size=bdf_size)
+            n_files = sum(len(files) for _, _, files in os.walk(tree_dir))
+            print('Built %sx tree (%s files) in %.1f s' % (scale, n_files, time.perf_counter() - t))
+
+            # Write the spreadsheets apart from the tree's templates, which every repeat reads again
+            out_dir = os.path.join(tree_dir, 'out')
+            os.makedirs(out_dir, exist_ok=True)
+
+            # Run every stage several times and keep each stage's fastest run
+            best = dict()
+            with inject_latency(latency):
+                for _ in range(repeats):
+                    times, n_sessions = run_stages(paths, out_dir, n_workers=n_workers)
+                    for stage in STAGES:
+                        best[stage] = min(best.get(stage, float('inf')), times[stage])
+            results.append(dict(scale=scale, sessions=n_sessions, latency_ms=latency * 1000, **best))
+
+            if not keep_trees:
+                shutil.rmtree(tree_dir)
+    finally:
+        if bench_dir is None and not keep_trees:
+            shutil.rmtree(root, ignore_errors=True)
+
+    # Report the time taken by each stage at each scale
+    results = pd.DataFrame(results, columns=['scale', 'sessions', 'latency_ms'] + list(STAGES))
+    results['total'] = results[list(STAGES)].sum(axis=1)
+    print(results.to_string(index=False, float_format=lambda x: '%.3f' % x))
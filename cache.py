@@ -0,0 +1,209 @@
+import os
+import time
+import pickle
+import shutil
+import hashlib
+import pandas as pd
+from contextlib import contextmanager
+
+# Seconds between writes of held cache entries to disk (see hold_cache_writes)
+FLUSH_INTERVAL = 300
+
+# Cache entries kept in memory while hold_cache_writes is active: the entries by path, the paths of entries that have
+# not been written to disk yet, and the time of the last write
+_held = None
+
+
+def file_signature(path):
+    """
+    Identifies the current version of a file by its absolute path, size, and modification time. Cache entries that
+    include a file's signature in their key are automatically invalidated when the file changes.
+
+    :param path: The path to a file.
+    :return: An (absolute path, size in bytes, mtime in nanoseconds) tuple.
+    """
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+def load_cached(cache_dir, key, default=None):
+    """
+    Loads an object from the cache, and marks it as recently used.
+
+    :param cache_dir: The path to the cache directory.
+    :param key: Any object with a stable repr (e.g. a tuple of strings and numbers) identifying the cache entry.
+    :param default: The value to return if the entry is not in the cache (Default=None).
+    :return: The cached object, or the default value if the entry does not exist or cannot be read.
+    """
+    path = _entry_path(cache_dir, key)
+    if _held is not None and path in _held['entries']:
+        return _held['entries'][path]
+    try:
+        with open(path, 'rb') as f:
+            obj = pickle.load(f)
+        os.utime(path)
+    except Exception:  # Missing, partially written, or written by an incompatible version of pandas
+        return default
+    if _held is not None:
+        _held['entries'][path] = obj
+
+    return obj
+
+
+def save_cached(cache_dir, key, obj):
+    """
+    Saves an object to the cache. The entry is written to a temporary file and then moved into place, so that an
+    interrupted run never leaves a corrupt entry behind. While hold_cache_writes is active, the entry is only kept in
+    memory, and written to disk later.
+
+    :param cache_dir: The path to the cache directory.
+    :param key: Any object with a stable repr (e.g. a tuple of strings and numbers) identifying the cache entry.
+    :param obj: The object to save. Must be picklable.
+    :return: None
+    """
+    path = _entry_path(cache_dir, key)
+    if _held is None:
+        _write_entry(path, obj)
+        return
+    _held['entries'][path] = obj
+    _held['dirty'].add(path)
+    if time.time() - _held['flushed'] > _held['interval']:
+        _flush_held()
+
+
+@contextmanager
+def hold_cache_writes(flush_interval=FLUSH_INTERVAL):
+    """
+    Context manager that keeps cache entries in memory while it is active. Each entry is read from disk at most once,
+    and saved entries are written to disk at most once every flush_interval seconds, and when the context exits (even
+    if it exits with an error). This keeps the cost of functions that load and save the same large entry on every call
+    (e.g. once for each chunk of sessions) from growing with the number of calls.
+
+    :param flush_interval: The number of seconds between writes of saved entries to disk (Default=300).
+    :return: None
+    """
+    global _held
+    if _held is not None:  # Already holding writes
+        yield
+        return
+    _held = dict(entries={}, dirty=set(), flushed=time.time(), interval=flush_interval)
+    try:
+        yield
+    finally:
+        try:
+            _flush_held()
+        finally:
+            _held = None
+
+
+def evict_cache(cache_dir, max_size):
+    """
+    Deletes the least recently used cache entries until the total size of the cache is at most max_size bytes.
+
+    :param cache_dir: The path to the cache directory.
+    :param max_size: The maximum total size of the cache in bytes.
+    :return: None
+    """
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith('.pkl'):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    total_size = sum(e[1] for e in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        os.remove(path)
+        total_size -= size
+
+
+def clear_cache(cache_dir):
+    """
+    Deletes the cache directory and everything in it.
+
+    :param cache_dir: The path to the cache directory.
+    :return: None
+    """
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def read_csv_cached(path, cache_dir=None, **kwargs):
+    """
+    Drop-in replacement for pd.read_csv that keeps a parsed copy of each file in a local cache. The cached copy is used
+    as long as the file's path, size, and modification time are unchanged and the same read options are given.
+
+    :param path: The path to the CSV file.
+    :param cache_dir: The path to the cache directory (Default=None, i.e. bypass the cache and always read the file).
+    :param kwargs: Keyword arguments passed on to pd.read_csv.
+    :return: A data frame containing the file's contents.
+    """
+    if cache_dir is None:
+        return pd.read_csv(path, **kwargs)
+
+    key = ('read_csv', file_signature(path), sorted(kwargs.items()))
+    data = load_cached(cache_dir, key)
+    if data is None:
+        data = pd.read_csv(path, **kwargs)
+        save_cached(cache_dir, key, data)
+
+    return data.copy()  # Callers may modify the data frame, and held cache entries are shared between calls
+
+
+def cached_map(func, keys, cache_dir, name, pool, chunksize=1, save_every=None):
+    """
+    Applies a function to each of the given keys in a pool of workers, keeping the results in a single cache entry.
+    Keys whose results are already cached are not computed again. Results of None (e.g. for a file that could not be
+    read) are not cached, so that they are computed again on the next run.
+
+    :param func: The function to apply to each key. Must be picklable if the pool is a process pool.
+    :param keys: A list of hashable keys, e.g. (path, size, mtime) tuples from file_signature.
+    :param cache_dir: The path to the cache directory (None to compute every result).
+    :param name: The key of the cache entry that holds the results.
+    :param pool: A concurrent.futures executor in which to compute the results.
+    :param chunksize: The number of keys sent to a worker process at a time (Default=1).
+    :param save_every: The number of results after which the cache entry is saved again, so that an interrupted run
+        does not need to start over (Default=None, i.e. only save once all results are computed).
+    :return: A dictionary mapping each key to its result.
+    """
+    cache = {} if cache_dir is None else load_cached(cache_dir, name, {})
+    todo = [k for k in set(keys) if k not in cache]
+    for i, (key, result) in enumerate(zip(todo, pool.map(func, todo, chunksize=chunksize))):
+        if result is not None:
+            cache[key] = result
+        if cache_dir is not None and save_every is not None and (i + 1) % save_every == 0:
+            save_cached(cache_dir, name, cache)
+    if cache_dir is not None and len(todo) > 0:
+        save_cached(cache_dir, name, cache)
+
+    return {k: cache.get(k) for k in keys}
+
+
+def _write_entry(path, obj):
+    """
+    Writes a cache entry to a temporary file and moves it into place.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = '%s.%s.tmp' % (path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def _flush_held():
+    """
+    Writes the held cache entries that have changed since they were last written.
+    """
+    for path in sorted(_held['dirty']):
+        _write_entry(path, _held['entries'][path])
+    _held['dirty'].clear()
+    _held['flushed'] = time.time()
+
+
+def _entry_path(cache_dir, key):
+    """
+    Returns the path of the file that stores a given cache entry.
+    """
+    return os.path.join(cache_dir, hashlib.sha1(repr(key).encode()).hexdigest() + '.pkl')
@@ -0,0 +1,95 @@
+import os
+import time
+import hashlib
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from cache import cached_map, file_signature
+from get_filepaths import list_data_files
+
+# Hash algorithms included in the checksum manifest
+HASH_ALGORITHMS = ('md5', 'sha256')
+
+# Number of bytes read from a file at a time while hashing
+CHUNK_SIZE = 8 * 1048576
+
+
+def hash_file(path, algorithms=HASH_ALGORITHMS, chunk_size=CHUNK_SIZE):
+    """
+    Computes checksums of a file, reading it in fixed-size chunks so that memory use does not depend on file size. All
+    checksums are computed in a single pass through the file.
+
+    :param path: The path to a file.
+    :param algorithms: The names of the hashlib algorithms to use (Default=('md5', 'sha256')).
+    :param chunk_size: The number of bytes to read at a time (Default=8 MB).
+    :return: A dictionary mapping each algorithm name to the file's hex digest.
+    """
+    hashes = [hashlib.new(a) for a in algorithms]
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            for h in hashes:
+                h.update(view[:n])
+
+    return {a: h.hexdigest() for a, h in zip(algorithms, hashes)}
+
+
+def hash_files(files, n_workers=1, cache_dir=None):
+    """
+    Computes checksums of many files in parallel. hashlib releases the GIL while hashing, so a pool of threads can keep
+    several reads from Rhino in flight at once while hashing on multiple cores. Results are cached by each file's path,
+    size, and modification time, so unchanged files are never hashed twice.
+
+    :param files: A list of (path, size, mtime) tuples, as returned by cache.file_signature.
+    :param n_workers: The number of files to hash concurrently (Default=1).
+    :param cache_dir: The path to a local cache of checksums (Default=None, i.e. always hash every file).
+    :return: A dictionary mapping each (path, size, mtime) tuple to a dictionary of checksums.
+    """
+    hashed = []  # Files that were not in the cache
+
+    def hash_uncached(f):
+        hashed.append(f)
+        return hash_file(f[0])
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max(n_workers, 1)) as pool:  # Progress is saved every 100 files
+        hashes = cached_map(hash_uncached, files, cache_dir, 'checksums', pool, save_every=100)
+    elapsed = time.time() - start
+
+    n_bytes = sum(f[1] for f in hashed)
+    print('Checksums: %s files hashed (%.2f GB in %.1f s, %.1f MB/s), %s files cached' %
+          (len(hashed), n_bytes / 1073741824., elapsed, n_bytes / 1048576. / max(elapsed, 1e-9),
+           len(set(files)) - len(hashed)))
+
+    return hashes
+
+
+def write_checksums(info, checksums_path, n_workers=1, cache_dir=None):
+    """
+    Computes checksums of every data file found by get_filepaths, and writes them to a CSV file with one row per data
+    file. Each file is stat'd again rather than trusting the sizes and modification times in info, so that the cached
+    checksums of a file that was rewritten since its session was resolved are never reused.
+
+    :param info: Data frame containing one row for each session's information, including data file paths.
+    :param checksums_path: The path at which to save the checksum manifest.
+    :param n_workers: The number of files to hash concurrently (Default=1).
+    :param cache_dir: The path to a local cache of checksums (Default=None, i.e. always hash every file).
+    :return: A data frame containing the checksum manifest.
+    """
+    files = list_data_files(info).reset_index(drop=True)
+    with ThreadPoolExecutor(max_workers=max(n_workers, 1)) as pool:
+        keys = list(pool.map(file_signature, files.data_file))
+    files['size'] = pd.array([k[1] for k in keys], dtype='Int64')
+    hashes = hash_files(keys, n_workers=n_workers, cache_dir=cache_dir)
+    for a in HASH_ALGORITHMS:
+        files[a] = [hashes[k][a] for k in keys]
+    files = files.drop(columns='mtime')
+
+    tmp_path = checksums_path + '.tmp'
+    files.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, checksums_path)
+
+    return files
@@ -0,0 +1,193 @@
+import os
+import fnmatch
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+# Per-thread record of the directories looked up through the index (see record_dir_access)
+_local = threading.local()
+
+# Lock held while adding directories to an index, since worker threads list directories on demand (see list_dir)
+_index_lock = threading.Lock()
+
+
+def build_dir_index(roots, n_workers=1, index=None):
+    """
+    Walks each of the given directory trees once using scandir and records the name, size, and modification time of
+    every entry in memory. The resulting index can be used in place of glob, os.path.exists, and os.path.getsize calls
+    (see index_glob, index_exists, and index_getsize), which turns many small metadata requests to Rhino into a few
+    directory listings. Roots that do not exist are recorded as empty directories. Like os.walk, the walk does not
+    descend into symbolic links to directories (so links that point back up the tree cannot make it loop forever), but
+    they are recorded as directories and are listed on demand if looked up.
+
+    :param roots: A list of paths to the directories that should be indexed.
+    :param n_workers: The number of directory trees to walk concurrently (Default=1).
+    :param index: An existing index to add the new directories to (Default=None, i.e. create a new index).
+    :return: A dictionary mapping each directory path to a dictionary that maps the names of the directory's entries to
+        (is_dir, size, mtime_ns) tuples.
+    """
+    index = {} if index is None else index
+    roots = [os.path.normpath(r) for r in roots]
+    if n_workers > 1:
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            for listing in pool.map(walk_dir, roots):
+                with _index_lock:
+                    index.update(listing)
+    else:
+        for root in roots:
+            listing = walk_dir(root)
+            with _index_lock:
+                index.update(listing)
+
+    return index
+
+
+def list_dir(index, dirpath):
+    """
+    Returns the index entry for a directory. Directories that have not been indexed yet are listed on demand and added
+    to the index. Safe to call from several threads sharing the same index.
+
+    :param index: A directory index created by build_dir_index.
+    :param dirpath: The path to a directory.
+    :return: A dictionary mapping the names of the directory's entries to (is_dir, size, mtime_ns) tuples.
+    """
+    dirpath = os.path.normpath(dirpath)
+    accessed = getattr(_local, 'accessed', None)
+    if accessed is not None:
+        accessed.add(dirpath)
+    entries = index.get(dirpath)
+    if entries is None:
+        entries = _scan(dirpath)[0]
+        with _index_lock:  # If another thread listed the directory in the meantime, keep its listing
+            entries = index.setdefault(dirpath, entries)
+    return entries
+
+
+def index_glob(index, dirpath, pattern):
+    """
+    Index-based equivalent of glob.glob(os.path.join(dirpath, pattern)), for patterns that only match file names.
+
+    :param index: A directory index created by build_dir_index.
+    :param dirpath: The path to the directory to search.
+    :param pattern: A shell-style wildcard pattern, e.g. '*.bdf'.
+    :return: A list of paths to matching files, in directory listing order.
+    """
+    hidden = pattern.startswith('.')  # Like glob, only match hidden files if the pattern asks for them
+    return [os.path.join(dirpath, name) for name, entry in list_dir(index, dirpath).items()
+            if not entry[0] and (hidden or not name.startswith('.')) and fnmatch.fnmatchcase(name, pattern)]
+
+
+def index_exists(index, path):
+    """
+    Index-based equivalent of os.path.exists.
+
+    :param index: A directory index created by build_dir_index.
+    :param path: The path to a file or directory.
+    :return: True if the path exists, otherwise False.
+    """
+    dirpath, name = os.path.split(os.path.normpath(path))
+    return name in list_dir(index, dirpath)
+
+
+def index_getsize(index, path):
+    """
+    Index-based equivalent of os.path.getsize.
+
+    :param index: A directory index created by build_dir_index.
+    :param path: The path to a file.
+    :return: The size of the file in bytes.
+    """
+    return index_stat(index, path)[1]
+
+
+def index_stat(index, path):
+    """
+    Looks up the index entry of a single file or directory.
+
+    :param index: A directory index created by build_dir_index.
+    :param path: The path to a file or directory.
+    :return: An (is_dir, size, mtime_ns) tuple.
+    """
+    dirpath, name = os.path.split(os.path.normpath(path))
+    entries = list_dir(index, dirpath)
+    if name not in entries:
+        raise FileNotFoundError('No such file or directory: %s' % path)
+    return entries[name]
+
+
+def dir_mtime(index, dirpath):
+    """
+    Finds the modification time of a directory, using its parent directory's index entry if available and otherwise
+    checking the file system.
+
+    :param index: A directory index created by build_dir_index.
+    :param dirpath: The path to a directory.
+    :return: The directory's modification time in nanoseconds, or None if it does not exist.
+    """
+    parent, name = os.path.split(os.path.normpath(dirpath))
+    if parent in index:
+        entry = index[parent].get(name)
+        return None if entry is None else entry[2]
+    try:
+        return os.stat(dirpath).st_mtime_ns
+    except OSError:
+        return None
+
+
+def walk_dir(root):
+    """
+    Lists a directory and all of its subdirectories, without following symbolic links to directories (see
+    build_dir_index). Errors other than the directory not existing are raised, so that the caller can retry the walk.
+
+    :param root: The path to the directory to list.
+    :return: A dictionary in the same format as a directory index, containing the directory and its subdirectories.
+    """
+    listing = {}
+    pending = [os.path.normpath(root)]
+    while len(pending) > 0:
+        dirpath = pending.pop()
+        listing[dirpath], subdirs = _scan(dirpath)
+        pending.extend(os.path.join(dirpath, d) for d in subdirs)
+
+    return listing
+
+
+@contextmanager
+def record_dir_access():
+    """
+    Context manager that records which directories are looked up through any directory index by the current thread. Used
+    to find out which directories a session's files were resolved from.
+
+    :return: A set that is filled with the normalized paths of the directories that were looked up.
+    """
+    accessed = set()
+    _local.accessed = accessed
+    try:
+        yield accessed
+    finally:
+        _local.accessed = None
+
+
+def _scan(dirpath):
+    """
+    Lists a single directory, returning its entries and the names of its subdirectories, not counting symbolic links to
+    directories. Missing directories are treated as empty, and entries that disappear while listing (or are broken
+    symlinks) are left out. Other errors (e.g. EIO or ESTALE from the Rhino mount) are raised.
+    """
+    entries = {}
+    subdirs = []
+    try:
+        with os.scandir(dirpath) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                    st = entry.stat()
+                except FileNotFoundError:  # Broken symlink or entry removed while listing
+                    continue
+                entries[entry.name] = (is_dir, st.st_size, st.st_mtime_ns)
+                if is_dir and not entry.is_symlink():
+                    subdirs.append(entry.name)
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+
+    return entries, subdirs
@@ -0,0 +1,133 @@
+import os
+import hashlib
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from cache import cached_map
+from checksums import hash_files
+from get_filepaths import LAYOUTS, list_data_files
+
+# Number of bytes hashed from the start and from the end of each file when comparing files of the same size
+BLOCK_SIZE = 65536
+
+# Columns of the duplicate report, which has one row for each listing of a duplicated data file
+DUPLICATE_COLS = ('group', 'kind', 'subject', 'experiment', 'session', 'file_num', 'data_file', 'data_file_type',
+                  'size', 'sha256')
+
+
+def partial_hash(path, size, block_size=BLOCK_SIZE):
+    """
+    Computes a SHA-256 hash of the first and last blocks of a file. Files of the same size whose partial hashes differ
+    cannot be identical, so this rules out most candidates for duplicates without reading whole files. Files no larger
+    than two blocks are hashed in full.
+
+    :param path: The path to a file.
+    :param size: The size of the file in bytes.
+    :param block_size: The number of bytes to hash from each end of the file (Default=64 KB).
+    :return: The hex digest of the hash.
+    """
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        h.update(f.read(block_size))
+        if size > block_size:
+            f.seek(max(size - block_size, block_size))
+            h.update(f.read(block_size))
+
+    return h.hexdigest()
+
+
+def partial_hashes(files, n_workers=1, cache_dir=None):
+    """
+    Computes partial hashes of many files in parallel, caching them by each file's path, size, and modification time.
+
+    :param files: A list of (path, size, mtime) tuples, e.g. taken from the data file columns added by get_filepaths.
+    :param n_workers: The number of files to hash concurrently (Default=1).
+    :param cache_dir: The path to a local cache of partial hashes (Default=None, i.e. always hash every file).
+    :return: A dictionary mapping each (path, size, mtime) tuple to its partial hash.
+    """
+    with ThreadPoolExecutor(max_workers=max(n_workers, 1)) as pool:
+        return cached_map(lambda f: partial_hash(f[0], int(f[1])), files, cache_dir, 'partial_hashes', pool)
+
+
+def find_duplicate_files(info, ltp_path='/data/eeg/scalp/ltp/', n_workers=1, cache_dir=None, checksum_cache_dir=None):
+    """
+    Looks for data files that would be submitted more than once: the same path listed by more than one session, and
+    different paths with identical contents (e.g. a recording copied into two sessions' folders). Subject-level files
+    that a layout deliberately shares between all of a subject's sessions (see LAYOUTS) are not reported.
+
+    To keep the check cheap, only files of the same size are compared, and only the first and last blocks of each are
+    hashed at first. Files are only hashed in full if their partial hashes match as well. Full hashes are shared with
+    the checksum cache, so files that already have checksums are never read again.
+
+    :param info: Data frame containing one row for each session's information, including data file paths and sizes.
+    :param ltp_path: The path to the ltp data directory on Rhino, used to identify shared subject-level files.
+    :param n_workers: The number of files to hash concurrently (Default=1).
+    :param cache_dir: The path to a local cache of partial hashes (Default=None, i.e. always hash every file).
+    :param checksum_cache_dir: The path to the local cache of checksums (Default=None, i.e. always hash every file).
+    :return: A data frame with one row for each listing of a duplicated file, numbered by group of duplicates, with the
+        kind of duplicate ('same path' or 'same content') and the SHA-256 hash of files with the same content.
+    """
+    files = list_data_files(info).reset_index(drop=True)
+    files = files[files['size'].notna()].reset_index(drop=True)
+
+    # Paths listed by more than one session, other than the subject-level files shared by design
+    listed = files.groupby('data_file').data_file.transform('size') > 1
+    shared = _shared_paths(files, ltp_path)
+    one_subject = files.groupby('data_file').subject.transform('nunique') == 1
+    same_path = files[listed & ~(files.data_file.map(os.path.normpath).isin(shared) & one_subject)]
+    same_path = same_path.assign(kind='same path', sha256='', key=same_path.data_file)
+
+    # Distinct non-empty paths with the same size, then the same partial hash, then the same full hash
+    paths = files.drop_duplicates('data_file')
+    paths = paths[(paths['size'] > 0) & paths['size'].duplicated(keep=False)]
+    keys = list(zip(paths.data_file, paths['size'], paths.mtime))
+    partial = partial_hashes(keys, n_workers=n_workers, cache_dir=cache_dir)
+    paths = paths.assign(partial=[partial[k] for k in keys])
+    paths = paths[paths[['size', 'partial']].duplicated(keep=False)]
+    keys = list(zip(paths.data_file, paths['size'], paths.mtime))
+    full = hash_files(keys, n_workers=n_workers, cache_dir=checksum_cache_dir) if len(keys) > 0 else {}
+    paths = paths.assign(sha256=[full[k]['sha256'] for k in keys])
+    paths = paths[paths[['size', 'sha256']].duplicated(keep=False)]
+    same_content = files.merge(paths[['data_file', 'sha256']], on='data_file')
+    same_content = same_content.assign(kind='same content', key=same_content.sha256)
+
+    # Number each group of duplicates, and report it
+    dups = pd.concat([same_path, same_content], ignore_index=True)
+    dups['group'] = dups.groupby(['kind', 'key'], sort=False).ngroup() + 1
+    dups = dups.sort_values(['group', 'data_file'], kind='stable', ignore_index=True)
+    for (kind, key), group in dups.groupby(['kind', 'key'], sort=False):
+        if kind == 'same path':
+            print('Duplicate data file: %s is listed by %s' %
+                  (key, ', '.join('%s %s session %s' % s for s in zip(group.subject, group.experiment, group.session))))
+        else:
+            print('Duplicate data files: %s have the same contents' % ', '.join(group.data_file.unique()))
+    print('Duplicates: %s groups of duplicate data files, %.2f GB submitted more than once' %
+          (dups.group.nunique(), _extra_bytes(dups) / 1073741824.))
+
+    return dups[list(DUPLICATE_COLS)]
+
+
+def _extra_bytes(dups):
+    """
+    Adds up the size of every listing of a duplicated file beyond the first listing of its contents. A listing can be
+    in both a same-path and a same-content group (e.g. a path listed by two sessions that is also a copy of another
+    path), so each listing is counted once, and each path is identified by its contents where they are known.
+    """
+    listings = dups.drop_duplicates(['subject', 'experiment', 'session', 'file_num', 'data_file'])
+    sha256 = dups[dups.sha256 != ''].drop_duplicates('data_file').set_index('data_file').sha256
+    contents = listings.data_file.map(sha256).fillna(listings.data_file)
+    return int(listings['size'].sum() - listings.loc[~contents.duplicated(), 'size'].sum())
+
+
+def _shared_paths(files, ltp_path):
+    """
+    Lists the subject-level files that the layouts share between all sessions of a subject, for every subject and
+    experiment in the data file table.
+    """
+    shared = set()
+    for exp, subj in files[['experiment', 'subject']].astype(str).drop_duplicates().itertuples(index=False):
+        for candidates in LAYOUTS.get(exp, dict(files=[]))['files']:
+            for root, path, _ in candidates:
+                if root == 'experiment':
+                    shared.add(os.path.normpath(os.path.join(ltp_path, exp, path.format(subject=subj))))
+
+    return shared
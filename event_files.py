@@ -0,0 +1,229 @@
+import re
+import json
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from cache import cached_map
+from get_filepaths import list_data_files
+
+# Extensions of the data files that are checked as behavioral event files
+EVENT_FILE_EXTENSIONS = ('.json', '.jsonl')
+
+# Number of characters read from a JSON file at a time
+CHUNK_SIZE = 1048576
+
+# Largest event (in characters) read from a JSON file before the file is reported as invalid, so that a syntax error
+# early in a file does not cause the whole rest of the file to be read into memory
+MAX_EVENT_SIZE = 64 * 1048576
+
+# Characters that can continue a JSON number
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+
+
+def scan_event_file(path, chunk_size=CHUNK_SIZE):
+    """
+    Reads a JSON or JSONL event file incrementally and summarizes its events, without ever loading the whole document
+    into memory. JSON files are expected to contain an array of events (each member of a top-level object is also
+    counted as an event), and JSONL files one event per line. Files that are truncated or otherwise do not parse are
+    reported through the error field rather than raising an exception.
+
+    :param path: The path to a .json or .jsonl event file.
+    :param chunk_size: The number of characters to read at a time from JSON files (Default=1048576).
+    :return: A dictionary containing the number of events read, the sorted lists of distinct values of the events'
+        subject and session fields, and an error message (None if the whole file parsed).
+    """
+    members = _iter_jsonl(path) if path.endswith('.jsonl') else _iter_json(path, chunk_size)
+    n_events = 0
+    subjects = set()
+    sessions = set()
+    error = None
+    try:
+        for key, value in members:
+            n_events += 1
+            # Events are objects with subject and session fields; a top-level object may also have them as members
+            fields = value if isinstance(value, dict) else {key: value}
+            if 'subject' in fields:
+                subjects.add(_label(fields['subject']))
+            if 'session' in fields:
+                sessions.add(_label(fields['session']))
+    except ValueError as e:
+        error = str(e)
+
+    return dict(n_events=n_events, subjects=sorted(subjects), sessions=sorted(sessions), error=error)
+
+
+def scan_event_files(files, n_processes=1, cache_dir=None):
+    """
+    Scans many event files in parallel. Since parsing JSON is CPU-bound, files are scanned in a pool of processes.
+    Results are cached by each file's path, size, and modification time, so unchanged files are never read again.
+
+    :param files: A list of (path, size, mtime) tuples, e.g. taken from the data file columns added by get_filepaths.
+    :param n_processes: The number of files to scan concurrently (Default=1).
+    :param cache_dir: The path to a local cache of scan results (Default=None, i.e. always scan the files).
+    :return: A dictionary mapping each (path, size, mtime) tuple to the summary from scan_event_file, or to None if the
+        file could not be read.
+    """
+    with ProcessPoolExecutor(max_workers=max(n_processes, 1)) as pool:
+        return cached_map(_try_scan_event_file, files, cache_dir, 'event_files', pool, chunksize=16)
+
+
+def check_event_files(info, n_processes=1, cache_dir=None):
+    """
+    Scans every JSON and JSONL data file found by get_filepaths, and prints each file that is truncated or does not
+    parse, contains no events, has events from a subject other than the session's, or has no events from the session's
+    session number (files shared by all of a subject's sessions may contain events from other sessions as well). Events
+    without subject or session fields are not checked.
+
+    :param info: Data frame containing one row for each session's information, including data file paths.
+    :param n_processes: The number of files to scan concurrently (Default=1).
+    :param cache_dir: The path to a local cache of scan results (Default=None, i.e. always scan the files).
+    :return: A data frame with one row for each event file, listing its session, number of events, and problem (empty
+        if the file passed all checks).
+    """
+    files = list_data_files(info)
+    files = files[files.data_file.str.endswith(EVENT_FILE_EXTENSIONS)].reset_index(drop=True)
+    keys = list(zip(files.data_file, files['size'], files.mtime))
+    results = scan_event_files(keys, n_processes=n_processes, cache_dir=cache_dir)
+
+    n_events = []
+    problems = []
+    for (subj, sess), key in zip(zip(files.subject.astype(str), files.session.astype(str)), keys):
+        result = results[key]
+        n_events.append(None if result is None else result['n_events'])
+        if result is None:
+            problems.append('could not be read')
+        elif result['error'] is not None:
+            problems.append('truncated or invalid (%s)' % result['error'])
+        elif result['n_events'] == 0:
+            problems.append('contains no events')
+        elif len(result['subjects']) > 0 and result['subjects'] != [subj]:
+            problems.append('has events from subjects %s' % ', '.join(result['subjects']))
+        elif len(result['sessions']) > 0 and sess not in result['sessions']:
+            problems.append('has events from sessions %s' % ', '.join(result['sessions']))
+        else:
+            problems.append('')
+
+    files = files[['subject', 'experiment', 'session', 'data_file']].assign(
+        n_events=pd.array(n_events, dtype='Int64'), problem=problems)
+    for _, f in files[files.problem != ''].iterrows():
+        print('Event file problem: %s %s session %s: %s %s' % (f.subject, f.experiment, f.session, f.data_file,
+                                                                f.problem))
+
+    return files
+
+
+def _iter_json(path, chunk_size):
+    """
+    Yields the members of the top-level array or object of a JSON file one at a time, as (key, value) pairs (with a
+    key of None for arrays). The file is read in chunks, each member is parsed with JSONDecoder.raw_decode as soon as it
+    has been read completely, and the text before it is discarded, so memory use is bounded by the size of the largest
+    member rather than the size of the file. Members larger than MAX_EVENT_SIZE characters are reported as invalid.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = ''
+        pos = 0
+        offset = 0  # Number of characters discarded from the start of the buffer
+        eof = False
+
+        def more():
+            # Discards the parsed part of the buffer and reads the next chunk, growing the reads for large members
+            nonlocal buf, pos, offset, eof
+            chunk = f.read(max(chunk_size, len(buf) - pos))
+            eof = len(chunk) == 0
+            buf, offset, pos = buf[pos:] + chunk, offset + pos, 0
+            return not eof
+
+        def peek():
+            # Returns the next non-whitespace character without consuming it ('' at the end of the file)
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n':
+                    pos += 1
+                if pos < len(buf) or not more():
+                    return buf[pos] if pos < len(buf) else ''
+
+        def decode():
+            # Parses the next complete JSON value, reading more of the file until one is available
+            nonlocal pos
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                    # A number may continue in the next chunk, even if it parsed (e.g. "1." parses as 1), so numbers
+                    # are only accepted once a character that cannot be part of them has been read
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        end_of_number = _NUMBER_TAIL.match(buf, end).end()
+                    else:
+                        end_of_number = end
+                    if end_of_number < len(buf) or eof:
+                        pos = end
+                        return value
+                except ValueError:
+                    if eof or len(buf) - pos > MAX_EVENT_SIZE:
+                        raise ValueError('Truncated or invalid JSON at character %s' % (offset + pos))
+                more()
+
+        def expect(char):
+            nonlocal pos
+            if peek() != char:
+                raise ValueError('Truncated or invalid JSON at character %s (expected "%s")' % (offset + pos, char))
+            pos += 1
+
+        opening = peek()
+        if opening not in ('[', '{'):
+            raise ValueError('Not a JSON array or object')
+        closing = ']' if opening == '[' else '}'
+        pos += 1
+        if peek() == closing:
+            pos += 1
+        else:
+            while True:
+                key = None
+                if opening == '{':
+                    peek()
+                    key = decode()
+                    expect(':')
+                peek()
+                yield key, decode()
+                if peek() == closing:
+                    pos += 1
+                    break
+                expect(',')
+        if peek() != '':
+            raise ValueError('Extra data after JSON document at character %s' % (offset + pos))
+
+
+def _iter_jsonl(path):
+    """
+    Yields the records of a JSON Lines file one line at a time, as (key, value) pairs with a key of None.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for i, line in enumerate(f):
+            if line.strip() == '':
+                continue
+            try:
+                value = json.loads(line)
+            except ValueError:
+                raise ValueError('Truncated or invalid JSON on line %s' % (i + 1))
+            yield None, value
+
+
+def _label(value):
+    """
+    Converts a subject or session field to text, writing whole-number floats (e.g. 1.0) as integers.
+    """
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _try_scan_event_file(file):
+    """
+    Scans the event file of a (path, size, mtime) tuple, returning None and printing a warning if the file cannot be
+    read. Run in a worker process.
+    """
+    path = file[0]
+    try:
+        return scan_event_file(path)
+    except OSError as e:
+        print('Warning: Could not read event file %s (%s)' % (path, e))
+        return None
@@ -1,5 +1,54 @@
 import pandas as pd
 
+# Source of each eeg_details01 column: the name of a session info column, a function of the session info data frame, or
+# a constant value entered for every session
+ED_MAPPING = dict(
+    subjectkey='subjectkey',  # Subject GUID
+    src_subject_id='subject',  # Subject ID
+    interview_date=lambda info: info.date.dt.strftime('%m/%d/%Y'),  # Session date (MM/DD/YYYY)
+    interview_age='age_in_months',  # Participant's age in months
+    gender='gender',  # Participant's gender
+    site='location',  # Session location
+    visit='session',  # Session number
+    eeg001=1,  # 1 if EEG was used, 0 if no EEG
+    eeg003b='hand_throw',  # Handedness for throwing a ball (1-5)
+    eeg003d='hand_toothbrush',  # Handedness for brushing teeth (1-5)
+    eeg003e='hand_scissors',  # Handedness for using scissors (1-5)
+    eeg003g='hand_write',  # Handedness for writing (1-5)
+    eeg008c='sleep',  # Hours of sleep
+    eeg008d='alertness',  # Alertness (1-5)
+    eeg013='start_time',  # Start time of EEG recording
+    head_circum='head_circum',  # Participant's head circumference (in cm)
+    eeg015='cap_size',  # Size of cap used (PM, PL, AS, AM, AML, AL, AXL)
+    eeg022='end_time',  # End time of EEG recording
+    eeg026=0,  # 1 if task included faces, 0 if not
+    eeg027=0,  # 1 if task involved resting with eyes closed, 0 if not
+    eeg028=0,  # 1 if a cognitive flanker task, 0 if not
+    eeg029=0,  # 1 if task involved resting with eyes open, 0 if not
+    eeg_4=1  # 1 if participant had normal or correct-to-normal vision
+)
+
+# Source of each eeg_sub_files01 column, as in ED_MAPPING
+ESF_MAPPING = dict(
+    subjectkey='subjectkey',  # Subject GUID
+    src_subject_id='subject',  # Subject ID
+    interview_date=lambda info: info.date.dt.strftime('%m/%d/%Y'),  # Session date (MM/DD/YYYY)
+    interview_age='age_in_months',  # Participant's age in months
+    gender='gender',  # Participant's gender
+    ofc='head_circum',  # Participant's head circumference (in cm)
+    experiment_id='experiment_id',  # Experiment's ID number
+    data_file1='data_file1',  # Data file 1 (typically EEG recording)
+    data_file1_type='data_file1_type',  # File type of file 1 (typically "EEG")
+    data_file2='data_file2',  # Data file 2 (typically events file or session log)
+    data_file2_type='data_file2_type',  # File type of file 2 (typically "Behavioral")
+    data_file3='data_file3',  # Data file 3 (extra file, e.g. sync pulse log or second EEG recording)
+    data_file3_type='data_file3_type',  # File type of file 3
+    data_file4='data_file4',  # Data file 4 (extra file, e.g. sync pulse log or second EEG recording)
+    data_file4_type='data_file4_type',  # File type of file 4
+    head_circum='head_circum',  # Participant's head circumference (in cm)
+    visit='session'  # Session number
+)
+
 
 def fill_info(ed, esf, info):
     """
@@ -19,65 +68,48 @@ def fill_info(ed, esf, info):
 
 def fill_eeg_details(ed, info):
     """
-    Fill out the eeg_details01 spreadsheet with all available and relevant info.
+    Fill out the eeg_details01 spreadsheet with all available and relevant info (see ED_MAPPING).
 
     :param ed: (Empty) data frame containing the columns of the eeg_details01 spreadsheet.
     :param info: Data frame containing information about every session that will be entered into the spreadsheets.
     :return: Data frame filled out with the eeg_details01 information.
     """
-    ed = ed.append(pd.DataFrame(None, index=info.index))
-    ed.loc[:, 'subjectkey'] = info.subjectkey  # Subject GUID
-    ed.loc[:, 'src_subject_id'] = info.subject  # Subject ID
-    ed.loc[:, 'interview_date'] = info.date  # Session date (MM/DD/YYYY)
-    ed.loc[:, 'interview_age'] = info.age_in_months  # Participant's age in months
-    ed.loc[:, 'gender'] = info.gender  # Participant's gender
-    ed.loc[:, 'site'] = info.location  # Session location
-    ed.loc[:, 'visit'] = info.session  # Session number
-    ed.loc[:, 'eeg001'] = 1  # 1 if EEG was used, 0 if no EEG
-    ed.loc[:, 'eeg003b'] = info.hand_throw  # Handedness for throwing a ball (1-5)
-    ed.loc[:, 'eeg003d'] = info.hand_toothbrush # Handedness for brushing teeth (1-5)
-    ed.loc[:, 'eeg003e'] = info.hand_scissors  # Handedness for using scissors (1-5)
-    ed.loc[:, 'eeg003g'] = info.hand_write  # Handedness for writing (1-5)
-    ed.loc[:, 'eeg008c'] = info.sleep  # Hours of sleep
-    ed.loc[:, 'eeg008d'] = info.alertness  # Alertness (1-5)
-    ed.loc[:, 'eeg013'] = info.start_time  # Start time of EEG recording
-    ed.loc[:, 'head_circum'] = info.head_circum  # Participant's head circumference (in cm)
-    ed.loc[:, 'eeg015'] = info.cap_size  # Size of cap used (PM, PL, AS, AM, AML, AL, AXL)
-    ed.loc[:, 'eeg022'] = info.end_time  # End time of EEG recording
-    ed.loc[:, 'eeg026'] = 0  # 1 if task included faces, 0 if not
-    ed.loc[:, 'eeg027'] = 0  # 1 if task involved resting with eyes closed, 0 if not
-    ed.loc[:, 'eeg028'] = 0  # 1 if a cognitive flanker task, 0 if not
-    ed.loc[:, 'eeg029'] = 0  # 1 if task involved resting with eyes open, 0 if not
-    ed.loc[:, 'eeg_4'] = 1  # 1 if participant had normal or correct-to-normal vision
-
-    return ed
+    return fill_spreadsheet(ed.columns, info, ED_MAPPING)
 
 
 def fill_eeg_sub_files(esf, info):
     """
-    Fill out the eeg_sub_files01 spreadsheet with all available and relevant info.
+    Fill out the eeg_sub_files01 spreadsheet with all available and relevant info (see ESF_MAPPING).
 
     :param esf: (Empty) data frame containing the columns of the eeg_sub_files01 spreadsheet.
     :param info: Data frame containing information about every session that will be entered into the spreadsheets.
     :return: Data frame filled out with the eeg_sub_file01 information.
     """
-    esf = esf.append(pd.DataFrame(None, index=info.index))
-    esf.loc[:, 'subjectkey'] = info.subjectkey  # Subject GUID
-    esf.loc[:, 'src_subject_id'] = info.subject  # Subject ID
-    esf.loc[:, 'interview_date'] = info.date  # Session date (MM/DD/YYYY)
-    esf.loc[:, 'interview_age'] = info.age_in_months  # Participant's age in months
-    esf.loc[:, 'gender'] = info.gender  # Participant's gender
-    esf.loc[:, 'ofc'] = info.head_circum  # Participant's head circumference (in cm)
-    esf.loc[:, 'experiment_id'] = info.experiment_id  # Experiment's ID number
-    esf.loc[:, 'data_file1'] = info.data_file1  # Data file 1 (typically EEG recording)
-    esf.loc[:, 'data_file1_type'] = info.data_file1_type  # File type of file 1 (typically "EEG")
-    esf.loc[:, 'data_file2'] = info.data_file2  # Data file 2 (typically events file or session log)
-    esf.loc[:, 'data_file2_type'] = info.data_file2_type  # File type of file 2 (typically "Behavioral")
-    esf.loc[:, 'data_file3'] = info.data_file3  # Data file 3 (extra file, e.g. sync pulse log or second EEG recording)
-    esf.loc[:, 'data_file3_type'] = info.data_file3_type  # File type of file 3
-    esf.loc[:, 'data_file4'] = info.data_file4  # Data file 4 (extra file, e.g. sync pulse log or second EEG recording)
-    esf.loc[:, 'data_file4_type'] = info.data_file4_type  # File type of file 4
-    esf.loc[:, 'head_circum'] = info.head_circum  # Participant's head circumference (in cm)
-    esf.loc[:, 'visit'] = info.session  # Session number
-
-    return esf
+    return fill_spreadsheet(esf.columns, info, ESF_MAPPING)
+
+
+def fill_spreadsheet(columns, info, mapping):
+    """
+    Builds a filled-out spreadsheet with one row for each session, in a single step. Each column is taken from the
+    session info data frame according to the mapping; columns of the spreadsheet without an entry in the mapping are
+    left empty, and entries of the mapping that are not columns of the spreadsheet are ignored.
+
+    :param columns: The columns of the spreadsheet, in order.
+    :param info: Data frame containing information about every session that will be entered into the spreadsheet.
+    :param mapping: A dictionary mapping spreadsheet columns to the name of a session info column, a function that takes
+        the session info data frame and returns the column's values, or a constant value.
+    :return: Data frame filled out with the spreadsheet information, with the same index as info.
+    """
+    data = dict()
+    for col in columns:
+        if col not in mapping:
+            continue
+        source = mapping[col]
+        if callable(source):
+            data[col] = source(info)
+        elif isinstance(source, str):
+            data[col] = info[source]
+        else:
+            data[col] = source
+
+    return pd.DataFrame(data, index=info.index, columns=columns)
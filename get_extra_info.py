@@ -1,6 +1,11 @@
+import numpy as np
 import pandas as pd
 import datetime as dt
 from dateutil.relativedelta import relativedelta
+from info_schema import set_info_dtypes
+
+# Columns of the extra info file, in order (the file has no header row)
+EXTRA_INFO_COLS = ('subject', 'dob', 'head_circum', 'cap_size', 'subjectkey')
 
 
 def get_extra_info(info, extra_info_path):
@@ -19,39 +24,82 @@ def get_extra_info(info, extra_info_path):
     :param extra_info_path: Path to file containing extra subject information.
     :return: Original data frame with additional info added to each row.
     """
-    # Read in extra info and organize into a dictionary
-    data = {}
-    with open(extra_info_path, 'r') as f:
-        text = f.readlines()
-        text = [line.replace('\n', '').split('\t') for line in text]
-    # Create dictionary mapping participant ID to date of birth, head circumference, and cap size
-    for line in text:
-        dob = line[1].split('/')
-        data[line[0]] = dict(
-            year=int(dob[2]),
-            month=int(dob[0]),
-            day=int(dob[1]),
-            head_circum=float(line[2]),
-            cap_size=line[3],
-            guid=line[4]
-        )
+    # Read in extra info as a table indexed by participant ID
+    data = load_extra_info(extra_info_path)
+
+    # Make sure every subject in the data frame has an entry in the extra info file
+    missing = np.setdiff1d(info.subject.unique(), data.index)
+    if len(missing) > 0:
+        raise KeyError('No extra info found for subjects: %s' % ', '.join(missing))
 
     # Add extra info to data frame
-    info['head_circum'] = pd.Series(None, index=info.index)
-    info['cap_size'] = pd.Series(None, index=info.index)
-    info['age_in_months'] = pd.Series(None, index=info.index)
-    info['subjectkey'] = pd.Series(None, index=info.index)
-    for i, sess_data in info.iterrows():
-        subj = sess_data.subject
-        d = data[subj]
-        info.loc[i, 'age_in_months'] = calculate_age_in_months(sess_data, d['year'], d['month'], d['day'])
-        info.loc[i, 'head_circum'] = data[subj]['head_circum']
-        info.loc[i, 'cap_size'] = data[subj]['cap_size']
-        info.loc[i, 'subjectkey'] = data[subj]['guid']
+    info = info.join(data, on='subject')
+    info.insert(info.columns.get_loc('subjectkey'), 'age_in_months', calculate_ages_in_months(info.date, info.dob))
+    info = set_info_dtypes(info.drop(columns='dob'), ('subject', 'age_in_months', 'cap_size'))
 
     return info
 
 
+def load_extra_info(extra_info_path):
+    """
+    Reads the tab-separated extra info file into a data frame indexed by participant ID. If a participant is listed more
+    than once, their last entry is used.
+
+    :param extra_info_path: Path to file containing extra subject information.
+    :return: A data frame with the date of birth, head circumference, cap size, and GUID of each participant.
+    """
+    data = pd.read_csv(extra_info_path, delimiter='\t', header=None, names=EXTRA_INFO_COLS,
+                       dtype=dict(subject=str, dob=str, head_circum=float, cap_size=str, subjectkey=str))
+    data['dob'] = pd.to_datetime(data.dob, format='%m/%d/%Y')
+    data = data.drop_duplicates('subject', keep='last').set_index('subject')
+
+    return data
+
+
+def calculate_ages_in_months(sess_dates, birth_dates):
+    """
+    Array version of calculate_age_in_months. Given the dates of a set of sessions and the corresponding participants'
+    dates of birth, calculate each participant's age in months at the time of the session. Uses the same rule as
+    calculate_age_in_months, i.e. whole months elapsed plus the remaining days divided by 31 and rounded.
+
+    :param sess_dates: An array-like of session dates.
+    :param birth_dates: An array-like of dates of birth, of the same length as sess_dates.
+    :return: An integer array with the age of each participant (in months) at the time of their session.
+    """
+    sess_dates = np.asarray(sess_dates, dtype='datetime64[D]')
+    birth_dates = np.asarray(birth_dates, dtype='datetime64[D]')
+    birth_months = birth_dates.astype('datetime64[M]')
+    birth_days = (birth_dates - birth_months.astype('datetime64[D]')).astype(int)  # Day of month, counting from 0
+
+    # Count calendar months between birth and session, stepping back one if the last month is not yet complete
+    months = (sess_dates.astype('datetime64[M]') - birth_months).astype(int)
+    anchor = _add_months(birth_months, birth_days, months)
+    incomplete = anchor > sess_dates
+    months[incomplete] -= 1
+    anchor[incomplete] = _add_months(birth_months[incomplete], birth_days[incomplete], months[incomplete])
+
+    # Convert remaining days to months
+    days = (sess_dates - anchor).astype(int)
+    age = months + np.rint(days / 31.).astype(int)
+
+    return age
+
+
+def _add_months(months, days, n):
+    """
+    Adds n months to the dates given by (months, days), clamping the day to the end of the resulting month in the same
+    way as relativedelta (e.g. Jan 31 + 1 month = Feb 28).
+
+    :param months: A datetime64[M] array of starting months.
+    :param days: An integer array of starting days of the month, counting from 0.
+    :param n: An integer array of months to add.
+    :return: A datetime64[D] array of the resulting dates.
+    """
+    months = months + n
+    month_lengths = ((months + 1).astype('datetime64[D]') - months.astype('datetime64[D]')).astype(int)
+    return months.astype('datetime64[D]') + np.minimum(days, month_lengths - 1)
+
+
 def calculate_age_in_months(sess_data, year, month=1, day=1):
     """
     Given session information and a date of birth, calculate the participant's age in months at the time of the session.
@@ -1,195 +1,367 @@
 from __future__ import print_function
 import os
-import glob
+import time
+import threading
 import pandas as pd
-
-
-def get_filepaths(info, ltp_path='/data/eeg/scalp/ltp/', protocols_path='/protocols/ltp/'):
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, TimeoutError, wait
+from cache import load_cached, save_cached
+from info_schema import set_info_dtypes
+from get_info import EXP_DICT
+from dir_index import dir_mtime, index_glob, index_exists, index_stat, record_dir_access, walk_dir
+
+# Where each experiment's data files are stored. Paths are relative to one of the following roots:
+#   'ltp': The session's LTP directory (ltp/<exp>/<subj>/session_<sess>/)
+#   'protocols': The session's protocols directory (protocols/ltp/subjects/<subj>/experiments/<exp>/sessions/<sess>/)
+#   'experiment': The experiment's LTP directory (ltp/<exp>/), where {subject} in a path is replaced by the subject ID
+# 'eeg' lists the (root, pattern) globs used to find the session's EEG recordings, in order. 'files' lists the four data
+# files of the spreadsheet; each is a list of (root, path, type) candidates, of which the first one that exists is used,
+# and root 'eeg' refers to the n-th EEG recording. Files listed in 'required' raise an error if no candidate exists.
+LAYOUTS = dict(
+    pyFR=dict(
+        eeg=[('ltp', 'eeg/*.bdf'), ('ltp', 'eeg/*.bdf.bz2')],
+        files=[[('eeg', 0, 'EEG')],
+               [('ltp', 'events.mat', 'Behavioral'), ('ltp', 'session.log', 'Session Log')],
+               [('ltp', 'eeg.eeglog', 'Sync Pulse Log')],
+               [('eeg', 1, 'EEG')]],
+        required=[1]
+    ),
+    ltpFR2=dict(
+        eeg=[('protocols', 'ephys/current_processed/*.bdf')],
+        files=[[('eeg', 0, 'EEG')],
+               [('protocols', 'behavioral/current_processed/all_events.json', 'Behavioral'),
+                ('ltp', 'session.log', 'Session Log')],
+               [('ltp', 'eeg.eeglog', 'Sync Pulse Log')],
+               [('eeg', 1, 'EEG')]],
+        required=[1]
+    ),
+    SFR=dict(
+        eeg=[],
+        files=[[('ltp', '*.json', 'Session Log')],
+               [('experiment', 'behavioral/data/beh_data__{subject}.json', 'Behavioral')],
+               [],
+               []],
+        required=[]
+    ),
+    VFFR=dict(
+        eeg=[('protocols', 'ephys/current_processed/*.bdf')],
+        files=[[('eeg', 0, 'EEG')],
+               [('protocols', 'behavioral/current_processed/task_events.json', 'Behavioral'),
+                ('ltp', 'session.jsonl', 'Session Log')],
+               [('eeg', 1, 'EEG')],
+               [('eeg', 2, 'EEG')]],
+        required=[1]
+    )
+)
+LAYOUTS['FR1_scalp'] = LAYOUTS['SFR']
+LAYOUTS['ltpDelayRepFRReadOnly'] = LAYOUTS['VFFR']
+
+# No data files are submitted for ltpFR yet, so its sessions are entered with empty data file columns
+LAYOUTS['ltpFR'] = dict(eeg=[], files=[[], [], [], []], required=[])
+
+# Every experiment that get_info can load must have a layout
+_missing = sorted(set(EXP_DICT) - set(LAYOUTS))
+if len(_missing) > 0:
+    raise KeyError('No file layout defined in LAYOUTS for experiments: %s' % ', '.join(_missing))
+
+# Columns added to the session info data frame, in the order returned by resolve_session
+FILEPATH_COLS = ('data_file1', 'data_file1_type', 'data_file2', 'data_file2_type',
+                 'data_file3', 'data_file3_type', 'data_file4', 'data_file4_type')
+
+# Columns holding the size (in bytes) and modification time (in nanoseconds) of each data file
+FILE_STAT_COLS = ('data_file1_size', 'data_file1_mtime', 'data_file2_size', 'data_file2_mtime',
+                  'data_file3_size', 'data_file3_mtime', 'data_file4_size', 'data_file4_mtime')
+
+# Key of the cache of resolved sessions, which includes the version of the format of its entries (bumped whenever the
+# format changes, so that entries written by older versions are never unpacked)
+CACHE_KEY = ('filepaths', 2)
+
+
+def get_filepaths(info, ltp_path='/data/eeg/scalp/ltp/', protocols_path='/protocols/ltp/', n_workers=1, timeout=None,
+                  retries=0, cache_dir=None):
     """
     Identifies the EEG and behavioral data files for each session listed in the input data frame. File paths are
     identified based on the experiment name, subject ID, and session number listed within each session's info in the
-    data frame. Note that different experiments use different helper functions based on which files are needed and how
-    they are organized.
+    data frame. Note that different experiments store different files in different places; these are described for
+    each experiment in LAYOUTS. An error is raised if a session's experiment has no layout.
+
+    Since nearly all of the time spent here is waiting on the Rhino mount, each subject's LTP and/or protocols directory
+    for an experiment (depending on which its layout uses) is first indexed with a single walk (see dir_index.py), and
+    file lookups are then answered from that index.
+    Directories can be walked and sessions resolved in parallel by worker threads. Each walk and each session lookup is
+    subject to the timeout and retries. Results are always entered into the data frame in the original row order.
+
+    If a cache directory is given, each session's results are saved along with the modification times of the
+    directories they were found in. On later runs, the file paths of sessions whose directories have not changed are
+    taken from the cache without indexing or searching their directories again. Their files are still stat'd to get
+    their current sizes and modification times, since rewriting a file in place does not change its directory.
 
     :param info: Data frame containing one row for each session's information.
     :param ltp_path: The path to the standard LTP directory on Rhino (/data/eeg/scalp/ltp/).
     :param protocols_path: The path the processed LTP directory on Rhino (/protocols/ltp/).
-    :return: The session info data frame with paths to the data files added.
-    """
-    info['data_file1'] = pd.Series(None, index=info.index)
-    info['data_file1_type'] = pd.Series(None, index=info.index)
-    info['data_file2'] = pd.Series(None, index=info.index)
-    info['data_file2_type'] = pd.Series(None, index=info.index)
-    info['data_file3'] = pd.Series(None, index=info.index)
-    info['data_file3_type'] = pd.Series(None, index=info.index)
-    info['data_file4'] = pd.Series(None, index=info.index)
-    info['data_file4_type'] = pd.Series(None, index=info.index)
-    total_size = 0
-
-    for i, sess_data in info.iterrows():
-
-        # Identify session directories
-        exp = sess_data.experiment
-        subj = sess_data.subject
-        sess = sess_data.session
-        sess_path = os.path.join(ltp_path, '%s/%s/session_%s' % (exp, subj, sess))
-        db_path = os.path.join(protocols_path, 'subjects/%s/experiments/%s/sessions/%s' % (subj, exp, sess))
-
-        # Determine the file paths and file types for the current session
-        if exp == 'pyFR':
-            filepaths = get_filepaths_pyFR(sess_path, db_path)
-        elif exp == 'ltpFR2':
-            filepaths = get_filepaths_ltpFR2(sess_path, db_path)
-        elif exp in ('SFR', 'FR1_scalp'):
-            filepaths = get_filepaths_SFR(sess_path, ltp_path, exp, subj)
-        elif exp == 'VFFR':
-            filepaths = get_filepaths_VFFR(sess_path, db_path)
-        elif exp == 'ltpDelayRepFRReadOnly':
-            filepaths = get_filepaths_VFFR(sess_path, db_path)
-        else:
-            filepaths = ['' for _ in range(8)]
-
-        # Add file information to the data frame
-        info.loc[i, ('data_file1', 'data_file1_type', 'data_file2', 'data_file2_type',
-                     'data_file3', 'data_file3_type', 'data_file4', 'data_file4_type')] = filepaths
-
-        for j, path in enumerate(filepaths):
-            if j in (0, 2, 4, 6) and path != '':
-                total_size += os.path.getsize(path)
-
+    :param n_workers: The number of directories to index and sessions to resolve concurrently (Default=1, i.e. one after
+        another).
+    :param timeout: The number of seconds a single directory walk or session lookup may take, counted from when it
+        starts, before it is abandoned and tried again. Only used when n_workers > 1 (Default=None, i.e. wait
+        indefinitely).
+    :param retries: The number of times to retry a directory walk or session lookup that timed out or raised an OSError
+        before giving up (Default=0).
+    :param cache_dir: The path to a local cache of resolved file paths (Default=None, i.e. always search Rhino).
+    :return: The session info data frame with paths, sizes, and modification times of the data files added.
+    """
+    missing = sorted(set(info.experiment) - set(LAYOUTS))
+    if len(missing) > 0:
+        raise KeyError('No file layout defined in LAYOUTS for experiments: %s' % ', '.join(missing))
+
+    sessions = [(exp, subj, sess, ltp_path, protocols_path) for exp, subj, sess in
+                zip(info.experiment, info.subject, info.session)]
+    names = ['%s %s session %s' % s[:3] for s in sessions]
+    results = [None for _ in sessions]
+
+    # Reuse cached file paths for sessions whose directories have not changed since they were last resolved
+    if cache_dir is not None:
+        cache = load_cached(cache_dir, CACHE_KEY, {})
+        results = _call_all(_refresh_cached, [(cache.get(s),) for s in sessions], names, n_workers, timeout, retries)
+    todo = sorted((i for i in range(len(sessions)) if results[i] is None), key=lambda i: sessions[i][0])
+
+    # Index the directories of each subject that the experiment's layout refers to, so each is listed only once
+    roots = set()
+    for exp, subj, _, _, _ in (sessions[i] for i in todo):
+        layout_roots = _layout_roots(LAYOUTS[exp])
+        if 'ltp' in layout_roots:
+            roots.add(os.path.join(ltp_path, exp, subj))
+        if 'protocols' in layout_roots:
+            roots.add(os.path.join(protocols_path, 'subjects', subj, 'experiments', exp))
+    roots = sorted(os.path.normpath(r) for r in roots)
+    index = {}
+    for listing in _call_all(walk_dir, [(r,) for r in roots], roots, n_workers, timeout, retries):
+        index.update(listing)
+    args = [sessions[i] + (index,) for i in todo]
+
+    # Determine the file paths, file types, file sizes, and modification times for each remaining session
+    resolved = _call_all(resolve_session, args, [names[i] for i in todo], n_workers, timeout, retries)
+    for i, r in zip(todo, resolved):
+        results[i] = r
+
+    # Save newly resolved sessions to the cache
+    if cache_dir is not None:
+        print('File path cache: %s hits, %s misses' % (len(sessions) - len(todo), len(todo)))
+        if len(todo) > 0:
+            cache.update((sessions[i], results[i]) for i in todo)
+            save_cached(cache_dir, CACHE_KEY, cache)
+
+    # Add file information to the data frame
+    filepaths = set_info_dtypes(pd.DataFrame([r[0] for r in results], index=info.index, columns=FILEPATH_COLS))
+    for col in FILEPATH_COLS:
+        info[col] = filepaths[col]
+    file_stats = pd.DataFrame([r[1] for r in results], index=info.index, columns=FILE_STAT_COLS, dtype=object)
+    file_stats = set_info_dtypes(file_stats)  # Converted from objects, since floats would round nanosecond mtimes
+    for col in FILE_STAT_COLS:
+        info[col] = file_stats[col]
+
+    total_size = sum(file_stats[col].sum() for col in FILE_STAT_COLS[::2])
     total_size /= 1073741824.
     print('Total Upload Size: %s GB' % total_size)
 
     return info
 
 
-def get_filepaths_pyFR(sess_path):
+def list_data_files(info):
     """
-    Finds file paths for the EEG file(s), MATLAB events file, and sync pulse log for a pyFR session. If events are not
-    available, uses the session log instead.
+    Reshapes the data file columns added by get_filepaths into a table with one row for each data file of each session.
+    Empty data file slots are left out.
 
-    :param sess_path: The path to the directory for a specific pyFR session.
-    :return: An 8-item list containing up to four file paths and their file types, to be filled into the spreadsheet.
+    :param info: Data frame containing one row for each session's information, including data file paths.
+    :return: A data frame with the subject, experiment, session, number (1-4), path, type, size, and modification time
+        of each data file. Its index refers back to the corresponding rows of info.
     """
-    eeg_files = glob.glob(os.path.join(sess_path, 'eeg', '*.bdf')) + \
-                glob.glob(os.path.join(sess_path, 'eeg', '*.bdf.bz2'))
-    eeg_files = [''] if len(eeg_files) == 0 else eeg_files
-    events_file = os.path.join(sess_path, 'events.mat')
-    session_log = os.path.join(sess_path, 'session.log')
-    sync_file = os.path.join(sess_path, 'eeg.eeglog')
-
-    filepaths = ['' for _ in range(8)]
-    filepaths[0] = eeg_files[0]
-    filepaths[1] = 'EEG' if filepaths[0] != '' else ''
-    filepaths[2] = events_file if os.path.exists(events_file) else session_log
-    filepaths[3] = 'Behavioral' if os.path.exists(events_file) else 'Session Log'
-    filepaths[4] = sync_file if os.path.exists(sync_file) else ''
-    filepaths[5] = 'Sync Pulse Log' if filepaths[4] != '' else ''
-    filepaths[6] = eeg_files[1] if len(eeg_files) > 1 else ''
-    filepaths[7] = 'EEG' if filepaths[6] != '' else ''
+    files = []
+    for n in range(4):
+        cols = ['subject', 'experiment', 'session', FILEPATH_COLS[2 * n], FILEPATH_COLS[2 * n + 1],
+                FILE_STAT_COLS[2 * n], FILE_STAT_COLS[2 * n + 1]]
+        f = info[cols]
+        f.columns = ['subject', 'experiment', 'session', 'data_file', 'data_file_type', 'size', 'mtime']
+        f = f[f.data_file.notna() & (f.data_file != '')].copy()
+        f.insert(3, 'file_num', n + 1)
+        files.append(f)
+    files = pd.concat(files)
 
-    return filepaths
+    return files
 
 
-def get_filepaths_ltpFR2(sess_path, db_path):
+def resolve_session(exp, subj, sess, ltp_path='/data/eeg/scalp/ltp/', protocols_path='/protocols/ltp/', index=None):
     """
-    Finds file paths for the EEG file(s), JSON events file, and sync pulse log for a pyFR session. If events are not
-    available, uses the session log instead.
+    Identifies the data files of a single session, along with their sizes and modification times.
 
-    :param sess_path: The path to the LTP directory for a specific ltpFR2 session.
-    :param db_path: The path to the protocols directory for a specific ltpFR2 session.
-    :return: An 8-item list containing up to four file paths and their file types, to be filled into the spreadsheet.
+    :param exp: The experiment name for the session.
+    :param subj: The subject ID for the session.
+    :param sess: The session number.
+    :param ltp_path: The path to the standard LTP directory on Rhino (/data/eeg/scalp/ltp/).
+    :param protocols_path: The path the processed LTP directory on Rhino (/protocols/ltp/).
+    :param index: A directory index created by build_dir_index (Default=None, i.e. list directories as needed).
+    :return: A tuple containing the 8-item list of file paths and file types, an 8-item list of the size and
+        modification time of each file (None for missing files), and a dictionary mapping each directory the files were
+        found in to its modification time.
     """
-    eeg_files = glob.glob(os.path.join(db_path, 'ephys', 'current_processed', '*.bdf'))
-    eeg_files = [''] if len(eeg_files) == 0 else eeg_files
-    events_file = os.path.join(db_path, 'behavioral', 'current_processed', 'all_events.json')
-    session_log = os.path.join(sess_path, 'session.log')
-    sync_file = os.path.join(sess_path, 'eeg.eeglog')
-
-    filepaths = ['' for _ in range(8)]
-    filepaths[0] = eeg_files[0]
-    filepaths[1] = 'EEG' if filepaths[0] != '' else ''
-    filepaths[2] = events_file if os.path.exists(events_file) else session_log
-    filepaths[3] = 'Behavioral' if os.path.exists(events_file) else 'Session Log'
-    filepaths[4] = sync_file if os.path.exists(sync_file) else ''
-    filepaths[5] = 'Sync Pulse Log' if filepaths[4] != '' else ''
-    filepaths[6] = eeg_files[1] if len(eeg_files) > 1 else ''
-    filepaths[7] = 'EEG' if filepaths[6] != '' else ''
-
-    return filepaths
+    index = {} if index is None else index
+    layout = LAYOUTS[exp]
+
+    # Identify session directories
+    sess_path = os.path.join(ltp_path, '%s/%s/session_%s' % (exp, subj, sess))
+    db_path = os.path.join(protocols_path, 'subjects/%s/experiments/%s/sessions/%s' % (subj, exp, sess))
+    roots = dict(ltp=sess_path, protocols=db_path, experiment=os.path.join(ltp_path, exp))
+
+    # Determine the file paths and file types for the current session, keeping track of which directories were searched
+    with record_dir_access() as accessed:
+        eeg_files = []
+        for root, pattern in layout['eeg']:
+            eeg_files.extend(_find_files(index, roots[root], pattern, subj))
+
+        filepaths = []
+        for n, candidates in enumerate(layout['files']):
+            path, file_type = '', ''
+            for root, path_or_num, candidate_type in candidates:
+                if root == 'eeg':
+                    found = eeg_files[path_or_num:path_or_num + 1]
+                else:
+                    found = _find_files(index, roots[root], path_or_num, subj)
+                if len(found) > 0:
+                    path, file_type = found[0], candidate_type
+                    break
+            if path == '' and n in layout['required']:
+                raise FileNotFoundError('No data file %s found for %s %s session %s' % (n + 1, subj, exp, sess))
+            filepaths.extend((path, file_type))
+
+        file_stats = []
+        for path in filepaths[::2]:
+            file_stats.extend(index_stat(index, path)[1:] if path != '' else (None, None))
+
+    accessed.update(os.path.normpath(p) for p in (sess_path, db_path))
+    dir_mtimes = {d: dir_mtime(index, d) for d in accessed}
+
+    return filepaths, file_stats, dir_mtimes
+
+
+def _find_files(index, root, pattern, subj):
+    """
+    Finds the files matching a path from an experiment layout, which may contain wildcards in its last component.
+    """
+    dirpath, name = os.path.split(os.path.join(root, pattern.format(subject=subj)))
+    if any(c in name for c in '*?['):
+        return index_glob(index, dirpath, name)
+    path = os.path.join(dirpath, name)
+    return [path] if index_exists(index, path) else []
 
 
-def get_filepaths_SFR(sess_path, ltp_path, exp, subj):
+def _layout_roots(layout):
     """
-    Finds file paths for the JSON events and session log of an SFR session.
-
-    :param sess_path: The path to the LTP directory for a specific ltpFR2 session.
-    :param ltp_path: The path to the standard LTP directory on Rhino (/data/eeg/scalp/ltp).
-    :param exp: The experiment name for the session ('SFR' vs 'FR1_scalp').
-    :param subj: The subject ID for the session.
-    :return: An 8-item list containing up to four file paths and their file types, to be filled into the spreadsheet.
+    Returns the set of roots that an experiment layout refers to.
     """
-    events_file = glob.glob(os.path.join(sess_path, '*.json'))
-    events_file = '' if len(events_file) == 0 else events_file[0]
-    data_file = os.path.join(ltp_path, '%s/behavioral/data/beh_data__%s.json' % (exp, subj))
+    return set(root for root, _ in layout['eeg']) | set(c[0] for candidates in layout['files'] for c in candidates)
 
-    filepaths = ['' for _ in range(8)]
-    filepaths[0] = events_file
-    filepaths[1] = 'Session Log'
-    filepaths[2] = data_file if os.path.exists(data_file) else ''
-    filepaths[3] = 'Behavioral' if filepaths[2] != '' else ''
 
-    return filepaths
+def _refresh_cached(cached):
+    """
+    Checks whether a cached session result is still valid, i.e. none of the directories its files were found in have
+    been modified since. If so, returns the result with the current size and modification time of each of its files,
+    which change without changing the directory when a file is rewritten in place. Returns None if the result is out of
+    date, or if one of its files no longer exists.
+    """
+    if cached is None or not all(dir_mtime({}, d) == m for d, m in cached[2].items()):
+        return None
+    file_stats = []
+    for path in cached[0][::2]:
+        if path == '':
+            file_stats.extend((None, None))
+            continue
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        file_stats.extend((st.st_size, st.st_mtime_ns))
+
+    return cached[0], file_stats, cached[2]
+
+
+def _call_all(func, args, names, n_workers, timeout, retries):
+    """
+    Calls a function once for each tuple of arguments, in worker threads if n_workers > 1 (see _call_in_threads) and
+    otherwise one call after another (see _call_with_retry). Results are returned in the order of the arguments.
+    """
+    if n_workers > 1:
+        return _call_in_threads(func, args, names, n_workers, timeout, retries)
+    return [_call_with_retry(func, a, name, retries) for a, name in zip(args, names)]
 
 
-def get_filepaths_VFFR(sess_path, db_path):
+def _call_with_retry(func, args, name, retries):
     """
-    Finds file paths for the EEG file(s) and JSON events file for a VFFR session. If events are not available, uses the
-    session log instead.
-
-    :param sess_path: The path to the LTP directory for a specific VFFR session.
-    :param db_path: The path to the protocols directory for a specific VFFR session.
-    :return: An 8-item list containing up to four file paths and their file types, to be filled into the spreadsheet.
+    Calls a function in the current thread, retrying up to the given number of times if an OSError occurs. The name
+    describes the call in warnings.
     """
-    eeg_files = glob.glob(os.path.join(db_path, 'ephys', 'current_processed', '*.bdf'))
-    eeg_files = [''] if len(eeg_files) == 0 else eeg_files
-    events_file = os.path.join(db_path, 'behavioral', 'current_processed', 'task_events.json')
-    session_log = os.path.join(sess_path, 'session.jsonl')
-
-    filepaths = ['' for _ in range(8)]
-    filepaths[0] = eeg_files[0]
-    filepaths[1] = 'EEG' if filepaths[0] != '' else ''
-    filepaths[2] = events_file if os.path.exists(events_file) else session_log
-    filepaths[3] = 'Behavioral' if os.path.exists(events_file) else 'Session Log'
-    filepaths[4] = eeg_files[1] if len(eeg_files) > 1 else ''
-    filepaths[5] = 'EEG' if filepaths[4] != '' else ''
-    filepaths[6] = eeg_files[2] if len(eeg_files) > 2 else ''
-    filepaths[7] = 'EEG' if filepaths[6] != '' else ''
+    for attempt in range(retries + 1):
+        try:
+            return func(*args)
+        except OSError as e:
+            if attempt == retries:
+                raise
+            print('Warning: Retrying %s after %s' % (name, type(e).__name__))
 
-    return filepaths
 
-def get_filepaths_DelayRepFR(sess_path, db_path):
+def _call_in_threads(func, args, names, n_workers, timeout, retries):
     """
-    Finds file paths for the EEG file(s) and JSON events file for a VFFR session. If events are not available, uses the
-    session log instead.
-
-    :param sess_path: The path to the LTP directory for a specific VFFR session.
-    :param db_path: The path to the protocols directory for a specific VFFR session.
-    :return: An 8-item list containing up to four file paths and their file types, to be filled into the spreadsheet.
+    Calls a function once for each tuple of arguments, with up to n_workers calls running at once, each in its own
+    daemon thread. A call that takes longer than the timeout (counted from when it started) is abandoned and retried in
+    a new thread, so retries never queue behind a hung call, and a call that never returns does not keep the program
+    from exiting. Calls that raise an OSError are retried too. The names describe the calls in warnings. Results are
+    returned in the order of the arguments.
+    """
+    results = [None for _ in args]
+    attempts = [0 for _ in args]
+    todo = deque(range(len(args)))
+    running = {}
+    while len(todo) > 0 or len(running) > 0:
+        while len(todo) > 0 and len(running) < n_workers:
+            i = todo.popleft()
+            running[_start_thread(func, args[i])] = (i, time.monotonic())
+
+        # Wait for the next call to finish, or for the oldest running call to time out
+        wait_time = None if timeout is None else \
+            max(min(start for _, start in running.values()) + timeout - time.monotonic(), 0)
+        wait(list(running), timeout=wait_time, return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+        for future, (i, start) in list(running.items()):
+            if future.done():
+                error = future.exception()
+                if error is None:
+                    results[i] = future.result()
+                elif not isinstance(error, OSError):
+                    raise error
+            elif timeout is not None and now - start >= timeout:
+                error = TimeoutError('Timed out after %s seconds' % timeout)
+            else:
+                continue
+            del running[future]
+            if error is not None:
+                if attempts[i] == retries:
+                    raise error
+                attempts[i] += 1
+                print('Warning: Retrying %s after %s' % (names[i], type(error).__name__))
+                todo.append(i)
+
+    return results
+
+
+def _start_thread(func, args):
+    """
+    Calls a function in a new daemon thread, returning a future for its result.
     """
-    eeg_files = glob.glob(os.path.join(db_path, 'ephys', 'current_processed', '*.bdf'))
-    eeg_files = [''] if len(eeg_files) == 0 else eeg_files
-    events_file = os.path.join(db_path, 'behavioral', 'current_processed', 'task_events.json')
-    session_log = os.path.join(sess_path, 'session.jsonl')
+    future = Future()
 
-    filepaths = ['' for _ in range(8)]
-    filepaths[0] = eeg_files[0]
-    filepaths[1] = 'EEG' if filepaths[0] != '' else ''
-    filepaths[2] = events_file if os.path.exists(events_file) else session_log
-    filepaths[3] = 'Behavioral' if os.path.exists(events_file) else 'Session Log'
-    filepaths[4] = eeg_files[1] if len(eeg_files) > 1 else ''
-    filepaths[5] = 'EEG' if filepaths[4] != '' else ''
-    filepaths[6] = eeg_files[2] if len(eeg_files) > 2 else ''
-    filepaths[7] = 'EEG' if filepaths[6] != '' else ''
+    def run():
+        try:
+            future.set_result(func(*args))
+        except BaseException as e:
+            future.set_exception(e)
 
-    return filepaths
+    threading.Thread(target=run, daemon=True).start()
+    return future
@@ -1,8 +1,9 @@
 import os
 import numpy as np
 import pandas as pd
-import datetime as dt
 from glob import glob
+from cache import read_csv_cached
+from info_schema import set_info_dtypes
 
 # Mapping of month names to numbers
 MONTH_DICT = dict(
@@ -38,119 +39,161 @@ CMLDB_SUBJ_FIELDS = ('gender',)
 SUBJ_INFO_FIELDS = ('hand_throw', 'hand_toothbrush', 'hand_scissors', 'hand_write')
 
 
-def get_info(start_date, end_date, ltp_path='/data/eeg/scalp/ltp/'):
+def get_info(start_date, end_date, ltp_path='/data/eeg/scalp/ltp/', cache_dir=None, windows=None):
     """
     Loads information about all sessions (from the cmldb_sess_info_<exp>.txt files) and subjects (from the
-    cmldb_subj_info_<exp>.txt files). Then, selects only the sessions which occurred in the specified date range.
-    Finally, adds subject information to each session and returns it as a data frame.
+    cmldb_subj_info_<exp>.txt files). Then, selects only the sessions which occurred in the specified date range (or in
+    one of the specified date windows). Finally, adds subject information to each session and returns it as a data
+    frame.
 
     Information handled by this function includes the subject, date, time, experiment, session number, hours of sleep,
     alertness, and gender associated with each session.
 
     To be added: handedness information.
 
+    Columns are given the types listed in info_schema.INFO_DTYPES, e.g. the date is a datetime.
+
     :param start_date: A datetime date object indicating earliest date to include sessions from (inclusive).
     :param end_date: A datetime date object indicating latest date to include sessions from (inclusive).
     :param ltp_path: The path to the standard LTP directory on Rhino (/data/eeg/scalp/ltp/).
-    :return: A data frame containing one row for each session.
+    :param cache_dir: The path to a local cache of parsed info files (Default=None, i.e. always read files from Rhino).
+    :param windows: A list of (start_date, end_date) pairs within the date range. If given, only sessions that fall
+        within one of them are included (Default=None, i.e. include every session in the date range).
+    :return: A data frame containing one row for each session, or None if no sessions fall within the date range.
     """
     # Load subject and session info
-    sess_info = get_sess_info(start_date, end_date, ltp_path)
-    subj_info = get_subj_info(ltp_path)
+    sess_info = get_sess_info(start_date, end_date, ltp_path, cache_dir, windows)
+    subj_info = get_subj_info(ltp_path, cache_dir)
 
+    if len(sess_info) == 0:
+        return None
+
+    # Add experiment name and ID to session info
     for exp in sess_info:
-        # Add experiment name and ID to session info
-        exp_id = EXP_DICT[exp]
-        sess_info[exp]['experiment'] = pd.Series([exp for _ in range(len(sess_info[exp]))], index=sess_info[exp].index)
-        sess_info[exp]['experiment_id'] = pd.Series([exp_id for _ in range(len(sess_info[exp]))], index=sess_info[exp].index)
-        # Create fields for subject info in data frame
-        for key in CMLDB_SUBJ_FIELDS:
-            sess_info[exp][key] = pd.Series(None, index=sess_info[exp].index)
-        for key in SUBJ_INFO_FIELDS:
-            sess_info[exp][key] = pd.Series(None, index=sess_info[exp].index)
-        # Add subject info from CMLDB and subject info questionnaire to each session
-        for i, sess_data in sess_info[exp].iterrows():
-            subj = subj_info[sess_data.subject]
-            for key in CMLDB_SUBJ_FIELDS:
-                sess_info[exp].loc[i, key] = subj[key] if key in subj else np.nan
-            for key in SUBJ_INFO_FIELDS:
-                sess_info[exp].loc[i, key] = subj[key] if key in subj else np.nan
-
-    # Merge session info from all experiments into a single frame
-    info = None
-    for exp in sess_info:
-        if info is None:
-            info = sess_info[exp]
-        else:
-            info = info.merge(sess_info[exp], how='outer')
+        sess_info[exp]['experiment'] = exp
+        sess_info[exp]['experiment_id'] = EXP_DICT[exp]
+
+    # Stack session info from all experiments into a single frame
+    info = pd.concat(list(sess_info.values()), ignore_index=True, sort=False)
+
+    # Make sure every session's subject has an entry in CMLDB
+    missing = np.setdiff1d(info.subject.unique(), subj_info.index)
+    if len(missing) > 0:
+        raise KeyError('No CMLDB subject info found for subjects: %s' % ', '.join(missing))
+
+    # Add subject info from CMLDB and subject info questionnaire to all sessions at once, then give each column its type
+    info = info.join(subj_info, on='subject')
+    info = set_info_dtypes(info)
 
     return info
 
 
-def get_sess_info(start_date, end_date, ltp_path='/data/eeg/scalp/ltp/'):
+def get_sess_info(start_date, end_date, ltp_path='/data/eeg/scalp/ltp/', cache_dir=None, windows=None):
     """
     Loads information about all sessions from the cmldb_sess_info_<exp>.txt files present in each experiment's LTP
-    directory. Only returns data from sessions that took place in the specified date range.
+    directory. Only returns data from sessions that took place in the specified date range (or in one of the specified
+    date windows).
 
     :param start_date: A datetime date object indicating earliest date to include sessions from (inclusive).
     :param end_date: A datetime date object indicating latest date to include sessions from (inclusive).
     :param ltp_path: The path to the standard LTP directory on Rhino (/data/eeg/scalp/ltp/).
+    :param cache_dir: The path to a local cache of parsed info files (Default=None, i.e. always read files from Rhino).
+    :param windows: A list of (start_date, end_date) pairs within the date range. If given, only sessions that fall
+        within one of them are returned (Default=None, i.e. return every session in the date range).
     :return: A dictionary mapping experiment names to data frames containing one row for each session.
     """
+    windows = [(start_date, end_date)] if windows is None else windows
+
     # Find the cmldb_sess_info file for each experiment
     info_files = glob(os.path.join(ltp_path, '*/cmldb_sess_info_*.txt'))
 
     # For each experiment/file, find all sessions that fall within the specified date range
     data = {}
     for f in info_files:
-        info = pd.read_csv(f, delimiter='\t')
-        mask = np.zeros(len(info), dtype=bool)
-        # Check whether each session falls within the date range
-        for i, sess in info.iterrows():
-            info.loc[i, 'month'] = MONTH_DICT[sess.month]
-            sess_date = dt.date(sess.year, info.loc[i, 'month'], sess.day)
-            if start_date <= sess_date <= end_date:
-                mask[i] = True
-        # Keep only the sessions that fall within the date range, and for those sessions create a MM/DD/YYYY date field
+        info = read_csv_cached(f, cache_dir, delimiter='\t')
+        # Convert month names to numbers and build the date of every session at once
+        info['month'] = info['month'].map(MONTH_DICT)
+        sess_dates = pd.to_datetime(info[['year', 'month', 'day']])
+        # Check whether each session falls within the date range (or windows)
+        mask = in_date_windows(sess_dates, windows)
+        # Keep only the sessions that fall within the date range, and for those sessions add the date and the start and
+        # end times of the session as datetimes
         if mask.sum() > 0:
             exp_name = os.path.basename(os.path.splitext(f)[0])[16:]
-            data[exp_name] = info.loc[mask]
-            data[exp_name]['date'] = pd.Series(None, index=data[exp_name].index)
-            for i, sess in data[exp_name].iterrows():
-                sess_date = dt.date(sess.year, sess.month, sess.day)
-                data[exp_name].loc[i, 'date'] = sess_date.strftime('%m/%d/%Y')
+            data[exp_name] = info.loc[mask].copy()
+            data[exp_name]['date'] = sess_dates[mask]
+            data[exp_name]['session_start'], data[exp_name]['session_end'] = \
+                _session_times(data[exp_name].date, data[exp_name].start_time, data[exp_name].end_time)
 
     return data
 
 
-def get_subj_info(ltp_path='/data/eeg/scalp/ltp/'):
+def get_subj_info(ltp_path='/data/eeg/scalp/ltp/', cache_dir=None):
     """
-    Loads information about all subjects from the cmldb_sess_info_<exp>.txt files present in each experiment's LTP
+    Loads information about all subjects from the cmldb_subj_info_<exp>.txt files present in each experiment's LTP
     directory. Then load information from the participant information questionnaire (ltp/SubjectInfo/subject_info.csv).
 
+    Subjects who appear in multiple experiments are only kept once. If their CMLDB fields (e.g. gender) disagree across
+    experiments, a warning is printed and the entry from the last file read is used. Questionnaire responses are matched
+    to subjects through the semicolon-separated list of IDs in the snum column.
+
     :param ltp_path: The path to the standard LTP directory on Rhino (/data/eeg/scalp/ltp/).
-    :return: A dictionary mapping subject IDs to dictionaries of subject information.
+    :param cache_dir: The path to a local cache of parsed info files (Default=None, i.e. always read files from Rhino).
+    :return: A data frame indexed by subject ID, containing one column for each CMLDB and questionnaire field.
     """
     # Find the cmldb_subj_info file for each experiment
     info_files = glob(os.path.join(ltp_path, '*/cmldb_subj_info_*.txt'))  # Subject info files from CMLDB
     info_spreadsheet = os.path.join(ltp_path, 'SubjectInfo/subject_info.csv')  # Answers from subject info questionnaire
+    cmldb_cols = ['subject'] + list(CMLDB_SUBJ_FIELDS)
+    subj_info_cols = list(SUBJ_INFO_FIELDS)
 
-    # Load CMLDB subject data for each experiment/file and enter it into a dictionary
-    data = {}
-    for f in info_files:
-        info = pd.read_csv(f, delimiter='\t')
-        for i, subj in info.iterrows():
-            data[subj.subject] = {}
-            for key in CMLDB_SUBJ_FIELDS:
-                data[subj.subject][key] = subj[key]
-
-    # Load information from subject info questionnaire and add it to each participant's dictionary
-    info = pd.read_csv(info_spreadsheet, delimiter=',')
-    for i, subj in info.iterrows():
-        names = subj.snum.split(';')
-        for name in names:
-            if name in data:
-                for key in SUBJ_INFO_FIELDS:
-                    data[name][key] = subj[key]
+    # Load CMLDB subject data from all experiments/files into a single table, dropping exact duplicates
+    cmldb = [read_csv_cached(f, cache_dir, delimiter='\t', usecols=cmldb_cols) for f in info_files]
+    cmldb = pd.concat(cmldb, ignore_index=True) if len(cmldb) > 0 else pd.DataFrame(columns=cmldb_cols)
+    cmldb = cmldb.drop_duplicates()
+
+    # Report subjects whose CMLDB information differs between experiments, then keep one entry per subject
+    conflicts = cmldb.subject[cmldb.subject.duplicated()].unique()
+    if len(conflicts) > 0:
+        print('Warning: Conflicting CMLDB subject info for subjects: %s' % ', '.join(conflicts))
+    data = cmldb.drop_duplicates('subject', keep='last').set_index('subject')
+
+    # Load subject info questionnaire and give each of a participant's IDs its own row
+    info = read_csv_cached(info_spreadsheet, cache_dir, delimiter=',', usecols=['snum'] + subj_info_cols)
+    info['subject'] = info.snum.str.split(';')
+    info = info.explode('subject').dropna(subset=['subject'])
+    info = info.drop_duplicates('subject', keep='last').set_index('subject')[subj_info_cols]
+
+    # Add questionnaire responses to each participant's CMLDB information
+    data = data.join(info)
 
     return data
+
+
+def in_date_windows(dates, windows):
+    """
+    Checks which dates fall within any of several date ranges.
+
+    :param dates: A series of datetimes, e.g. the date column of the session info data frame.
+    :param windows: A list of (start_date, end_date) pairs of datetime date objects, each indicating the earliest and
+        latest date of a range (inclusive).
+    :return: A boolean array with one entry for each date, which is True if the date falls within any of the ranges.
+    """
+    mask = np.zeros(len(dates), dtype=bool)
+    for start_date, end_date in windows:
+        mask |= ((dates >= pd.Timestamp(start_date)) & (dates <= pd.Timestamp(end_date))).to_numpy()
+
+    return mask
+
+
+def _session_times(dates, start_times, end_times):
+    """
+    Combines session dates with the start and end times recorded in CMLDB. Times that cannot be parsed are left empty,
+    and sessions that end earlier in the day than they start (i.e. cross midnight) are taken to end on the next day.
+    """
+    days = dates.dt.strftime('%Y-%m-%d ')
+    start = pd.to_datetime(days + start_times.astype(str), errors='coerce')
+    end = pd.to_datetime(days + end_times.astype(str), errors='coerce')
+    end = end.where(~(end < start), end + pd.Timedelta(days=1))
+
+    return start, end
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+# Data types of the session info data frame's columns, grouped by the stage that adds them. Labels with few distinct
+# values are categoricals, counts and ratings are small nullable integers (so missing values stay missing instead of
+# turning the column into floats), and dates and times are datetimes. Columns not listed here (e.g. subject GUIDs,
+# recording times as entered in CMLDB, and data file paths) are text.
+INFO_DTYPES = dict(
+    # get_info
+    subject='category',
+    experiment='category',
+    experiment_id='Int16',
+    session='Int16',
+    year='Int16',
+    month='Int8',
+    day='Int8',
+    date='datetime64[ns]',
+    session_start='datetime64[ns]',
+    session_end='datetime64[ns]',
+    location='category',
+    alertness='Int8',
+    gender='category',
+    hand_throw='Int8',
+    hand_toothbrush='Int8',
+    hand_scissors='Int8',
+    hand_write='Int8',
+    # get_extra_info
+    age_in_months='Int16',
+    cap_size='category',
+    # get_filepaths
+    data_file1_type='category',
+    data_file2_type='category',
+    data_file3_type='category',
+    data_file4_type='category',
+    data_file1_size='Int64',
+    data_file1_mtime='Int64',
+    data_file2_size='Int64',
+    data_file2_mtime='Int64',
+    data_file3_size='Int64',
+    data_file3_mtime='Int64',
+    data_file4_size='Int64',
+    data_file4_mtime='Int64',
+    # get_bdf_info
+    bdf_start='datetime64[ns]',
+    bdf_end='datetime64[ns]',
+    bdf_n_channels='Int16'
+)
+
+
+def set_info_dtypes(df, cols=None):
+    """
+    Converts the columns of a session info data frame to the types listed in INFO_DTYPES. Columns that are not present
+    in the data frame or not listed in INFO_DTYPES are left as they are. Values of integer columns that are not whole
+    numbers within the range of the column's type (e.g. a handedness rating entered as "2.5" or "right") are left
+    empty, and a warning listing them is printed.
+
+    :param df: A data frame containing some or all of the session info columns.
+    :param cols: The columns to convert (Default=None, i.e. every column listed in INFO_DTYPES).
+    :return: The data frame with its columns converted.
+    """
+    cols = INFO_DTYPES if cols is None else cols
+    dtypes = dict((col, INFO_DTYPES[col]) for col in cols if col in INFO_DTYPES and col in df.columns)
+    int_cols = [col for col, dtype in dtypes.items() if dtype.startswith('Int')]
+    df = df.astype(dict((col, dtype) for col, dtype in dtypes.items() if col not in int_cols))
+    if len(int_cols) > 0:
+        df = df.assign(**dict((col, _as_int(df[col], col, dtypes[col])) for col in int_cols))
+
+    return df
+
+
+def _as_int(values, col, dtype):
+    """
+    Converts a column to a nullable integer type, leaving values that are not whole numbers within the type's range
+    empty.
+    """
+    try:
+        return values.astype(dtype)
+    except (TypeError, ValueError):
+        pass
+    numbers = pd.to_numeric(values, errors='coerce').astype(float)
+    limits = np.iinfo(dtype.lower())
+    valid = (numbers % 1 == 0) & (numbers >= limits.min) & (numbers <= limits.max)
+    bad = ~valid & values.notna() & values.astype(str).str.strip().ne('')
+    if bad.any():
+        examples = list(values[bad].astype(str).unique())
+        examples = ', '.join(examples[:10]) + (', ...' if len(examples) > 10 else '')
+        print('Warning: %s values of %s are not whole numbers from %s to %s and were left empty: %s' %
+              (bad.sum(), col, limits.min, limits.max, examples))
+    return numbers.where(valid).astype(dtype)
@@ -0,0 +1,292 @@
+import os
+import sys
+import glob
+import json
+import time
+import cProfile
+import builtins
+import threading
+import datetime as dt
+from contextlib import contextmanager
+from get_filepaths import FILEPATH_COLS, FILE_STAT_COLS
+try:
+    import resource
+except ImportError:  # Not available on Windows, where peak memory is not reported
+    resource = None
+
+# Kinds of file system calls counted by count_fs_calls. The high-level calls (glob, exists) are made up of low-level
+# ones, so e.g. an os.path.exists call is also counted as a stat.
+FS_CALLS = ('glob', 'exists', 'stat', 'scandir', 'listdir', 'open')
+
+# Hooks currently active in patch_fs_calls (replaced rather than changed in place, so that patched calls can read it
+# without taking the lock), the lock held while hooks are added or removed, and the unpatched file system functions
+_hooks = ()
+_hooks_lock = threading.Lock()
+_originals = {}
+
+
+def new_report(**settings):
+    """
+    Creates an empty run report, to be filled in by measure_stage and summarize_experiments.
+
+    :param settings: Any settings of the run that should be recorded in the report.
+    :return: A dictionary containing the run report.
+    """
+    return dict(started=dt.datetime.now().isoformat(timespec='seconds'), settings=settings, stages=[],
+                experiments={})
+
+
+@contextmanager
+def measure_stage(report, name, rows_in=None, profile_path=None):
+    """
+    Context manager that measures one stage of the pipeline and adds it to the run report: its wall and CPU time, how
+    much it raised the peak memory usage of the process, the number of rows going in and out, and the number of file
+    system calls of each kind (see FS_CALLS) made by all threads during the stage (see patch_fs_calls). The number of
+    rows coming out should be entered into the dictionary it yields as rows_out. A stage that is run more than once
+    (e.g. once for each chunk of sessions) is reported as a single stage, with its times, rows, and calls added up, and
+    the largest rise in peak memory of any of its runs.
+
+    The rise in peak memory is measured from the peak resident memory of the process before the stage, so a stage
+    that uses less memory than an earlier stage already did is reported as 0 MB, and the stage that raises the peak
+    is the one to look at when the process runs out of memory.
+
+    :param report: The run report created by new_report.
+    :param name: The name of the stage.
+    :param rows_in: The number of rows passed into the stage (Default=None).
+    :param profile_path: If given, the stage is profiled with cProfile and the statistics are saved at this path
+        (Default=None).
+    :return: The dictionary describing the stage, which is also added to the report.
+    """
+    stage = dict(name=name, rows_in=rows_in, rows_out=None)
+    profiler = None if profile_path is None else cProfile.Profile()
+    wall, cpu, memory = time.perf_counter(), time.process_time(), _peak_memory_mb()
+    with count_fs_calls() as fs_calls:
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield stage
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(profile_path)
+    stage.update(wall_time=time.perf_counter() - wall, cpu_time=time.process_time() - cpu,
+                 peak_memory_growth_mb=None if memory is None else _peak_memory_mb() - memory,
+                 fs_calls=dict(fs_calls), runs=1)
+
+    # Add repeated runs of a stage to its first run
+    previous = [s for s in report['stages'] if s['name'] == name]
+    if len(previous) == 0:
+        report['stages'].append(stage)
+        return
+    previous = previous[0]
+    for key in ('rows_in', 'rows_out'):
+        if stage[key] is not None:
+            previous[key] = stage[key] + (previous[key] or 0)
+    for key in ('wall_time', 'cpu_time', 'runs'):
+        previous[key] += stage[key]
+    for kind, n in stage['fs_calls'].items():
+        previous['fs_calls'][kind] += n
+    if stage['peak_memory_growth_mb'] is not None:
+        previous['peak_memory_growth_mb'] = max(previous['peak_memory_growth_mb'], stage['peak_memory_growth_mb'])
+
+
+def summarize_experiments(report, info):
+    """
+    Adds the number of sessions, subjects, and data files, and the total size of the data files, for each experiment in
+    the session info data frame to the run report.
+
+    :param report: The run report created by new_report.
+    :param info: Data frame containing one row for each session's information, including data file paths and sizes.
+    :return: The report's per-experiment summary, a dictionary mapping each experiment to its counts.
+    """
+    n_files = sum(info[col].fillna('').astype(str).str.len().gt(0) for col in FILEPATH_COLS[::2])
+    n_bytes = sum(info[col].fillna(0).astype('int64') for col in FILE_STAT_COLS[::2])
+    summary = info.assign(n_files=n_files, n_bytes=n_bytes).groupby('experiment', observed=True).agg(
+        sessions=('session', 'size'), subjects=('subject', 'nunique'), files=('n_files', 'sum'),
+        bytes=('n_bytes', 'sum'))
+    report['experiments'] = dict((exp, dict((k, int(v)) for k, v in row.items())) for exp, row in summary.iterrows())
+
+    return report['experiments']
+
+
+def write_report(report, report_path):
+    """
+    Saves the run report as a JSON file.
+
+    :param report: The run report created by new_report.
+    :param report_path: The path at which to save the report.
+    :return: None
+    """
+    tmp_path = report_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    os.replace(tmp_path, report_path)
+
+
+def print_report(report):
+    """
+    Prints a short summary of the run report: one line for each stage and one line for each experiment.
+
+    :param report: The run report created by new_report.
+    :return: None
+    """
+    print('%-22s %9s %9s %9s %9s %9s %9s' % ('Stage', 'Wall (s)', 'CPU (s)', 'Mem+ (MB)', 'Rows in', 'Rows out',
+                                              'FS calls'))
+    for stage in report['stages']:
+        print('%-22s %9.2f %9.2f %9s %9s %9s %9s' %
+              (stage['name'], stage['wall_time'], stage['cpu_time'],
+               '-' if stage['peak_memory_growth_mb'] is None else '%.0f' % stage['peak_memory_growth_mb'],
+               '-' if stage['rows_in'] is None else stage['rows_in'],
+               '-' if stage['rows_out'] is None else stage['rows_out'],
+               sum(stage['fs_calls'][k] for k in ('stat', 'scandir', 'listdir', 'open'))))
+    for exp, counts in sorted(report['experiments'].items()):
+        print('%-22s %s sessions, %s subjects, %s files, %.2f GB' %
+              (exp, counts['sessions'], counts['subjects'], counts['files'], counts['bytes'] / 1073741824.))
+
+
+@contextmanager
+def count_fs_calls():
+    """
+    Context manager that counts the file system calls of each kind (see FS_CALLS) made by all threads while it is
+    active (see patch_fs_calls).
+
+    :return: A dictionary mapping each kind of call to the number of times it was made, updated as calls are made.
+    """
+    counts = dict((k, 0) for k in FS_CALLS)
+    lock = threading.Lock()
+
+    def count(kind):
+        with lock:
+            counts[kind] += 1
+
+    with patch_fs_calls(count):
+        yield counts
+
+
+@contextmanager
+def patch_fs_calls(hook):
+    """
+    Context manager that calls a hook function before every file system call made through glob.glob/iglob,
+    os.path.exists, os.stat, os.lstat, os.scandir (and the stat() of each entry it returns), os.listdir, and open. The
+    hook is called with the kind of call (see FS_CALLS) and can be used to count calls or to delay them.
+
+    The patches are process-wide: the hook sees calls made by every thread, including threads that have nothing to do
+    with the caller, so counts taken while other work is running include that work's calls too. Any number of hooks
+    can be active at once, and contexts may be entered and exited by different threads in any order. The functions are
+    patched when the first hook is added and restored when the last one is removed.
+
+    :param hook: A function taking the kind of call as its only argument.
+    :return: None
+    """
+    global _hooks
+    with _hooks_lock:
+        if len(_hooks) == 0:
+            _install_fs_patches()
+        _hooks = _hooks + (hook,)
+    try:
+        yield
+    finally:
+        with _hooks_lock:
+            hooks = list(_hooks)
+            hooks.remove(hook)
+            _hooks = tuple(hooks)
+            if len(_hooks) == 0:
+                _remove_fs_patches()
+
+
+def _call_hooks(kind):
+    """
+    Calls every active hook of patch_fs_calls with the kind of file system call about to be made.
+    """
+    for hook in _hooks:
+        hook(kind)
+
+
+def _install_fs_patches():
+    """
+    Replaces the file system functions listed in patch_fs_calls with versions that call the active hooks first.
+    """
+    def hooked(func, kind):
+        def wrapper(*args, **kwargs):
+            _call_hooks(kind)
+            return func(*args, **kwargs)
+        return wrapper
+
+    def hooked_scandir(*args, **kwargs):
+        _call_hooks('scandir')
+        return _HookedScandir(_originals['scandir'](*args, **kwargs), _call_hooks)
+
+    _originals.update(iglob=glob.iglob, exists=os.path.exists, stat=os.stat, lstat=os.lstat, scandir=os.scandir,
+                      listdir=os.listdir, open=builtins.open)
+    glob.iglob = hooked(glob.iglob, 'glob')  # glob.glob is built on iglob
+    os.path.exists = hooked(os.path.exists, 'exists')
+    os.stat, os.lstat = hooked(os.stat, 'stat'), hooked(os.lstat, 'stat')
+    os.scandir, os.listdir = hooked_scandir, hooked(os.listdir, 'listdir')
+    builtins.open = hooked(builtins.open, 'open')
+
+
+def _remove_fs_patches():
+    """
+    Restores the file system functions replaced by _install_fs_patches.
+    """
+    glob.iglob, os.path.exists = _originals['iglob'], _originals['exists']
+    os.stat, os.lstat = _originals['stat'], _originals['lstat']
+    os.scandir, os.listdir = _originals['scandir'], _originals['listdir']
+    builtins.open = _originals['open']
+    _originals.clear()
+
+
+class _HookedScandir(object):
+    """
+    Wraps an os.scandir iterator so that calling stat() on any of its entries also calls the hook. Entry types come from
+    the directory listing itself, so is_dir() and is_file() do not.
+    """
+    def __init__(self, it, hook):
+        self._it = it
+        self._hook = hook
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return _HookedDirEntry(next(self._it), self._hook)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._it.close()
+
+    def close(self):
+        self._it.close()
+
+
+class _HookedDirEntry(object):
+    """
+    Wraps an os.DirEntry, calling the hook before its stat() method.
+    """
+    def __init__(self, entry, hook):
+        self._entry = entry
+        self._hook = hook
+        self.name = entry.name
+        self.path = entry.path
+
+    def __getattr__(self, attr):
+        return getattr(self._entry, attr)
+
+    def __fspath__(self):
+        return self.path
+
+    def stat(self, **kwargs):
+        self._hook('stat')
+        return self._entry.stat(**kwargs)
+
+
+def _peak_memory_mb():
+    """
+    Returns the peak resident memory of the process so far in MB, or None where it is not available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1048576. if sys.platform == 'darwin' else peak / 1024.  # Bytes on macOS, kilobytes on Linux
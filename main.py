@@ -1,11 +1,21 @@
 import os
+import sys
 import pandas as pd
 import datetime as dt
-from get_info import get_info
+from get_info import get_info, in_date_windows
 from get_extra_info import get_extra_info
-from get_filepaths import get_filepaths
+from get_filepaths import get_filepaths, FILEPATH_COLS, FILE_STAT_COLS
 from fill_info import fill_info
 from write_info import write_info
+from cache import clear_cache, evict_cache, hold_cache_writes
+from manifest import load_manifest, find_changed_sessions, record_submission
+from bdf_header import get_bdf_info, check_recording_times
+from event_files import check_event_files
+from checksums import write_checksums
+from duplicates import find_duplicate_files
+from nda_validation import load_definitions, validate_spreadsheet, check_data_files, print_problems
+from staging import stage_files
+from instrumentation import new_report, measure_stage, summarize_experiments, write_report, print_report
 
 #####
 # SETTINGS
@@ -17,29 +27,235 @@ eeg_sub_files_path = os.path.expanduser('~/Desktop/NIMH_Share_Aug23/eeg_sub_file
 extra_info_path = os.path.expanduser('~/Desktop/NIMH_Share_Aug23/extra_data.txt')  # Path to manually-compiled info
 date_range_start = dt.date(year=2023, month=3, day=1)  # Earliest session date to include (inclusive)
 date_range_end = dt.date(year=2023, month=8, day=1)  # Latest session date to include (inclusive)
+date_windows = None  # List of (start, end) date pairs to write separate spreadsheets for in one run (None: one range)
+n_workers = 16  # Number of sessions to look up on Rhino concurrently (1 to look them up one at a time)
+fs_timeout = 120  # Seconds to wait for a single directory walk or file lookup on Rhino before retrying (None: forever)
+fs_retries = 2  # Number of times to retry a directory walk or file lookup that timed out or failed
+cache_dir = os.path.expanduser('~/.cache/nimh_data_submission/')  # Path to local cache of parsed Rhino files (or None)
+cache_max_size = 2 * 1073741824  # Maximum size of each cache in bytes (least recently used entries are removed first)
+reset_cache = False  # If True, empty the cache before running
+manifest_path = os.path.expanduser('~/Desktop/nimh_submission_manifest.csv')  # Path to record of submitted sessions
+incremental = False  # If True, only include sessions that are new or whose data files changed since they were submitted
+save_to_manifest = False  # If True, record this run's sessions in the manifest (only for the run that gets submitted)
+check_bdf_headers = True  # If True, read recording times from the BDF file headers and compare them to CMLDB
+recording_time_tolerance = 10  # Largest allowed difference (in minutes) between BDF and CMLDB recording times
+validate_event_files = True  # If True, check that all JSON/JSONL event files parse and match their subject and session
+nda_definitions_dir = None  # Folder of NDA data dictionaries (<name>_definitions.csv) to validate against (or None)
+check_duplicates = True  # If True, look for data files listed by more than one session or with identical contents
+fail_on_duplicates = False  # If True, stop the run (before the spreadsheets are written) if any duplicates are found
+compute_checksums = True  # If True, write MD5 and SHA-256 checksums of all data files next to eeg_sub_files01.csv
+staging_dir = None  # Local folder to copy all data files into for upload, rewriting the spreadsheet paths (or None)
+n_processes = 4  # Number of processes for CPU-heavy work (parsing event files, decompressing .bdf.bz2 recordings)
+report_path = os.path.expanduser('~/Desktop/NIMH_Share_Aug23/run_report.json')  # Path to JSON run report (or None)
+profile_stage = None  # Name of one stage to profile with cProfile, e.g. 'get_filepaths' (None to profile nothing)
+chunk_size = None  # Number of sessions to process and write to the spreadsheets at a time (None for all at once)
 
 #####
 # PIPELINE
 #####
 if __name__ == "__main__":
 
+    # Set up the local caches of parsed metadata files, resolved file paths, BDF headers, checksums, partial hashes, and
+    # event files
+    metadata_cache_dir = None if cache_dir is None else os.path.join(cache_dir, 'metadata')
+    filepaths_cache_dir = None if cache_dir is None else os.path.join(cache_dir, 'filepaths')
+    bdf_cache_dir = None if cache_dir is None else os.path.join(cache_dir, 'bdf_headers')
+    checksum_cache_dir = None if cache_dir is None else os.path.join(cache_dir, 'checksums')
+    partial_hash_cache_dir = None if cache_dir is None else os.path.join(cache_dir, 'partial_hashes')
+    event_cache_dir = None if cache_dir is None else os.path.join(cache_dir, 'event_files')
+    if reset_cache and cache_dir is not None:
+        clear_cache(cache_dir)
+
+    # Batch mode loads and resolves all sessions in the union of the date windows once, then writes each window's
+    # sessions to their own spreadsheets (named after the window)
+    windows = [(date_range_start, date_range_end)] if date_windows is None else list(date_windows)
+    batch = date_windows is not None
+
+    # Measure the time, memory, and file system calls of each stage, and profile one stage if requested
+    report = new_report(date_windows=windows, n_workers=n_workers, cache_dir=cache_dir, incremental=incremental)
+    profile_dir = os.path.dirname(eeg_sub_files_path)
+
+    def stage(name, rows_in=None, label=None):
+        full_name = name if label is None else '%s %s' % (name, label)
+        profile_path = os.path.join(profile_dir, '%s.prof' % full_name.replace(' ', '_')) \
+            if name == profile_stage else None
+        return measure_stage(report, full_name, rows_in=rows_in, profile_path=profile_path)
+
     # Load spreadsheet headers and save original column order (for when we write the CSV later)
     ed = pd.read_csv(eeg_details_path, header=1, nrows=0)
     esf = pd.read_csv(eeg_sub_files_path, header=1, nrows=0)
     ed_col_order = ed.columns
     esf_col_order = esf.columns
 
-    # Load subject and session information into a data frame
-    info = get_info(date_range_start, date_range_end, ltp_path=ltp_path)
+    # Load subject and session information into a data frame, keeping only sessions that fall within a date window
+    with stage('get_info') as s:
+        info = get_info(min(w[0] for w in windows), max(w[1] for w in windows), ltp_path=ltp_path,
+                        cache_dir=metadata_cache_dir, windows=windows)
+        if info is None:
+            print('No sessions found between %s and %s' % (min(w[0] for w in windows), max(w[1] for w in windows)))
+            sys.exit()
+        s['rows_out'] = len(info)
+
+    # Name each window's spreadsheets
+    outputs = []
+    for start, end in windows:
+        label = '%s-%s' % (start.strftime('%Y%m%d'), end.strftime('%Y%m%d')) if batch else None
+        suffix = ('' if label is None else '_' + label) + ('_delta' if incremental else '')
+        outputs.append(dict(start=start, end=end, label=label,
+                            ed_path=os.path.splitext(eeg_details_path)[0] + suffix + '.csv',
+                            esf_path=os.path.splitext(eeg_sub_files_path)[0] + suffix + '.csv',
+                            checksums_name='checksums.csv' if label is None else 'checksums_%s.csv' % label,
+                            validation_name='validation.csv' if label is None else 'validation_%s.csv' % label,
+                            n_rows=0, problems=[]))
+
+    # Load the NDA data dictionaries to validate the spreadsheets against
+    validate = nda_definitions_dir is not None
+    if validate:
+        ed_definitions = load_definitions(os.path.join(nda_definitions_dir, 'eeg_details01_definitions.csv'))
+        esf_definitions = load_definitions(os.path.join(nda_definitions_dir, 'eeg_sub_files01_definitions.csv'))
+
+    # In streaming mode, sessions go through the remaining stages in fixed-size chunks, and each chunk is appended to
+    # partial spreadsheets (.part files) as soon as it is done. Only the columns needed by the checksum, manifest, and
+    # report stages are kept from each chunk, so memory use does not grow with the number of sessions. Cache entries are
+    # kept in memory between chunks, rather than read and written again by every chunk.
+    streaming = chunk_size is not None
+    chunks = [info.iloc[i:i + chunk_size] for i in range(0, max(len(info), 1), chunk_size)] if streaming else [info]
+    keep_cols = ['subject', 'experiment', 'session', 'date'] + list(FILEPATH_COLS) + list(FILE_STAT_COLS)
+    done = []
+    staged_done = []
+    n_sessions = len(info)
+    n_changed = 0
+    with hold_cache_writes():
+        for n, info in enumerate(chunks):
+
+            # Load extra manually-compiled information (date of birth, head circumference, cap size) into the data frame
+            with stage('get_extra_info', len(info)) as s:
+                info = get_extra_info(info, extra_info_path)
+                s['rows_out'] = len(info)
+
+            # Identify data file paths for each session, and add them to the data frame
+            with stage('get_filepaths', len(info)) as s:
+                info = get_filepaths(info, ltp_path=ltp_path, protocols_path=protocols_path, n_workers=n_workers,
+                                     timeout=fs_timeout, retries=fs_retries, cache_dir=filepaths_cache_dir)
+                s['rows_out'] = len(info)
+
+            # Read recording information from the BDF file headers and check it against the session info from CMLDB
+            if check_bdf_headers:
+                with stage('check_bdf_headers', len(info)) as s:
+                    info = get_bdf_info(info, n_workers=n_workers, cache_dir=bdf_cache_dir)
+                    check_recording_times(info, tolerance=recording_time_tolerance)
+                    s['rows_out'] = len(info)
+
+            # Check that every behavioral event file is complete and belongs to its session
+            if validate_event_files:
+                with stage('validate_event_files', len(info)) as s:
+                    event_files = check_event_files(info, n_processes=n_processes, cache_dir=event_cache_dir)
+                    s['rows_out'] = len(event_files)
+
+            # In incremental mode, drop sessions that were already submitted with the same data files, and write delta
+            # files
+            if incremental:
+                with stage('incremental', len(info)) as s:
+                    info = info.loc[find_changed_sessions(info, load_manifest(manifest_path))]
+                    n_changed += len(info)
+                    s['rows_out'] = len(info)
+
+            # Copy or link every data file into the staging folder, and point the spreadsheets at the staged copies
+            staged_info = info
+            if staging_dir is not None:
+                with stage('stage_files', len(info)) as s:
+                    staged_info = stage_files(info, staging_dir, n_workers=n_workers, n_processes=n_processes)
+                    s['rows_out'] = len(staged_info)
+
+            for out in outputs:
+                # Select the window's sessions
+                window_info = staged_info.loc[in_date_windows(staged_info.date, [(out['start'], out['end'])])] \
+                    if batch else staged_info
+
+                # Fill out the two spreadsheets with
+                with stage('fill_info', len(window_info), out['label']) as s:
+                    window_ed, window_esf = fill_info(ed, esf, window_info)
+                    s['rows_out'] = len(window_ed)
+
+                # Write data to the partial spreadsheets, adding to the ones started by the first chunk
+                with stage('write_info', len(window_ed), out['label']):
+                    write_info(window_ed, out['ed_path'] + '.part', ed_col_order, window_esf, out['esf_path'] + '.part',
+                               esf_col_order, append=n > 0)
+
+                # Check the spreadsheets against the NDA data dictionaries, and check that every data file exists
+                if validate:
+                    with stage('validate_spreadsheets', len(window_ed), out['label']) as s:
+                        out['problems'].extend([
+                            validate_spreadsheet(window_ed, ed_definitions, 'eeg_details01', out['n_rows'] + 1),
+                            validate_spreadsheet(window_esf, esf_definitions, 'eeg_sub_files01', out['n_rows'] + 1),
+                            check_data_files(window_esf, window_info, 'eeg_sub_files01', out['n_rows'] + 1)])
+                        s['rows_out'] = sum(len(p) for p in out['problems'][-3:])
+                out['n_rows'] += len(window_ed)
+
+            done.append(info[keep_cols] if streaming else info)
+            staged_done.append(staged_info[keep_cols] if streaming else staged_info)
+            if streaming:
+                print('Chunk %s/%s: %s of %s sessions written' %
+                      (n + 1, len(chunks), min((n + 1) * chunk_size, n_sessions), n_sessions))
+
+    info = pd.concat(done) if streaming else done[0]
+    staged_info = pd.concat(staged_done) if streaming else staged_done[0]
+    if incremental:
+        print('Incremental Submission: %s new or changed sessions' % n_changed)
+
+    # Look for data files that would be submitted more than once, and list them next to eeg_sub_files01.csv
+    if check_duplicates:
+        with stage('find_duplicates', len(info)) as s:
+            duplicates = find_duplicate_files(info, ltp_path=ltp_path, n_workers=n_workers,
+                                              cache_dir=partial_hash_cache_dir, checksum_cache_dir=checksum_cache_dir)
+            duplicates.to_csv(os.path.join(os.path.dirname(eeg_sub_files_path), 'duplicates.csv'), index=False)
+            s['rows_out'] = len(duplicates)
+        if fail_on_duplicates and len(duplicates) > 0:
+            for out in outputs:
+                os.remove(out['ed_path'] + '.part')
+                os.remove(out['esf_path'] + '.part')
+            raise ValueError('Found %s groups of duplicate data files (see duplicates.csv)' %
+                             duplicates.group.nunique())
+
+    # Move the finished spreadsheets into place, so that an interrupted or stopped run never leaves partial spreadsheets
+    # behind or replaces the spreadsheets of an earlier run
+    for out in outputs:
+        os.replace(out['ed_path'] + '.part', out['ed_path'])
+        os.replace(out['esf_path'] + '.part', out['esf_path'])
+
+    for out in outputs:
+        window_info = staged_info.loc[in_date_windows(staged_info.date, [(out['start'], out['end'])])] \
+            if batch else staged_info
+        if batch:
+            print('Date Window %s to %s: %s sessions' % (out['start'], out['end'], len(window_info)))
+
+        # Report every validation problem, and list them all next to eeg_sub_files01.csv
+        if validate:
+            # Problems with whole columns are found again in every chunk
+            problems = pd.concat(out['problems'], ignore_index=True).drop_duplicates().sort_values(
+                ['spreadsheet', 'row'], kind='stable', na_position='first', ignore_index=True)
+            print_problems(problems)
+            problems.to_csv(os.path.join(os.path.dirname(out['esf_path']), out['validation_name']), index=False)
 
-    # Load extra manually-compiled information (date of birth, head circumference, cap size) into the data frame
-    info = get_extra_info(info, extra_info_path)
+        # Compute checksums of every data file for integrity checking after upload
+        if compute_checksums:
+            with stage('checksums', len(window_info), out['label']):
+                checksums_path = os.path.join(os.path.dirname(out['esf_path']), out['checksums_name'])
+                write_checksums(window_info, checksums_path, n_workers=n_workers, cache_dir=checksum_cache_dir)
 
-    # Identify data file paths for each session, and add them to the data frame
-    info = get_filepaths(info, ltp_path=ltp_path, protocols_path=protocols_path)
+    # Add the submitted sessions and their data files to the manifest
+    if save_to_manifest:
+        with stage('record_submission', len(info)):
+            record_submission(manifest_path, info)
 
-    # Fill out the two spreadsheets with
-    ed, esf = fill_info(ed, esf, info)
+    # Keep each cache within its maximum size, now that every stage has written to it
+    if cache_dir is not None:
+        for d in (metadata_cache_dir, filepaths_cache_dir, bdf_cache_dir, checksum_cache_dir, partial_hash_cache_dir,
+                  event_cache_dir):
+            evict_cache(d, cache_max_size)
 
-    # Write data to spreadsheets
-    write_info(ed, eeg_details_path, ed_col_order, esf, eeg_sub_files_path, esf_col_order)
+    # Report how long each stage took and how much data each experiment contributed
+    summarize_experiments(report, info)
+    print_report(report)
+    if report_path is not None:
+        write_report(report, report_path)
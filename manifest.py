@@ -0,0 +1,100 @@
+import os
+import numpy as np
+import pandas as pd
+from get_filepaths import list_data_files
+
+# Columns of the submission manifest, which has one row for each data file submitted in each session
+MANIFEST_COLS = ('submission', 'submission_date', 'subject', 'experiment', 'session', 'data_file', 'data_file_type',
+                 'size', 'mtime')
+
+# Columns identifying a session
+SESSION_KEYS = ['subject', 'experiment', 'session']
+
+
+def load_manifest(manifest_path):
+    """
+    Loads the manifest of previously submitted sessions. Each submission is numbered, and each row of the manifest lists
+    one data file that was submitted for a session, along with its size and modification time at the time of submission.
+
+    :param manifest_path: The path to the manifest CSV file.
+    :return: A data frame containing the manifest (empty if no manifest has been written yet).
+    """
+    if not os.path.exists(manifest_path):
+        return pd.DataFrame(columns=MANIFEST_COLS)
+    manifest = pd.read_csv(manifest_path, dtype=dict(subject=str, experiment=str, data_file=str, data_file_type=str,
+                                                     size=str, mtime=str))
+    manifest[['data_file', 'data_file_type']] = manifest[['data_file', 'data_file_type']].fillna('')
+    for col in ('size', 'mtime'):  # Parsed from text, since files that were not found would turn mtimes into floats
+        manifest[col] = pd.array([None if pd.isna(v) else int(v) for v in manifest[col]], dtype='Int64')
+
+    return manifest
+
+
+def find_changed_sessions(info, manifest):
+    """
+    Identifies the sessions that need to be included in an incremental submission, i.e. sessions that have never been
+    submitted, and sessions whose data files (paths, sizes, or modification times) differ from the last time they were
+    submitted. The sizes and modification times in info must be current, as they are when taken from get_filepaths
+    (which stats the files of cached sessions again), so that files re-processed in place are noticed.
+
+    :param info: Data frame containing one row for each session's information, including data file paths.
+    :param manifest: The manifest of previously submitted sessions (see load_manifest).
+    :return: A boolean array with one entry for each row of info, which is True for new or changed sessions.
+    """
+    if len(manifest) == 0:
+        return np.ones(len(info), dtype=bool)
+
+    # Describe each session's current files and the files used in its most recent submission
+    current = _file_signatures(_session_files(info))
+    latest = manifest[manifest.submission == manifest.groupby(SESSION_KEYS).submission.transform('max')]
+    submitted = _file_signatures(latest)
+
+    # Compare the two for every session in info
+    keys = info[SESSION_KEYS].astype(dict(subject=str, experiment=str, session=int))
+    current = keys.merge(current, how='left', on=SESSION_KEYS).signature
+    submitted = keys.merge(submitted, how='left', on=SESSION_KEYS).signature
+    changed = (submitted.isna() | (current != submitted)).to_numpy()
+
+    return changed
+
+
+def record_submission(manifest_path, info):
+    """
+    Adds every session in the data frame to the manifest as a new submission, and saves the manifest.
+
+    :param manifest_path: The path to the manifest CSV file.
+    :param info: Data frame containing one row for each submitted session's information, including data file paths.
+    :return: The updated manifest.
+    """
+    manifest = load_manifest(manifest_path)
+    files = _session_files(info)
+    files.insert(0, 'submission', 1 if len(manifest) == 0 else manifest.submission.max() + 1)
+    files.insert(1, 'submission_date', pd.Timestamp.today().strftime('%Y-%m-%d'))
+    manifest = pd.concat([manifest, files[list(MANIFEST_COLS)]], ignore_index=True)
+
+    tmp_path = manifest_path + '.tmp'
+    manifest.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, manifest_path)
+
+    return manifest
+
+
+def _session_files(info):
+    """
+    Lists every data file of every session in the session info data frame, one per row. Sessions without any data files
+    (e.g. ltpFR) are listed once with an empty path, so that the manifest records that they were submitted.
+    """
+    files = list_data_files(info)
+    no_files = info.loc[~info.index.isin(files.index), SESSION_KEYS].assign(data_file='', data_file_type='')
+    files = pd.concat([files, no_files], ignore_index=True) if len(no_files) > 0 else files.reset_index(drop=True)
+    return files.astype(dict(subject=str, experiment=str, session=int, data_file_type=str))
+
+
+def _file_signatures(files):
+    """
+    Combines the paths, sizes, and modification times of each session's files into a single string per session. Files
+    that were listed but not found have no size or modification time.
+    """
+    stats = [files[col].astype('Int64').astype(str).where(files[col].notna(), '') for col in ('size', 'mtime')]
+    files = files.assign(signature=files.data_file + '|' + stats[0] + '|' + stats[1])
+    return files.groupby(SESSION_KEYS).signature.agg(lambda s: '\n'.join(sorted(s))).reset_index()
@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+from get_filepaths import FILEPATH_COLS, FILE_STAT_COLS
+
+# Columns of an NDA data dictionary definitions file (as downloaded from the data structure's page on the NDA website)
+# that are used for validation, and the names they are given in the loaded definitions
+DEFINITION_COLS = dict(ElementName='element', DataType='data_type', Size='size', Required='required',
+                       ValueRange='value_range')
+
+# Columns of the data frame of validation problems
+PROBLEM_COLS = ('spreadsheet', 'row', 'column', 'value', 'problem')
+
+# Number of example rows listed for each kind of problem by print_problems
+N_EXAMPLE_ROWS = 10
+
+
+def load_definitions(path):
+    """
+    Loads an NDA data dictionary definitions file, which lists each element (column) of a data structure along with
+    its data type (e.g. Integer, Float, String, Date, GUID, File), maximum size (for strings), whether it is Required,
+    Recommended, or Conditional, and its range of allowed values. Value ranges are written the NDA way: ranges of
+    numbers as "1::5" and lists of allowed values separated by semicolons, possibly combined (e.g. "0::3; 999").
+
+    :param path: The path to the definitions CSV file (e.g. eeg_details01_definitions.csv).
+    :return: A data frame with one row for each element, indexed by element name, with columns data_type, size,
+        required, and value_range.
+    """
+    definitions = pd.read_csv(path, usecols=list(DEFINITION_COLS), dtype=str).rename(columns=DEFINITION_COLS)
+    definitions['size'] = pd.to_numeric(definitions['size'], errors='coerce').astype('Int64')
+    definitions = definitions.fillna(dict(data_type='', required='', value_range=''))
+
+    return definitions.drop_duplicates('element').set_index('element')
+
+
+def validate_spreadsheet(df, definitions, name, first_row=1):
+    """
+    Checks every value of a filled-out spreadsheet against the data structure's definitions, the way NDA's validation
+    tool does: required values must be present, values must match the element's data type (and fit its maximum size,
+    for strings), and values must fall within the element's value range. Each column is checked with array operations
+    on the whole column at once. Required columns that are missing from the spreadsheet, and columns that are not
+    defined in the data dictionary, are also reported, once each.
+
+    :param df: A data frame containing a filled-out spreadsheet (or a chunk of one), as created by fill_info.
+    :param definitions: The data structure's definitions, as loaded by load_definitions.
+    :param name: The name of the spreadsheet, used to label its problems (e.g. 'eeg_details01').
+    :param first_row: The row number of the data frame's first row in the spreadsheet, where 1 is the first row below
+        the column headers (Default=1).
+    :return: A data frame with one row for each problem, listing the spreadsheet, row, column, offending value, and a
+        description of the problem.
+    """
+    rows = np.arange(first_row, first_row + len(df))
+    problems = [_problems(name, [None], col, [''], 'required column is missing')
+                for col in definitions.index[definitions.required == 'Required'] if col not in df.columns]
+    for col in df.columns:
+        if col not in definitions.index:
+            problems.append(_problems(name, [None], col, [''], 'not defined in the data dictionary'))
+            continue
+        d = definitions.loc[col]
+        values = df[col].reset_index(drop=True)
+        values_in_range, ranges = _parse_value_range(d.value_range)
+
+        # Numeric columns are checked as numbers, and text columns as the text that will be written to the CSV (which is
+        # also read as numbers where the element is numeric)
+        numeric = pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+        text = None if numeric and d.data_type in ('Integer', 'Float') else _as_text(values)
+        present = values.notna().to_numpy() if text is None else text.ne('').to_numpy()
+        if numeric:
+            number = values.to_numpy(dtype=float, na_value=np.nan)
+        elif d.data_type in ('Integer', 'Float') or len(ranges) > 0 or any(_is_number(v) for v in values_in_range):
+            number = pd.to_numeric(text.where(present), errors='coerce').to_numpy(dtype=float)
+        else:
+            number = np.full(len(values), np.nan)
+
+        # Required values must be present; the remaining checks only apply to values that are
+        if d.required == 'Required':
+            problems.append(_problems(name, rows[~present], col, values[~present], 'required value is missing'))
+
+        # Values must match the element's data type
+        if d.data_type == 'Integer':
+            bad = present & (np.isnan(number) | (number % 1 != 0))
+            problems.append(_problems(name, rows[bad], col, values[bad], 'not an integer'))
+        elif d.data_type == 'Float':
+            bad = present & np.isnan(number)
+            problems.append(_problems(name, rows[bad], col, values[bad], 'not a number'))
+        elif d.data_type == 'Date':
+            bad = present & pd.to_datetime(text.where(present), format='%m/%d/%Y', errors='coerce').isna().to_numpy()
+            problems.append(_problems(name, rows[bad], col, values[bad], 'not a date (MM/DD/YYYY)'))
+        elif d.data_type in ('String', 'GUID', 'File') and not pd.isna(d['size']):
+            bad = present & (text.str.len() > d['size']).to_numpy()
+            problems.append(_problems(name, rows[bad], col, values[bad], 'longer than %s characters' % d['size']))
+
+        # Values must be one of the allowed values or fall within one of the allowed ranges
+        if len(values_in_range) > 0 or len(ranges) > 0:
+            allowed = np.isin(number, [float(v) for v in values_in_range if _is_number(v)])
+            if text is not None:
+                allowed |= text.isin(values_in_range).to_numpy()
+            for low, high in ranges:
+                allowed |= (number >= low) & (number <= high)
+            bad = present & ~allowed
+            problems.append(_problems(name, rows[bad], col, values[bad], 'outside value range %s' % d.value_range))
+
+    return _concat_problems(problems)
+
+
+def check_data_files(esf, info, name='eeg_sub_files01', first_row=1):
+    """
+    Checks that every data file listed in a filled-out eeg_sub_files01 spreadsheet exists, using the file sizes that
+    get_filepaths (or stage_files) already collected for the session info data frame, so no file system calls are made.
+    Files that were listed but could not be found have no size.
+
+    :param esf: A data frame containing a filled-out eeg_sub_files01 spreadsheet (or a chunk of one), with the same
+        index as the session info data frame it was filled from.
+    :param info: Data frame containing one row for each session's information, including data file paths and sizes.
+    :param name: The name of the spreadsheet, used to label its problems (Default='eeg_sub_files01').
+    :param first_row: The row number of the data frame's first row in the spreadsheet, where 1 is the first row below
+        the column headers (Default=1).
+    :return: A data frame with one row for each missing file, in the same format as validate_spreadsheet.
+    """
+    rows = np.arange(first_row, first_row + len(esf))
+    problems = []
+    for path_col, size_col in zip(FILEPATH_COLS[::2], FILE_STAT_COLS[::2]):
+        if path_col not in esf.columns:
+            continue
+        paths = esf[path_col].reset_index(drop=True)
+        bad = _as_text(paths).ne('').to_numpy() & info.loc[esf.index, size_col].isna().to_numpy()
+        problems.append(_problems(name, rows[bad], path_col, paths[bad], 'file does not exist'))
+
+    return _concat_problems(problems)
+
+
+def print_problems(problems):
+    """
+    Prints a summary of validation problems: one line for each kind of problem in each column of each spreadsheet,
+    with the number of rows affected and the first few of them.
+
+    :param problems: A data frame of problems, as returned by validate_spreadsheet and check_data_files.
+    :return: None
+    """
+    if len(problems) == 0:
+        print('Validation: No problems found')
+        return
+    for (sheet, col, problem), group in problems.groupby(['spreadsheet', 'column', 'problem'], sort=False):
+        rows = group.row.dropna().astype(int).tolist()
+        examples = ', '.join(str(r) for r in rows[:N_EXAMPLE_ROWS]) + (', ...' if len(rows) > N_EXAMPLE_ROWS else '')
+        print('Validation problem: %s column %s %s' % (sheet, col, problem) +
+              ('' if len(rows) == 0 else ' in %s rows (%s)' % (len(rows), examples)))
+    print('Validation: %s problems found' % len(problems))
+
+
+def _as_text(col):
+    """
+    Converts a spreadsheet column to the text that will be written to the CSV, with missing values as empty strings.
+    """
+    text = col.astype(object).where(col.notna(), '').astype(str).str.strip()
+    return text.reset_index(drop=True)
+
+
+def _parse_value_range(value_range):
+    """
+    Splits an NDA value range into a list of allowed values and a list of (low, high) numeric ranges.
+    """
+    values, ranges = [], []
+    for part in value_range.split(';'):
+        part = part.strip()
+        if '::' in part:
+            low, high = part.split('::')
+            ranges.append((float(low), float(high)))
+        elif part != '':
+            values.append(part)
+    return values, ranges
+
+
+def _is_number(value):
+    """
+    Checks whether a string can be read as a number.
+    """
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _problems(name, rows, col, values, problem):
+    """
+    Builds a data frame describing one kind of problem found in a column, with one row for each offending value (or
+    None if there are none).
+    """
+    if len(rows) == 0:
+        return None
+    return pd.DataFrame(dict(spreadsheet=name, row=pd.array(rows, dtype='Int64'), column=col,
+                             value=_as_text(pd.Series(values)).to_numpy(), problem=problem), columns=PROBLEM_COLS)
+
+
+def _concat_problems(problems):
+    """
+    Combines the data frames of problems found in each column into one.
+    """
+    problems = [p for p in problems if p is not None]
+    if len(problems) == 0:
+        return pd.DataFrame(columns=PROBLEM_COLS)
+    return pd.concat(problems, ignore_index=True)
@@ -0,0 +1,154 @@
+import os
+import bz2
+import shutil
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from dir_index import build_dir_index, index_stat
+from get_filepaths import FILEPATH_COLS, FILE_STAT_COLS, list_data_files
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where files are always hardlinked or copied
+    fcntl = None
+
+# Number of bytes read from a file at a time while copying or decompressing
+CHUNK_SIZE = 8 * 1048576
+
+# Linux ioctl that makes a copy-on-write clone of a file (a reflink), supported by e.g. Btrfs and XFS
+FICLONE = 0x40049409
+
+
+def stage_files(info, staging_dir, n_workers=1, n_processes=1):
+    """
+    Copies every data file found by get_filepaths into a local staging directory for upload, organized as
+    <staging_dir>/<experiment>/<subject>/session_<session>/<file name>. Compressed .bdf.bz2 recordings are decompressed
+    in a pool of processes, streaming a chunk at a time so that memory use does not depend on file size. Other files are
+    hardlinked or reflinked where the file system allows it, and otherwise copied in chunks by a pool of threads.
+
+    Staged files are written under a temporary name and only renamed once complete, and are given the modification time
+    of their source. Staging can therefore be resumed after an interruption: files whose staged copy already has the
+    source's modification time (and size, for files that are not decompressed) are skipped.
+
+    :param info: Data frame containing one row for each session's information, including data file paths.
+    :param staging_dir: The path to the local directory in which to stage the files.
+    :param n_workers: The number of files to copy concurrently (Default=1).
+    :param n_processes: The number of files to decompress concurrently (Default=1).
+    :return: A copy of the session info data frame in which the data file paths, sizes, and modification times refer to
+        the staged files.
+    """
+    staging_dir = os.path.abspath(os.path.expanduser(staging_dir))
+
+    # Determine where each data file will be staged, prefixing file names that occur more than once in a session
+    files = list_data_files(info)
+    compressed = files.data_file.str.endswith('.bdf.bz2').to_numpy()
+    names = files.data_file.map(os.path.basename)
+    names = names.where(~compressed, names.str[:-4])
+    dirs = staging_dir + os.sep + files.experiment.astype(str) + os.sep + files.subject.astype(str) + os.sep + \
+        'session_' + files.session.astype(str)
+    dup = (dirs + os.sep + names).groupby(dirs + os.sep + names).transform('size').to_numpy() > 1
+    names = names.where(~dup, 'file' + files.file_num.astype(str) + '_' + names)
+    files['dest'] = dirs + os.sep + names
+
+    # Skip files that were already staged by a previous run, listing only the folders these files are staged in
+    index = build_dir_index(sorted(set(os.path.dirname(d) for d in files.dest)))
+    up_to_date = np.zeros(len(files), dtype=bool)
+    for i, (dest, size, mtime, is_bz2) in enumerate(zip(files.dest, files['size'], files.mtime, compressed)):
+        entry = index.get(os.path.dirname(dest), {}).get(os.path.basename(dest))
+        up_to_date[i] = entry is not None and entry[2] == mtime and (is_bz2 or entry[1] == size)
+    jobs = list(zip(files.data_file[~up_to_date], files.dest[~up_to_date], files.mtime[~up_to_date].astype('int64'),
+                    compressed[~up_to_date]))
+
+    # Decompress and copy all remaining files
+    for d in set(os.path.dirname(job[1]) for job in jobs):
+        os.makedirs(d, exist_ok=True)
+    methods = dict(hardlink=0, reflink=0, copy=0, decompress=0)
+    failed = []
+    with ProcessPoolExecutor(max_workers=max(n_processes, 1)) as processes, \
+            ThreadPoolExecutor(max_workers=max(n_workers, 1)) as threads:
+        futures = [processes.submit(_decompress, src, dest, int(mtime)) if is_bz2 else
+                   threads.submit(_link_or_copy, src, dest, int(mtime)) for src, dest, mtime, is_bz2 in jobs]
+        for future, (src, dest, _, _) in zip(futures, jobs):
+            try:
+                methods[future.result()] += 1
+            except (OSError, EOFError) as e:
+                print('Warning: Could not stage %s (%s)' % (src, e))
+                failed.append(src)
+    print('Staged %s files (%s hardlinked, %s reflinked, %s copied, %s decompressed), %s already up to date' %
+          (len(jobs) - len(failed), methods['hardlink'], methods['reflink'], methods['copy'], methods['decompress'],
+           int(up_to_date.sum())))
+    if len(failed) > 0:
+        raise OSError('Could not stage %s files; run again to resume staging' % len(failed))
+
+    # Point the data file columns at the staged files
+    index = build_dir_index(sorted(set(os.path.dirname(d) for d in files.dest)))
+    staged = info.copy()
+    for n in range(4):
+        slot = files[files.file_num == n + 1]
+        stats = [index_stat(index, d) for d in slot.dest]
+        staged.loc[slot.index, FILEPATH_COLS[2 * n]] = slot.dest.to_numpy()
+        staged.loc[slot.index, FILE_STAT_COLS[2 * n]] = [s[1] for s in stats]
+        staged.loc[slot.index, FILE_STAT_COLS[2 * n + 1]] = [s[2] for s in stats]
+
+    return staged
+
+
+def _link_or_copy(src, dest, mtime):
+    """
+    Stages a single file by hardlinking it, reflinking it, or copying it in chunks, whichever works first. Returns the
+    method used.
+    """
+    part = dest + '.part'
+    _remove(part)
+    try:
+        try:
+            os.link(src, part)
+            method = 'hardlink'  # Shares the source's modification time, which must not be changed
+        except OSError:
+            try:
+                _reflink(src, part)
+                method = 'reflink'
+            except OSError:
+                with open(src, 'rb') as f_src, open(part, 'wb') as f_dest:
+                    shutil.copyfileobj(f_src, f_dest, CHUNK_SIZE)
+                method = 'copy'
+            os.utime(part, ns=(mtime, mtime))
+        os.replace(part, dest)
+    finally:
+        _remove(part)
+
+    return method
+
+
+def _reflink(src, dest):
+    """
+    Creates a copy-on-write clone of a file, raising an OSError if the file system does not support it.
+    """
+    if fcntl is None:
+        raise OSError('Reflinks are not supported on this platform')
+    with open(src, 'rb') as f_src, open(dest, 'wb') as f_dest:
+        fcntl.ioctl(f_dest.fileno(), FICLONE, f_src.fileno())
+
+
+def _decompress(src, dest, mtime):
+    """
+    Stages a single .bz2 file by decompressing it in chunks. Run in a worker process.
+    """
+    part = dest + '.part'
+    try:
+        with bz2.open(src, 'rb') as f_src, open(part, 'wb') as f_dest:
+            shutil.copyfileobj(f_src, f_dest, CHUNK_SIZE)
+        os.utime(part, ns=(mtime, mtime))
+        os.replace(part, dest)
+    finally:
+        _remove(part)
+
+    return 'decompress'
+
+
+def _remove(path):
+    """
+    Deletes a file if it exists.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,190 @@
+import os
+import bz2
+import json
+import random
+import datetime as dt
+from get_info import EXP_DICT, MONTH_DICT
+from get_filepaths import LAYOUTS
+
+# Columns of the eeg_details01 and eeg_sub_files01 templates that the pipeline fills in
+ED_COLS = ('subjectkey', 'src_subject_id', 'interview_date', 'interview_age', 'gender', 'site', 'visit', 'eeg001',
+           'eeg003b', 'eeg003d', 'eeg003e', 'eeg003g', 'eeg008c', 'eeg008d', 'eeg013', 'head_circum', 'eeg015',
+           'eeg022', 'eeg026', 'eeg027', 'eeg028', 'eeg029', 'eeg_4')
+ESF_COLS = ('subjectkey', 'src_subject_id', 'interview_date', 'interview_age', 'gender', 'ofc', 'experiment_id',
+            'data_file1', 'data_file1_type', 'data_file2', 'data_file2_type', 'data_file3', 'data_file3_type',
+            'data_file4', 'data_file4_type', 'head_circum', 'visit')
+
+# Size of a typical semester's submission, used as the unit of scale for synthetic trees
+SEMESTER = dict(n_subjects=50, n_sessions=10)
+
+
+def make_synthetic_tree(root, scale=1, experiments=None, start_date=dt.date(2023, 3, 1), end_date=dt.date(2023, 8, 1),
+                        bdf_size=1048576, sparse=True, seed=0):
+    """
+    Builds a fake copy of the LTP and protocols directories on Rhino, along with all of the metadata files the pipeline
+    reads, for testing and benchmarking without access to Rhino. Every session's files are laid out according to its
+    experiment's entry in get_filepaths.LAYOUTS, occasionally using fallback files (e.g. a session log instead of an
+    events file) or splitting the EEG recording across two files. About a fifth of sessions fall outside of the date
+    range. BDF files have a valid header followed by sparse or zero-filled sample data.
+
+    :param root: The directory in which to build the tree.
+    :param scale: The size of the tree, in multiples of a typical semester (see SEMESTER) (Default=1).
+    :param experiments: The experiments to include (Default=None, i.e. every experiment in EXP_DICT).
+    :param start_date: A datetime date object indicating the start of the submission period (Default=2023-03-01).
+    :param end_date: A datetime date object indicating the end of the submission period (Default=2023-08-01).
+    :param bdf_size: The size of each BDF file in bytes (Default=1 MB).
+    :param sparse: If True, create BDF files as sparse files; otherwise fill them with zeros (Default=True).
+    :param seed: The random seed used to generate the tree (Default=0).
+    :return: A dictionary containing the paths to pass to the pipeline: ltp_path, protocols_path, extra_info_path,
+        eeg_details_path, and eeg_sub_files_path.
+    """
+    rng = random.Random(seed)
+    experiments = list(EXP_DICT) if experiments is None else experiments
+    paths = dict(
+        ltp_path=os.path.join(root, 'ltp'),
+        protocols_path=os.path.join(root, 'protocols', 'ltp'),
+        extra_info_path=os.path.join(root, 'extra_data.txt'),
+        eeg_details_path=os.path.join(root, 'eeg_details01.csv'),
+        eeg_sub_files_path=os.path.join(root, 'eeg_sub_files01.csv')
+    )
+
+    # Assign subjects to experiments and write the subject-level metadata files
+    n_subjects = int(SEMESTER['n_subjects'] * scale)
+    subjects = ['LTP%05d' % i for i in range(n_subjects)]
+    _write_subject_info(paths, subjects, rng)
+    months = dict((v, k) for k, v in MONTH_DICT.items())
+    window = (end_date - start_date).days
+
+    for e, exp in enumerate(experiments):
+        exp_subjects = subjects[e::len(experiments)]
+        exp_path = os.path.join(paths['ltp_path'], exp)
+        os.makedirs(exp_path, exist_ok=True)
+        with open(os.path.join(exp_path, 'cmldb_subj_info_%s.txt' % exp), 'w') as f:
+            f.write('subject\tgender\n')
+            for subj in exp_subjects:
+                f.write('%s\t%s\n' % (subj, rng.choice('MF')))
+
+        with open(os.path.join(exp_path, 'cmldb_sess_info_%s.txt' % exp), 'w') as f:
+            f.write('subject\tsession\tyear\tmonth\tday\tstart_time\tend_time\tlocation\tsleep\talertness\n')
+            for subj in exp_subjects:
+                for sess in range(SEMESTER['n_sessions']):
+                    date = start_date + dt.timedelta(days=rng.randint(-window // 8, window + window // 8))
+                    start = dt.datetime.combine(date, dt.time(rng.randint(9, 16), rng.choice((0, 15, 30, 45))))
+                    end = start + dt.timedelta(minutes=rng.choice((60, 75, 90)))
+                    f.write('%s\t%s\t%s\t%s\t%s\t%s\t%s\tPENN\t%s\t%s\n' %
+                            (subj, sess, date.year, months[date.month], date.day, start.strftime('%H:%M'),
+                             end.strftime('%H:%M'), rng.randint(4, 10), rng.randint(1, 5)))
+                    _make_session_files(paths, exp, subj, sess, start, end, bdf_size, sparse, rng)
+
+    return paths
+
+
+def _write_subject_info(paths, subjects, rng):
+    """
+    Writes the subject info questionnaire, the extra info file, and the eeg_details01/eeg_sub_files01 templates.
+    """
+    questionnaire = os.path.join(paths['ltp_path'], 'SubjectInfo', 'subject_info.csv')
+    os.makedirs(os.path.dirname(questionnaire), exist_ok=True)
+    with open(questionnaire, 'w') as f:
+        f.write('snum,hand_throw,hand_toothbrush,hand_scissors,hand_write\n')
+        for subj in subjects:
+            snum = subj if rng.random() > .1 else '%s;%s' % (subj, subj.replace('LTP', 'OLD'))
+            f.write('%s,%s,%s,%s,%s\n' % ((snum,) + tuple(rng.randint(1, 5) for _ in range(4))))
+
+    with open(paths['extra_info_path'], 'w') as f:
+        for subj in subjects:
+            dob = dt.date(1950, 1, 1) + dt.timedelta(days=rng.randint(0, 18000))
+            f.write('%s\t%s\t%.1f\t%s\tNDAR_INV%s\n' % (subj, dob.strftime('%m/%d/%Y'), rng.uniform(52, 62),
+                                                       rng.choice(('AM', 'AML', 'AL')), subj))
+
+    for path, name, cols in ((paths['eeg_details_path'], 'eeg_details', ED_COLS),
+                             (paths['eeg_sub_files_path'], 'eeg_sub_files', ESF_COLS)):
+        with open(path, 'w') as f:
+            f.write('%s,1' % name + ',' * (len(cols) - 2) + '\n')
+            f.write(','.join(cols) + '\n')
+
+
+def _make_session_files(paths, exp, subj, sess, start, end, bdf_size, sparse, rng):
+    """
+    Creates the data files of a single session according to its experiment's layout.
+    """
+    layout = LAYOUTS[exp]
+    roots = dict(
+        ltp=os.path.join(paths['ltp_path'], exp, subj, 'session_%s' % sess),
+        protocols=os.path.join(paths['protocols_path'], 'subjects', subj, 'experiments', exp, 'sessions', str(sess)),
+        experiment=os.path.join(paths['ltp_path'], exp)
+    )
+    os.makedirs(roots['ltp'], exist_ok=True)
+
+    # EEG recordings, occasionally split into two files
+    n_eeg = max([c[1] + 1 for candidates in layout['files'] for c in candidates if c[0] == 'eeg'] + [0])
+    if len(layout['eeg']) > 0:
+        root, pattern = rng.choice(layout['eeg'])
+        n_files = min(n_eeg, 2 if rng.random() < .1 else 1)
+        for i in range(n_files):
+            name = pattern.replace('*', '%s_%s%s' % (subj, sess, '' if i == 0 else chr(ord('a') + i)))
+            _make_file(os.path.join(roots[root], name), subj, sess, start, end, bdf_size, sparse)
+
+    # Other data files, occasionally leaving out the preferred file so that a fallback is used
+    for n, candidates in enumerate(layout['files']):
+        candidates = [c for c in candidates if c[0] != 'eeg']
+        for i, (root, path, _) in enumerate(candidates):
+            last = i == len(candidates) - 1
+            if rng.random() < .85 or (last and n in layout['required']):
+                path = os.path.join(roots[root], path.replace('*', 'session').format(subject=subj))
+                if not os.path.exists(path):  # Files in the experiment directory are shared by all sessions
+                    file_sess = list(range(SEMESTER['n_sessions'])) if root == 'experiment' else sess
+                    _make_file(path, subj, file_sess, start, end, bdf_size, sparse)
+                break
+
+
+def _make_file(path, subj, sess, start, end, bdf_size, sparse):
+    """
+    Creates a stand-in data file whose contents match its file type, and that no other data file shares. Event files
+    shared by several sessions are given a list of session numbers.
+    """
+    events = [dict(subject=subj, session=s, type='WORD', serialnumber=i)
+              for s in (sess if isinstance(sess, list) else [sess]) for i in range(100)]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if path.endswith('.bdf') or path.endswith('.bdf.bz2'):
+        header = _bdf_header(start, int((end - start).total_seconds()), subj, os.path.basename(path))
+        if path.endswith('.bz2'):
+            with open(path, 'wb') as f:
+                f.write(bz2.compress(header + bytes(min(bdf_size, 1048576))))
+        else:
+            with open(path, 'wb') as f:
+                f.write(header)
+                if sparse:
+                    f.truncate(max(bdf_size, len(header)))
+                else:
+                    for _ in range(0, bdf_size - len(header), 1048576):
+                        f.write(bytes(min(1048576, bdf_size - f.tell())))
+    elif path.endswith('.jsonl'):
+        with open(path, 'w') as f:
+            for event in events:
+                f.write(json.dumps(event) + '\n')
+    elif path.endswith('.json'):
+        with open(path, 'w') as f:
+            json.dump(events, f)
+    else:
+        with open(path, 'w') as f:
+            f.write('%s\t%s\t%s\tSESS_START\n' % (subj, sess, os.path.basename(path)))
+
+
+def _bdf_header(start, duration, subject='', recording='', n_channels=137, sample_rate=2048):
+    """
+    Builds a BioSemi BDF header for a recording with the given start time, duration (in seconds), subject and recording
+    identification, channel count, and sample rate, using one-second data records.
+    """
+    def field(value, width):
+        return str(value).ljust(width)[:width].encode('ascii')
+
+    header = b'\xffBIOSEMI' + field(subject, 80) + field(recording, 80) + field(start.strftime('%d.%m.%y'), 8) + \
+        field(start.strftime('%H.%M.%S'), 8) + field(256 * (n_channels + 1), 8) + field('24BIT', 44) + \
+        field(duration, 8) + field(1, 8) + field(n_channels, 4)
+    signals = [('A%s' % i, '', 'uV', -262144, 262143, -8388608, 8388607, '', sample_rate, '')
+               for i in range(n_channels)]
+    for i, width in enumerate((16, 80, 8, 8, 8, 8, 8, 80, 8, 32)):
+        header += b''.join(field(s[i], width) for s in signals)
+
+    return header
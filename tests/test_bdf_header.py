@@ -0,0 +1,87 @@
+import os
+import datetime as dt
+import pandas as pd
+import pytest
+import bdf_header
+from bdf_header import check_recording_times, get_bdf_info, read_bdf_header, read_bdf_headers
+from get_filepaths import FILEPATH_COLS, FILE_STAT_COLS
+from info_schema import set_info_dtypes
+from synthetic_data import _bdf_header
+
+START = dt.datetime(2023, 3, 1, 12, 0, 5)
+
+
+def _write_bdf(path, start=START, duration=3600, n_channels=8, sample_rate=512):
+    with open(str(path), 'wb') as f:
+        f.write(_bdf_header(start, duration, n_channels=n_channels, sample_rate=sample_rate))
+    st = os.stat(str(path))
+    return str(path), st.st_size, st.st_mtime_ns
+
+
+def test_read_bdf_header(tmp_path):
+    path, _, _ = _write_bdf(tmp_path / 'a.bdf')
+    assert read_bdf_header(path) == dict(start=START, duration=3600., n_channels=8, sample_rate=512.)
+
+
+def test_read_bdf_header_from_the_1990s(tmp_path):
+    path, _, _ = _write_bdf(tmp_path / 'a.bdf', start=dt.datetime(1998, 5, 4, 9, 30))
+    assert read_bdf_header(path)['start'] == dt.datetime(1998, 5, 4, 9, 30)
+
+
+def test_truncated_header(tmp_path):
+    path, _, _ = _write_bdf(tmp_path / 'a.bdf')
+    with open(path, 'r+b') as f:
+        f.truncate(600)
+    with pytest.raises(ValueError, match='Truncated BDF signal header'):
+        read_bdf_header(path)
+
+
+def test_read_bdf_headers_caches_results(tmp_path, monkeypatch, capsys):
+    good = _write_bdf(tmp_path / 'a.bdf')
+    bad = (str(tmp_path / 'missing.bdf'), 1, 1)
+    cache_dir = str(tmp_path / 'cache')
+    headers = read_bdf_headers([good, bad, good], n_workers=2, cache_dir=cache_dir)
+    assert headers[good]['n_channels'] == 8 and headers[bad] is None
+    assert 'Warning: Could not read BDF header of %s' % bad[0] in capsys.readouterr().out
+
+    # Readable headers come from the cache, while failures are retried
+    reads = []
+    monkeypatch.setattr(bdf_header, 'read_bdf_header', lambda path: reads.append(path))
+    read_bdf_headers([good, bad], cache_dir=cache_dir)
+    assert reads == [bad[0]]
+
+
+def _info(sessions):
+    """
+    Builds a session info data frame from a list of (CMLDB start, CMLDB end, [BDF file, ...]) tuples.
+    """
+    rows = []
+    for sess, (start, end, files) in enumerate(sessions):
+        row = dict(subject='LTP001', experiment='ltpFR2', session=sess, date=start.normalize(), session_start=start,
+                   session_end=end, start_time=start.strftime('%H:%M'), end_time=end.strftime('%H:%M'))
+        row.update(dict((col, '') for col in FILEPATH_COLS))
+        row.update(dict((col, None) for col in FILE_STAT_COLS))
+        for n, f in enumerate(files):
+            row[FILEPATH_COLS[2 * n]], row[FILE_STAT_COLS[2 * n]], row[FILE_STAT_COLS[2 * n + 1]] = f
+        rows.append(row)
+    return set_info_dtypes(pd.DataFrame(rows).astype(dict((col, object) for col in FILE_STAT_COLS)))
+
+
+def test_get_bdf_info_and_check_recording_times(tmp_path, capsys):
+    first = _write_bdf(tmp_path / 'a_1.bdf', duration=1800)
+    second = _write_bdf(tmp_path / 'a_2.bdf', start=START + dt.timedelta(hours=1), duration=600, n_channels=10)
+    late = _write_bdf(tmp_path / 'b.bdf', start=START + dt.timedelta(minutes=30))
+    start = pd.Timestamp(START)
+    info = _info([(start, start + pd.Timedelta(minutes=70), [first, second]),
+                            (start, start + pd.Timedelta(hours=1), [late]),
+                            (start, start + pd.Timedelta(hours=1), [])])
+    info = get_bdf_info(info, n_workers=2)
+    assert info.bdf_start.tolist()[:2] == [start, start + pd.Timedelta(minutes=30)]
+    assert info.bdf_end[0] == start + pd.Timedelta(minutes=70)
+    assert info.bdf_n_channels.tolist()[:2] == [10, 8]
+    assert info.bdf_start.isna().tolist() == [False, False, True]
+
+    mismatches = check_recording_times(info, tolerance=10)
+    assert mismatches.session.tolist() == [1]
+    assert 'Recording time mismatch: LTP001 ltpFR2 session 1' in capsys.readouterr().out
+    assert len(check_recording_times(info, tolerance=90)) == 0
@@ -0,0 +1,19 @@
+import os
+import pandas as pd
+from benchmark import STAGES, run_stages
+from synthetic_data import make_synthetic_tree
+
+
+def test_repeated_runs_read_the_same_templates(tmp_path):
+    paths = make_synthetic_tree(str(tmp_path / 'tree'), scale=0.1, bdf_size=1024)
+    out_dir = str(tmp_path / 'tree' / 'out')
+    os.makedirs(out_dir)
+    with open(paths['eeg_details_path'], 'rb') as f:
+        template = f.read()
+    for _ in range(2):
+        times, n_sessions = run_stages(paths, out_dir)
+        assert set(times) == set(STAGES)
+        written = pd.read_csv(os.path.join(out_dir, 'eeg_details01.csv'), header=1)
+        assert len(written) == n_sessions > 0
+    with open(paths['eeg_details_path'], 'rb') as f:
+        assert f.read() == template
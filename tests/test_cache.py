@@ -0,0 +1,91 @@
+import os
+import pytest
+import cache
+from concurrent.futures import ThreadPoolExecutor
+from cache import cached_map, evict_cache, load_cached, save_cached, hold_cache_writes
+
+
+def _n_entries(cache_dir):
+    return len([f for f in os.listdir(cache_dir) if f.endswith('.pkl')]) if os.path.isdir(cache_dir) else 0
+
+
+def test_save_and_load(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    assert load_cached(cache_dir, 'key', 'default') == 'default'
+    save_cached(cache_dir, ('key', 1), dict(a=1))
+    assert load_cached(cache_dir, ('key', 1)) == dict(a=1)
+    assert load_cached(cache_dir, ('key', 2)) is None
+
+
+def test_hold_cache_writes_defers_writes(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    with hold_cache_writes():
+        for i in range(5):
+            cache = load_cached(cache_dir, 'entries', {})
+            cache[i] = i
+            save_cached(cache_dir, 'entries', cache)
+        assert _n_entries(cache_dir) == 0
+        assert load_cached(cache_dir, 'entries') == dict((i, i) for i in range(5))
+    assert load_cached(cache_dir, 'entries') == dict((i, i) for i in range(5))
+
+
+def test_hold_cache_writes_flushes_on_error(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    with pytest.raises(RuntimeError):
+        with hold_cache_writes():
+            save_cached(cache_dir, 'entries', [1, 2, 3])
+            raise RuntimeError()
+    assert load_cached(cache_dir, 'entries') == [1, 2, 3]
+
+
+def test_hold_cache_writes_flushes_periodically(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    with hold_cache_writes(flush_interval=0):
+        save_cached(cache_dir, 'entries', [1])
+        assert _n_entries(cache_dir) == 1
+
+
+def test_evict_cache_removes_least_recently_used(tmp_path):
+    cache_dir = str(tmp_path)
+    for i, key in enumerate(['a', 'b', 'c']):
+        save_cached(cache_dir, key, b'x' * 1000)
+        os.utime(cache._entry_path(cache_dir, key), (1000 + i, 1000 + i))
+    load_cached(cache_dir, 'a')  # Marks 'a' as the most recently used
+    evict_cache(cache_dir, 2500)
+    assert load_cached(cache_dir, 'a') is not None
+    assert load_cached(cache_dir, 'b') is None
+    assert load_cached(cache_dir, 'c') is not None
+
+
+def test_evict_cache_ignores_missing_dir(tmp_path):
+    evict_cache(str(tmp_path / 'missing'), 0)
+
+
+def test_cached_map(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    calls = []
+
+    def func(key):
+        calls.append(key)
+        return None if key == 'unreadable' else key * 2
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        assert cached_map(func, ['a', 'b', 'a', 'unreadable'], cache_dir, 'test', pool) == \
+            dict(a='aa', b='bb', unreadable=None)
+        assert sorted(calls) == ['a', 'b', 'unreadable']
+
+        # Cached results are reused, and failed ones are tried again
+        del calls[:]
+        assert cached_map(func, ['a', 'c', 'unreadable'], cache_dir, 'test', pool) == \
+            dict(a='aa', c='cc', unreadable=None)
+        assert sorted(calls) == ['c', 'unreadable']
+        assert load_cached(cache_dir, 'test') == dict(a='aa', b='bb', c='cc')
+
+
+def test_cached_map_saves_progress(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    saves = []
+    monkeypatch.setattr(cache, 'save_cached', lambda cache_dir, key, obj: saves.append(len(obj)))
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        cached_map(str, list(range(25)), cache_dir, 'test', pool, save_every=10)
+    assert saves == [10, 20, 25]
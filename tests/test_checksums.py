@@ -0,0 +1,74 @@
+import os
+import hashlib
+import pandas as pd
+import checksums
+from checksums import hash_file, hash_files, write_checksums
+from get_filepaths import FILEPATH_COLS, FILE_STAT_COLS
+from info_schema import set_info_dtypes
+
+
+def _write(path, data):
+    with open(str(path), 'wb') as f:
+        f.write(data)
+    st = os.stat(str(path))
+    return str(path), st.st_size, st.st_mtime_ns
+
+
+def test_hash_file_reads_in_chunks(tmp_path):
+    data = os.urandom(10000)
+    path, _, _ = _write(tmp_path / 'a.bdf', data)
+    assert hash_file(path, chunk_size=1000) == dict(md5=hashlib.md5(data).hexdigest(),
+                                                    sha256=hashlib.sha256(data).hexdigest())
+    assert hash_file(str(_write(tmp_path / 'empty', b'')[0]))['md5'] == hashlib.md5(b'').hexdigest()
+
+
+def test_hash_files_caches_results(tmp_path, monkeypatch):
+    files = [_write(tmp_path / ('%s.bdf' % i), bytes([i]) * 100) for i in range(5)]
+    cache_dir = str(tmp_path / 'cache')
+    hashes = hash_files(files + files[:1], n_workers=3, cache_dir=cache_dir)
+    assert hashes[files[3]]['sha256'] == hashlib.sha256(bytes([3]) * 100).hexdigest()
+
+    # Unchanged files come from the cache, and changed ones are hashed again
+    hashed = []
+    monkeypatch.setattr(checksums, 'hash_file', lambda path: hashed.append(path) or dict(md5='', sha256=''))
+    changed = _write(tmp_path / '0.bdf', b'changed')
+    hash_files(files[1:] + [changed], cache_dir=cache_dir)
+    assert hashed == [changed[0]]
+
+
+def test_write_checksums(tmp_path):
+    a, b = _write(tmp_path / 'a.bdf', b'a' * 10), _write(tmp_path / 'b.json', b'{}')
+    row = dict(subject='LTP001', experiment='ltpFR2', session=0)
+    row.update(dict((col, '') for col in FILEPATH_COLS))
+    row.update(dict((col, None) for col in FILE_STAT_COLS))
+    row.update(data_file1=a[0], data_file1_type='EEG', data_file1_size=a[1], data_file1_mtime=a[2],
+               data_file2=b[0], data_file2_type='Behavioral', data_file2_size=b[1], data_file2_mtime=b[2])
+    info = set_info_dtypes(pd.DataFrame([row]).astype(dict((col, object) for col in FILE_STAT_COLS)))
+    path = str(tmp_path / 'checksums.csv')
+    write_checksums(info, path, n_workers=2)
+
+    written = pd.read_csv(path)
+    assert written.columns.tolist() == ['subject', 'experiment', 'session', 'file_num', 'data_file', 'data_file_type',
+                                        'size', 'md5', 'sha256']
+    assert written.data_file.tolist() == [a[0], b[0]]
+    assert written.md5.tolist() == [hashlib.md5(b'a' * 10).hexdigest(), hashlib.md5(b'{}').hexdigest()]
+    assert not os.path.exists(path + '.tmp')
+
+
+def test_write_checksums_of_rewritten_file(tmp_path):
+    a = _write(tmp_path / 'a.bdf', b'a' * 10)
+    row = dict(subject='LTP001', experiment='ltpFR2', session=0)
+    row.update(dict((col, '') for col in FILEPATH_COLS))
+    row.update(dict((col, None) for col in FILE_STAT_COLS))
+    row.update(data_file1=a[0], data_file1_type='EEG', data_file1_size=a[1], data_file1_mtime=a[2])
+    info = set_info_dtypes(pd.DataFrame([row]).astype(dict((col, object) for col in FILE_STAT_COLS)))
+    path, cache_dir = str(tmp_path / 'checksums.csv'), str(tmp_path / 'cache')
+    write_checksums(info, path, cache_dir=cache_dir)
+
+    # The file changes after its stats were recorded in info, e.g. by a cached lookup
+    with open(a[0], 'ab') as f:
+        f.write(b'b' * 5)
+    write_checksums(info, path, cache_dir=cache_dir)
+    written = pd.read_csv(path)
+    assert written['size'].tolist() == [15]
+    assert written.sha256.tolist() == [hashlib.sha256(b'a' * 10 + b'b' * 5).hexdigest()]
@@ -0,0 +1,101 @@
+import os
+import errno
+import glob
+import threading
+import pytest
+import dir_index
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dir_index import build_dir_index, dir_mtime, index_exists, index_getsize, index_glob, list_dir, \
+    record_dir_access
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / 'session_0' / 'eeg').mkdir(parents=True)
+    (tmp_path / 'session_0' / 'eeg' / 'a.bdf').write_bytes(b'x' * 10)
+    (tmp_path / 'session_0' / 'eeg' / 'b.bdf.bz2').write_bytes(b'x' * 3)
+    (tmp_path / 'session_0' / 'eeg' / '.hidden.bdf').write_bytes(b'')
+    (tmp_path / 'session_0' / 'session.json').write_text('[]')
+    return str(tmp_path)
+
+
+def test_index_matches_file_system(tree):
+    index = build_dir_index([tree], n_workers=2)
+    eeg_dir = os.path.join(tree, 'session_0', 'eeg')
+    for pattern in ('*.bdf', '*.bdf.bz2', '*', '.*'):
+        assert sorted(index_glob(index, eeg_dir, pattern)) == sorted(glob.glob(os.path.join(eeg_dir, pattern)))
+    assert index_exists(index, os.path.join(tree, 'session_0', 'session.json'))
+    assert not index_exists(index, os.path.join(tree, 'session_0', 'missing.json'))
+    assert not index_exists(index, os.path.join(tree, 'missing', 'session.json'))
+    assert index_getsize(index, os.path.join(eeg_dir, 'a.bdf')) == 10
+    assert dir_mtime(index, eeg_dir) == os.stat(eeg_dir).st_mtime_ns
+    with pytest.raises(FileNotFoundError):
+        index_getsize(index, os.path.join(eeg_dir, 'missing.bdf'))
+
+
+def test_missing_root_is_empty(tmp_path):
+    index = build_dir_index([str(tmp_path / 'missing')])
+    assert index == {str(tmp_path / 'missing'): {}}
+
+
+def test_record_dir_access(tree):
+    index = build_dir_index([tree])
+    with record_dir_access() as accessed:
+        index_glob(index, os.path.join(tree, 'session_0', 'eeg'), '*.bdf')
+    assert accessed == {os.path.join(tree, 'session_0', 'eeg')}
+
+
+def test_symlink_loop_is_not_followed(tree):
+    os.symlink(tree, os.path.join(tree, 'session_0', 'loop'))
+    index = build_dir_index([tree])
+    assert os.path.join(tree, 'session_0', 'loop') not in index
+    assert list_dir(index, os.path.join(tree, 'session_0'))['loop'][0]  # Still recorded as a directory
+
+    # Linked directories can still be looked up on demand
+    assert index_exists(index, os.path.join(tree, 'session_0', 'loop', 'session_0', 'session.json'))
+
+
+def test_list_dir_from_several_threads(tree, monkeypatch):
+    # Every thread lists the same directory at the same time; all of them must get the listing that ends up in the index
+    barrier = threading.Barrier(8)
+    scan = dir_index._scan
+
+    def slow_scan(dirpath):
+        barrier.wait()
+        return scan(dirpath)
+
+    monkeypatch.setattr(dir_index, '_scan', slow_scan)
+    index = {}
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        listings = list(pool.map(lambda _: list_dir(index, tree), range(8)))
+    assert all(listing is index[tree] for listing in listings)
+
+
+class _FailingEntry(object):
+    """
+    Stands in for an os.DirEntry whose stat call fails with an I/O error.
+    """
+    def __init__(self, entry):
+        self.name, self.path = entry.name, entry.path
+        self.is_dir, self.is_symlink = entry.is_dir, entry.is_symlink
+
+    def stat(self):
+        raise OSError(errno.EIO, 'Input/output error', self.path)
+
+
+@pytest.mark.parametrize('fail_on', ['listing', 'entry'])
+def test_transient_errors_are_raised(tree, monkeypatch, fail_on):
+    # Unlike a missing directory or file, an I/O error must not make a directory look empty or a file look missing
+    scandir = os.scandir
+
+    @contextmanager
+    def failing_scandir(path):
+        if os.path.basename(path) == 'eeg' and fail_on == 'listing':
+            raise OSError(errno.EIO, 'Input/output error', path)
+        with scandir(path) as it:
+            yield [_FailingEntry(e) if os.path.basename(path) == 'eeg' else e for e in it]
+
+    monkeypatch.setattr(os, 'scandir', failing_scandir)
+    with pytest.raises(OSError):
+        build_dir_index([tree])
@@ -0,0 +1,74 @@
+import os
+import pandas as pd
+from duplicates import find_duplicate_files, partial_hash, _extra_bytes
+from get_filepaths import FILEPATH_COLS, FILE_STAT_COLS
+
+
+def _info(files, exp='ltpFR2'):
+    """
+    Builds a session info data frame listing one data file for each session, given a list of (subject, session, path)
+    tuples.
+    """
+    rows = []
+    for subj, sess, path in files:
+        st = os.stat(path)
+        row = dict(subject=subj, experiment=exp, session=sess)
+        row.update(dict((col, '') for col in FILEPATH_COLS))
+        row.update(dict((col, None) for col in FILE_STAT_COLS))
+        row.update(data_file1=path, data_file1_type='EEG', data_file1_size=st.st_size, data_file1_mtime=st.st_mtime_ns)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def _write(path, data):
+    with open(str(path), 'wb') as f:
+        f.write(data)
+    return str(path)
+
+
+def test_partial_hash_compares_both_ends(tmp_path):
+    a = _write(tmp_path / 'a', b'x' * 100 + b'a' + b'y' * 100)
+    b = _write(tmp_path / 'b', b'x' * 100 + b'b' + b'y' * 100)
+    c = _write(tmp_path / 'c', b'x' * 100 + b'c' + b'z' * 100)
+    assert partial_hash(a, 201, block_size=10) == partial_hash(b, 201, block_size=10)  # Differ only in the middle
+    assert partial_hash(a, 201, block_size=10) != partial_hash(c, 201, block_size=10)
+
+
+def test_no_duplicates(tmp_path):
+    a = _write(tmp_path / 'a.bdf', b'a' * 1000)
+    b = _write(tmp_path / 'b.bdf', b'b' * 1000)
+    dups = find_duplicate_files(_info([('LTP001', 0, a), ('LTP001', 1, b)]), ltp_path=str(tmp_path / 'ltp'))
+    assert len(dups) == 0
+
+
+def test_same_path_and_same_content(tmp_path, capsys):
+    a = _write(tmp_path / 'a.bdf', b'a' * 1000)
+    copy = _write(tmp_path / 'copy.bdf', b'a' * 1000)
+    other = _write(tmp_path / 'other.bdf', b'a' * 999 + b'b')  # Same size and same first block, different contents
+    info = _info([('LTP001', 0, a), ('LTP002', 1, a), ('LTP003', 2, copy), ('LTP003', 3, other)])
+    dups = find_duplicate_files(info, ltp_path=str(tmp_path / 'ltp'), n_workers=2, cache_dir=str(tmp_path / 'cache'))
+
+    same_path = dups[dups.kind == 'same path']
+    assert sorted(same_path.session) == [0, 1]
+    assert same_path.group.nunique() == 1
+    same_content = dups[dups.kind == 'same content']
+    assert sorted(same_content.data_file) == [a, a, copy]
+    assert same_content.group.nunique() == 1
+    assert (same_content.sha256.str.len() == 64).all()
+
+    # Three listings of one file's contents, of which two are submitted more than once, even though the second
+    # listing of a.bdf is in both groups
+    assert _extra_bytes(dups) == 2000
+    assert 'Duplicates: 2 groups of duplicate data files' in capsys.readouterr().out
+
+
+def test_shared_subject_files_are_not_reported(tmp_path):
+    ltp_path = tmp_path / 'ltp'
+    (ltp_path / 'SFR' / 'behavioral' / 'data').mkdir(parents=True)
+    shared = _write(ltp_path / 'SFR' / 'behavioral' / 'data' / 'beh_data__LTP001.json', b'{}')
+    dups = find_duplicate_files(_info([('LTP001', 0, shared), ('LTP001', 1, shared)], 'SFR'), ltp_path=str(ltp_path))
+    assert len(dups) == 0
+
+    # Unless the file is listed for more than one subject
+    dups = find_duplicate_files(_info([('LTP001', 0, shared), ('LTP002', 0, shared)], 'SFR'), ltp_path=str(ltp_path))
+    assert len(dups) == 2
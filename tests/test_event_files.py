@@ -0,0 +1,74 @@
+import io
+import json
+import pytest
+import event_files
+from event_files import scan_event_file, _iter_json
+
+# JSON documents that exercise chunk boundaries inside numbers, strings, keywords, and whitespace
+DOCUMENTS = [
+    [1.5, 2],
+    [1e5, 2],
+    [-1.25e-3, 10, 0, -0.5, 1E+2],
+    [{'subject': 'LTP001', 'session': 0, 'rt': 1234.5678}, {'subject': 'LTP001', 'session': 1, 'rt': 9e-7}],
+    [{'text': 'brackets ] } and "quotes", commas, and \\ backslashes', 'ok': True, 'none': None}],
+    [[1, [2, [3.25]]], {'nested': {'a': [1.0, 2.0]}}, 'café ☃', False],
+    {'subject': 'LTP002', 'session': 3.0, 'events': [1, 2.5]},
+    [],
+    {},
+]
+
+
+def _write(tmp_path, text, name='events.json'):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('doc', DOCUMENTS)
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7, 64])
+@pytest.mark.parametrize('indent', [None, 2])
+def test_iter_json_matches_json_loads(tmp_path, doc, chunk_size, indent):
+    path = _write(tmp_path, json.dumps(doc, indent=indent))
+    expected = list(doc.items()) if isinstance(doc, dict) else [(None, v) for v in doc]
+    assert list(_iter_json(path, chunk_size)) == expected
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1048576])
+def test_scan_event_file_counts_events(tmp_path, chunk_size):
+    events = [dict(subject='LTP001', session=s, value=i / 3.) for s in (0, 1) for i in range(50)]
+    path = _write(tmp_path, json.dumps(events))
+    result = scan_event_file(path, chunk_size=chunk_size)
+    assert result == dict(n_events=100, subjects=['LTP001'], sessions=['0', '1'], error=None)
+
+
+@pytest.mark.parametrize('text', ['[1.5, 2', '[{"subject": "A"}, {"subject": ', '[1, 2] 3', '[1 2]', '"text"'])
+@pytest.mark.parametrize('chunk_size', [1, 4, 1048576])
+def test_scan_event_file_reports_invalid_json(tmp_path, text, chunk_size):
+    result = scan_event_file(_write(tmp_path, text), chunk_size=chunk_size)
+    assert result['error'] is not None
+
+
+def test_scan_event_file_jsonl(tmp_path):
+    lines = [json.dumps(dict(subject='LTP001', session=2)) for _ in range(10)]
+    result = scan_event_file(_write(tmp_path, '\n'.join(lines) + '\n{"subject": ', 'events.jsonl'))
+    assert result['n_events'] == 10
+    assert result['error'] == 'Truncated or invalid JSON on line 11'
+
+
+def test_invalid_json_stops_reading(tmp_path, monkeypatch):
+    # A syntax error early in a large file is reported without reading the rest of the file
+    path = _write(tmp_path, '[{"subject": "A"}, {oops' + ' ' * 1000000 + ']')
+    n_read = []
+
+    class CountingFile(io.StringIO):
+        def read(self, size=-1):
+            text = super().read(size)
+            n_read.append(len(text))
+            return text
+
+    monkeypatch.setattr(event_files, 'MAX_EVENT_SIZE', 1000)
+    monkeypatch.setattr(event_files, 'open', lambda *args, **kwargs: CountingFile(open(path).read()), raising=False)
+    result = scan_event_file(path, chunk_size=100)
+    assert result['n_events'] == 1
+    assert result['error'] is not None
+    assert sum(n_read) < 10000
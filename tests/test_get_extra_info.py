@@ -0,0 +1,47 @@
+import random
+import datetime as dt
+import numpy as np
+import pandas as pd
+import pytest
+from get_extra_info import calculate_age_in_months, calculate_ages_in_months, get_extra_info
+
+
+def _random_dates(rng, n, start, end):
+    return [start + dt.timedelta(days=rng.randrange((end - start).days)) for _ in range(n)]
+
+
+def test_ages_match_scalar_calculation():
+    rng = random.Random(0)
+    births = _random_dates(rng, 5000, dt.date(1940, 1, 1), dt.date(2005, 1, 1))
+    sessions = _random_dates(rng, 5000, dt.date(2010, 1, 1), dt.date(2024, 1, 1))
+
+    # End-of-month and leap day birthdays, which relativedelta clamps to the end of shorter months
+    births += [dt.date(2000, 1, 31), dt.date(2000, 2, 29), dt.date(1999, 8, 31), dt.date(2000, 3, 30)]
+    sessions += [dt.date(2023, 2, 28), dt.date(2023, 2, 28), dt.date(2023, 9, 30), dt.date(2023, 3, 1)]
+
+    expected = [calculate_age_in_months(dict(year=s.year, month=s.month, day=s.day), b.year, b.month, b.day)
+                for s, b in zip(sessions, births)]
+    ages = calculate_ages_in_months(pd.to_datetime(pd.Series(sessions)), pd.to_datetime(pd.Series(births)))
+    np.testing.assert_array_equal(ages, expected)
+
+
+def test_get_extra_info(tmp_path):
+    path = tmp_path / 'extra_data.txt'
+    path.write_text('LTP001\t01/31/2000\t56.5\tAM\tNDAR_INVAA000001\n'
+                    'LTP002\t06/15/1990\t58\tAL\tNDAR_INVAA000002\n'
+                    'LTP001\t01/31/2001\t57\tAML\tNDAR_INVAA000003\n')  # Later entries replace earlier ones
+    info = pd.DataFrame(dict(subject=['LTP001', 'LTP002', 'LTP001'], session=[0, 0, 1],
+                             date=pd.to_datetime(['2023-03-01', '2023-03-01', '2023-04-15'])))
+    info = get_extra_info(info, str(path))
+    assert info.age_in_months.tolist() == [265, 392, 266]
+    assert info.cap_size.tolist() == ['AML', 'AL', 'AML']
+    assert info.subjectkey.tolist() == ['NDAR_INVAA000003', 'NDAR_INVAA000002', 'NDAR_INVAA000003']
+    assert 'dob' not in info.columns
+
+
+def test_get_extra_info_missing_subject(tmp_path):
+    path = tmp_path / 'extra_data.txt'
+    path.write_text('LTP001\t01/31/2000\t56.5\tAM\tNDAR_INVAA000001\n')
+    info = pd.DataFrame(dict(subject=['LTP001', 'LTP002'], date=pd.to_datetime(['2023-03-01', '2023-03-01'])))
+    with pytest.raises(KeyError, match='LTP002'):
+        get_extra_info(info, str(path))
@@ -0,0 +1,168 @@
+import os
+import errno
+import time
+import threading
+import pytest
+import pandas as pd
+import dir_index
+import get_filepaths as get_filepaths_module
+from cache import save_cached
+from get_info import EXP_DICT
+from get_filepaths import LAYOUTS, get_filepaths, resolve_session
+
+
+def test_every_experiment_has_a_layout():
+    assert set(EXP_DICT) <= set(LAYOUTS)
+
+
+def test_ltpFR_sessions_have_no_data_files(tmp_path):
+    filepaths, file_stats, _ = resolve_session('ltpFR', 'LTP001', 0, str(tmp_path / 'ltp'), str(tmp_path / 'protocols'))
+    assert filepaths == [''] * 8
+    assert file_stats == [None] * 8
+
+
+def _sfr_session(tmp_path, mtime_ns):
+    path = tmp_path / 'ltp' / 'SFR' / 'LTP001' / 'session_0' / 'session.json'
+    path.parent.mkdir(parents=True)
+    path.write_text('[]')
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    info = pd.DataFrame(dict(subject=['LTP001'], experiment=['SFR'], session=[0]))
+    return str(path), info
+
+
+def test_file_stats_keep_nanosecond_mtimes(tmp_path):
+    mtime_ns = 1690000000123456789  # Not exactly representable as a float
+    path, info = _sfr_session(tmp_path, mtime_ns)
+    info = get_filepaths(info, ltp_path=str(tmp_path / 'ltp'), protocols_path=str(tmp_path / 'protocols'))
+    assert info.data_file1[0] == path
+    assert info.data_file1_size[0] == 2
+    assert info.data_file1_mtime[0] == mtime_ns
+
+
+def test_old_cache_format_is_ignored(tmp_path):
+    path, info = _sfr_session(tmp_path, 1690000000123456789)
+    cache_dir = str(tmp_path / 'cache')
+    session = ('SFR', 'LTP001', 0, str(tmp_path / 'ltp'), str(tmp_path / 'protocols'))
+    save_cached(cache_dir, 'filepaths', {session: ([path, 'Session Log'] + [''] * 6, 2, {})})
+    info = get_filepaths(info, ltp_path=str(tmp_path / 'ltp'), protocols_path=str(tmp_path / 'protocols'),
+                         cache_dir=cache_dir)
+    assert info.data_file1_mtime[0] == 1690000000123456789
+
+
+
+def test_cached_sessions_get_current_file_stats(tmp_path, capsys):
+    path, info = _sfr_session(tmp_path, 1690000000123456789)
+    kwargs = dict(ltp_path=str(tmp_path / 'ltp'), protocols_path=str(tmp_path / 'protocols'),
+                  cache_dir=str(tmp_path / 'cache'))
+    get_filepaths(info.copy(), **kwargs)
+
+    # Rewriting the file in place leaves its directory's modification time unchanged
+    dir_mtime = os.stat(os.path.dirname(path)).st_mtime_ns
+    with open(path, 'a') as f:
+        f.write(' ' * 5000)
+    os.utime(path, ns=(1700000000000000001, 1700000000000000001))
+    assert os.stat(os.path.dirname(path)).st_mtime_ns == dir_mtime
+
+    capsys.readouterr()
+    refreshed = get_filepaths(info.copy(), **kwargs)
+    assert 'File path cache: 1 hits, 0 misses' in capsys.readouterr().out
+    assert refreshed.data_file1[0] == path
+    assert refreshed.data_file1_size[0] == 5002
+    assert refreshed.data_file1_mtime[0] == 1700000000000000001
+
+
+def test_cached_session_with_deleted_file_is_resolved_again(tmp_path, capsys):
+    path, info = _sfr_session(tmp_path, 1690000000123456789)
+    kwargs = dict(ltp_path=str(tmp_path / 'ltp'), protocols_path=str(tmp_path / 'protocols'),
+                  cache_dir=str(tmp_path / 'cache'))
+    cache = {('SFR', 'LTP001', 0, kwargs['ltp_path'], kwargs['protocols_path']):
+             ([path + '.old', 'Session Log'] + [''] * 6, [2, 1] + [None] * 6, {})}
+    save_cached(kwargs['cache_dir'], get_filepaths_module.CACHE_KEY, cache)
+    info = get_filepaths(info, **kwargs)
+    assert 'File path cache: 0 hits, 1 misses' in capsys.readouterr().out
+    assert info.data_file1[0] == path
+
+def _flaky_resolve(calls, hang, fail=()):
+    """
+    Stands in for resolve_session, hanging on the first call for the sessions in hang and raising an OSError on the
+    first call for the sessions in fail.
+    """
+    lock = threading.Lock()
+
+    def resolve(exp, subj, sess, *_):
+        with lock:
+            calls.append(sess)
+            first = calls.count(sess) == 1
+        if first and sess in hang:
+            threading.Event().wait(60)
+        if first and sess in fail:
+            raise OSError('Stale file handle')
+        return [str(sess)] + [''] * 7, [None] * 8, {}
+    return resolve
+
+
+def _resolve_in_threads(args, n_workers, timeout, retries):
+    names = ['%s %s session %s' % a for a in args]
+    return get_filepaths_module._call_in_threads(get_filepaths_module.resolve_session, args, names, n_workers, timeout,
+                                                 retries)
+
+
+def test_hung_session_is_retried_without_waiting_for_it(monkeypatch):
+    calls = []
+    monkeypatch.setattr(get_filepaths_module, 'resolve_session', _flaky_resolve(calls, hang={0, 1}, fail={2}))
+    args = [('SFR', 'LTP001', sess) for sess in range(4)]
+    t = time.monotonic()
+    results = _resolve_in_threads(args, n_workers=2, timeout=0.2, retries=1)
+    assert time.monotonic() - t < 5
+    assert [r[0][0] for r in results] == ['0', '1', '2', '3']
+    assert sorted(calls) == [0, 0, 1, 1, 2, 2, 3]
+
+
+def test_timeout_is_counted_from_task_start(monkeypatch):
+    # Sessions queued behind slow ones must not time out while waiting for a thread
+    monkeypatch.setattr(get_filepaths_module, 'resolve_session',
+                        lambda exp, subj, sess, *_: (time.sleep(0.15), ([''] * 8, [None] * 8, {}))[1])
+    args = [('SFR', 'LTP001', sess) for sess in range(6)]
+    assert len(_resolve_in_threads(args, n_workers=1, timeout=0.5, retries=0)) == 6
+
+
+def test_timeout_raises_after_last_retry(monkeypatch):
+    monkeypatch.setattr(get_filepaths_module, 'resolve_session', _flaky_resolve([], hang={0}))
+    with pytest.raises(TimeoutError):
+        _resolve_in_threads([('SFR', 'LTP001', 0)], n_workers=2, timeout=0.1, retries=0)
+
+
+def test_hung_directory_walk_is_retried(tmp_path, monkeypatch):
+    path, info = _sfr_session(tmp_path, 1690000000123456789)
+    scans = []
+    scan = dir_index._scan
+
+    def slow_scan(dirpath):
+        scans.append(dirpath)
+        if scans.count(dirpath) == 1 and dirpath.endswith('LTP001'):
+            threading.Event().wait(60)
+        return scan(dirpath)
+
+    monkeypatch.setattr(dir_index, '_scan', slow_scan)
+    t = time.monotonic()
+    info = get_filepaths(info, ltp_path=str(tmp_path / 'ltp'), protocols_path=str(tmp_path / 'protocols'), n_workers=4,
+                         timeout=0.5, retries=1)
+    assert time.monotonic() - t < 5
+    assert info.data_file1[0] == path
+
+
+def test_directory_walk_is_retried_after_stale_file_handle(tmp_path, monkeypatch, capsys):
+    path, info = _sfr_session(tmp_path, 1690000000123456789)
+    scandir, failed = os.scandir, []
+
+    def failing_scandir(dirpath):
+        if str(dirpath).endswith('LTP001') and len(failed) == 0:
+            failed.append(dirpath)
+            raise OSError(errno.ESTALE, 'Stale file handle', dirpath)
+        return scandir(dirpath)
+
+    monkeypatch.setattr(os, 'scandir', failing_scandir)
+    info = get_filepaths(info, ltp_path=str(tmp_path / 'ltp'), protocols_path=str(tmp_path / 'protocols'), retries=1)
+    assert info.data_file1[0] == path
+    assert 'Warning: Retrying %s after OSError' % os.path.normpath(str(tmp_path / 'ltp/SFR/LTP001')) in \
+        capsys.readouterr().out
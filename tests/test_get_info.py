@@ -0,0 +1,38 @@
+import datetime as dt
+import pytest
+from get_info import get_info, in_date_windows
+from synthetic_data import make_synthetic_tree
+
+WINDOWS = [(dt.date(2023, 3, 1), dt.date(2023, 4, 1)), (dt.date(2023, 6, 1), dt.date(2023, 8, 1))]
+
+
+@pytest.fixture(scope='module')
+def ltp_path(tmp_path_factory):
+    root = str(tmp_path_factory.mktemp('synthetic'))
+    ltp_path = make_synthetic_tree(root, scale=0.2, bdf_size=1024)['ltp_path']
+
+    # Add a session in the gap between the windows whose subject has no CMLDB subject info
+    with open('%s/SFR/cmldb_sess_info_SFR.txt' % ltp_path, 'a') as f:
+        f.write('LTP99999\t0\t2023\tMay\t1\t12:00\t13:00\tPENN\t7\t3\n')
+    return ltp_path
+
+
+def test_get_info_keeps_sessions_in_date_range(ltp_path):
+    start, end = dt.date(2023, 3, 1), dt.date(2023, 4, 1)
+    info = get_info(start, end, ltp_path=ltp_path)
+    assert len(info) > 0
+    assert info.date.between(str(start), str(end)).all()
+    assert info.subject.notna().all() and info.experiment_id.notna().all()
+
+
+def test_get_info_without_sessions(ltp_path):
+    assert get_info(dt.date(1990, 1, 1), dt.date(1990, 2, 1), ltp_path=ltp_path) is None
+
+
+def test_get_info_filters_windows_before_joining_subjects(ltp_path):
+    with pytest.raises(KeyError, match='LTP99999'):
+        get_info(WINDOWS[0][0], WINDOWS[-1][1], ltp_path=ltp_path)
+    info = get_info(WINDOWS[0][0], WINDOWS[-1][1], ltp_path=ltp_path, windows=WINDOWS)
+    assert 'LTP99999' not in set(info.subject)
+    assert in_date_windows(info.date, WINDOWS).all()
+    assert len(info) == len(get_info(*WINDOWS[0], ltp_path=ltp_path)) + len(get_info(*WINDOWS[1], ltp_path=ltp_path))
@@ -0,0 +1,30 @@
+import os
+from get_info import get_subj_info
+
+
+def _write(path, lines):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def test_get_subj_info(tmp_path, capsys):
+    ltp_path = str(tmp_path)
+    _write(os.path.join(ltp_path, 'ltpFR2/cmldb_subj_info_ltpFR2.txt'),
+           ['subject\tgender', 'LTP001\tM', 'LTP002\tF', 'LTP003\tF'])
+    _write(os.path.join(ltp_path, 'SFR/cmldb_subj_info_SFR.txt'),
+           ['subject\tgender', 'LTP001\tM', 'LTP003\tM'])
+    _write(os.path.join(ltp_path, 'SubjectInfo/subject_info.csv'),
+           ['snum,hand_throw,hand_toothbrush,hand_scissors,hand_write', 'LTP001;LTP002,1,2,3,4', 'LTP004,5,5,5,5'])
+    info = get_subj_info(ltp_path)
+
+    # Each subject is listed once, and subjects who share a questionnaire response both receive it
+    assert sorted(info.index) == ['LTP001', 'LTP002', 'LTP003']
+    assert info.loc['LTP001', 'hand_write'] == info.loc['LTP002', 'hand_write'] == 4
+    assert info.loc[['LTP001', 'LTP002'], 'gender'].tolist() == ['M', 'F']
+    assert info.loc['LTP003'].drop('gender').isna().all()
+
+    # Only the subject whose gender differs between experiments is reported
+    out = capsys.readouterr().out
+    assert 'Warning: Conflicting CMLDB subject info for subjects: LTP003' in out
+    assert 'LTP001' not in out
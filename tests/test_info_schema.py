@@ -0,0 +1,40 @@
+import pandas as pd
+from info_schema import set_info_dtypes
+
+
+def test_set_info_dtypes():
+    df = pd.DataFrame(dict(subject=['LTP001', 'LTP002'], session=[0, 1], date=['2023-03-01', '2023-03-02'],
+                           alertness=[3.0, None], notes=['a', 'b']))
+    df = set_info_dtypes(df)
+    assert str(df.subject.dtype) == 'category'
+    assert str(df.session.dtype) == 'Int16'
+    assert str(df.alertness.dtype) == 'Int8'
+    assert df.alertness.isna().tolist() == [False, True]
+    assert df.date.dtype.kind == 'M'
+    assert df.notes.tolist() == ['a', 'b']  # Not listed in INFO_DTYPES
+
+
+def test_set_info_dtypes_only_converts_given_columns():
+    df = set_info_dtypes(pd.DataFrame(dict(session=[0], alertness=[3])), cols=['session'])
+    assert str(df.session.dtype) == 'Int16'
+    assert df.alertness.dtype == 'int64'
+
+
+def test_unreadable_integers_are_left_empty(capsys):
+    df = pd.DataFrame(dict(hand_write=['1', '2.5', 'right', '', None, '300', '-2'], alertness=[1.5, 2, 3, 4, 5, 6, 7]))
+    df = set_info_dtypes(df)
+    assert str(df.hand_write.dtype) == 'Int8'
+    assert df.hand_write.tolist()[:1] + df.hand_write.tolist()[-1:] == [1, -2]
+    assert df.hand_write.isna().tolist() == [False, True, True, True, True, True, False]
+    assert df.alertness.isna().tolist() == [True] + [False] * 6
+
+    out = capsys.readouterr().out
+    assert 'Warning: 3 values of hand_write are not whole numbers from -128 to 127 and were left empty: ' \
+        '2.5, right, 300' in out
+    assert 'Warning: 1 values of alertness' in out
+
+
+def test_large_integers_keep_their_precision():
+    mtime = 1690000000123456789
+    df = set_info_dtypes(pd.DataFrame(dict(data_file1_mtime=[mtime, None]), dtype=object))
+    assert df.data_file1_mtime[0] == mtime
@@ -0,0 +1,60 @@
+import os
+import threading
+import instrumentation
+from instrumentation import count_fs_calls, measure_stage, new_report, patch_fs_calls
+
+
+def test_count_fs_calls(tmp_path):
+    (tmp_path / 'a.txt').write_text('a')
+    with count_fs_calls() as counts:
+        os.listdir(str(tmp_path))
+        os.path.exists(str(tmp_path / 'a.txt'))
+        with open(str(tmp_path / 'a.txt')) as f:
+            f.read()
+    assert counts['listdir'] == 1
+    assert counts['exists'] == 1
+    assert counts['stat'] >= 1
+    assert counts['open'] == 1
+
+
+def test_patches_are_removed_when_contexts_exit_out_of_order():
+    originals = (os.stat, os.scandir, os.listdir, os.path.exists)
+    first, second = patch_fs_calls(lambda kind: None), patch_fs_calls(lambda kind: None)
+    first.__enter__()
+    second.__enter__()
+    first.__exit__(None, None, None)
+    assert os.stat is not originals[0]  # Still patched for the second hook
+    second.__exit__(None, None, None)
+    assert (os.stat, os.scandir, os.listdir, os.path.exists) == originals
+    assert instrumentation._hooks == ()
+
+
+def test_count_fs_calls_from_several_threads(tmp_path):
+    originals = (os.stat, os.listdir)
+    barrier = threading.Barrier(4)
+    counts = []
+
+    def count():
+        with count_fs_calls() as c:
+            barrier.wait()
+            os.listdir(str(tmp_path))
+            barrier.wait()
+        counts.append(c['listdir'])
+
+    threads = [threading.Thread(target=count) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert counts == [4, 4, 4, 4]  # Every hook sees the calls of every thread
+    assert (os.stat, os.listdir) == originals
+
+
+def test_measure_stage_adds_up_repeated_runs():
+    report = new_report()
+    for _ in range(2):
+        with measure_stage(report, 'stage', rows_in=3) as s:
+            s['rows_out'] = 2
+    stage, = report['stages']
+    assert (stage['runs'], stage['rows_in'], stage['rows_out']) == (2, 6, 4)
+    assert stage['peak_memory_growth_mb'] is None or stage['peak_memory_growth_mb'] >= 0
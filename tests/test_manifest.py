@@ -0,0 +1,85 @@
+import pandas as pd
+from get_filepaths import FILEPATH_COLS, FILE_STAT_COLS, get_filepaths
+from info_schema import set_info_dtypes
+from manifest import find_changed_sessions, load_manifest, record_submission
+
+MTIME = 1690000000123456789
+
+
+def _info(sessions):
+    """
+    Builds a session info data frame from a list of (subject, session, [(path, size, mtime), ...]) tuples.
+    """
+    rows = []
+    for subj, sess, files in sessions:
+        row = dict(subject=subj, experiment='ltpFR2', session=sess)
+        row.update(dict((col, '') for col in FILEPATH_COLS))
+        row.update(dict((col, None) for col in FILE_STAT_COLS))
+        for n, (path, size, mtime) in enumerate(files):
+            row[FILEPATH_COLS[2 * n]], row[FILEPATH_COLS[2 * n + 1]] = path, 'EEG'
+            row[FILE_STAT_COLS[2 * n]], row[FILE_STAT_COLS[2 * n + 1]] = size, mtime
+        rows.append(row)
+    return set_info_dtypes(pd.DataFrame(rows).astype(dict((col, object) for col in FILE_STAT_COLS)))
+
+
+def test_load_missing_manifest(tmp_path):
+    assert len(load_manifest(str(tmp_path / 'manifest.csv'))) == 0
+
+
+def test_unchanged_sessions_are_skipped(tmp_path):
+    path = str(tmp_path / 'manifest.csv')
+    info = _info([('LTP001', 0, [('/a.bdf', 10, MTIME), ('/a.json', 2, MTIME + 1)]),
+                  ('LTP001', 1, [('/b.bdf', 10, MTIME), ('/missing.json', None, None)])])
+    assert find_changed_sessions(info, load_manifest(path)).tolist() == [True, True]
+    record_submission(path, info)
+    assert find_changed_sessions(info, load_manifest(path)).tolist() == [False, False]
+
+
+def test_changed_and_new_sessions_are_included(tmp_path):
+    path = str(tmp_path / 'manifest.csv')
+    record_submission(path, _info([('LTP001', 0, [('/a.bdf', 10, MTIME)]), ('LTP001', 1, [('/b.bdf', 10, MTIME)]),
+                                   ('LTP001', 2, [('/c.bdf', 10, MTIME)])]))
+    info = _info([('LTP001', 0, [('/a.bdf', 10, MTIME)]),
+                  ('LTP001', 1, [('/b.bdf', 10, MTIME + 1)]),  # Modified by a nanosecond
+                  ('LTP001', 2, [('/c.bdf', 10, MTIME), ('/c.json', 2, MTIME)]),  # File added
+                  ('LTP002', 0, [('/d.bdf', 10, MTIME)])])  # Never submitted
+    assert find_changed_sessions(info, load_manifest(path)).tolist() == [False, True, True, True]
+
+
+def test_sessions_are_compared_with_their_latest_submission(tmp_path):
+    path = str(tmp_path / 'manifest.csv')
+    record_submission(path, _info([('LTP001', 0, [('/a.bdf', 10, MTIME)])]))
+    record_submission(path, _info([('LTP001', 0, [('/a.bdf', 20, MTIME)])]))
+    manifest = load_manifest(path)
+    assert manifest.submission.tolist() == [1, 2]
+    assert find_changed_sessions(_info([('LTP001', 0, [('/a.bdf', 20, MTIME)])]), manifest).tolist() == [False]
+    assert find_changed_sessions(_info([('LTP001', 0, [('/a.bdf', 10, MTIME)])]), manifest).tolist() == [True]
+
+
+def test_sessions_without_files_are_recorded(tmp_path):
+    path = str(tmp_path / 'manifest.csv')
+    info = _info([('LTP001', 0, []), ('LTP001', 1, [('/b.bdf', 10, MTIME)])])
+    manifest = record_submission(path, info)
+    assert manifest.data_file.tolist() == ['/b.bdf', '']
+    assert find_changed_sessions(info, load_manifest(path)).tolist() == [False, False]
+    assert find_changed_sessions(_info([('LTP001', 0, [('/a.bdf', 10, MTIME)])]), load_manifest(path)).tolist() == \
+        [True]
+
+
+def test_file_rewritten_in_place_is_noticed_through_the_file_path_cache(tmp_path):
+    path = tmp_path / 'protocols' / 'subjects' / 'LTP001' / 'experiments' / 'ltpFR2' / 'sessions' / '0' / 'ephys' / \
+        'current_processed' / 'LTP001_0.bdf'
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b'x' * 100)
+    (tmp_path / 'ltp' / 'ltpFR2' / 'LTP001' / 'session_0').mkdir(parents=True)
+    (tmp_path / 'ltp' / 'ltpFR2' / 'LTP001' / 'session_0' / 'session.log').write_text('')
+    info = pd.DataFrame(dict(subject=['LTP001'], experiment=['ltpFR2'], session=[0]))
+    kwargs = dict(ltp_path=str(tmp_path / 'ltp'), protocols_path=str(tmp_path / 'protocols'),
+                  cache_dir=str(tmp_path / 'cache'))
+    manifest_path = str(tmp_path / 'manifest.csv')
+    record_submission(manifest_path, get_filepaths(info.copy(), **kwargs))
+
+    # Re-processing the recording rewrites it without changing its directory, so the session is taken from the cache
+    with open(str(path), 'ab') as f:
+        f.write(b'x' * 5000)
+    assert find_changed_sessions(get_filepaths(info.copy(), **kwargs), load_manifest(manifest_path)).tolist() == [True]
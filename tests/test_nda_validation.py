@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+from nda_validation import check_data_files, load_definitions, print_problems, validate_spreadsheet
+
+DEFINITIONS = '''ElementName,DataType,Size,Required,ElementDescription,ValueRange,Notes,Aliases
+subjectkey,GUID,12,Required,desc,,,
+interview_date,Date,,Required,desc,,,
+interview_age,Integer,,Required,desc,0::1260,,
+gender,String,20,Required,desc,M;F; O; NR,,
+handedness,Integer,,Recommended,desc,1::3;999,,
+ofc,Float,,Recommended,desc,,,
+data_file1,File,,Conditional,desc,,,
+'''
+
+
+@pytest.fixture
+def definitions(tmp_path):
+    path = tmp_path / 'eeg_details01_definitions.csv'
+    path.write_text(DEFINITIONS)
+    return load_definitions(str(path))
+
+
+def _problems(problems):
+    # Problems with whole columns have no row, and are listed as row 0
+    rows = [0 if pd.isna(r) else int(r) for r in problems.row]
+    return sorted(zip(rows, problems.column, problems.problem))
+
+
+def test_load_definitions(definitions):
+    assert definitions.loc['subjectkey', 'size'] == 12
+    assert pd.isna(definitions.loc['ofc', 'size'])
+    assert definitions.loc['gender', 'value_range'] == 'M;F; O; NR'
+    assert definitions.loc['data_file1', 'value_range'] == ''
+
+
+def test_valid_spreadsheet(definitions):
+    df = pd.DataFrame(dict(subjectkey=['NDAR_INV0001', 'NDAR_INV0002'], interview_date=['03/01/2023', '12/31/2022'],
+                           interview_age=[300, 1260], gender=['M', 'NR'], handedness=[999, np.nan],
+                           ofc=['56.5', ''], data_file1=['/a.bdf', '']))
+    assert len(validate_spreadsheet(df, definitions, 'eeg_details01')) == 0
+
+
+def test_invalid_values(definitions):
+    df = pd.DataFrame(dict(subjectkey=['NDAR_INV0001', 'NDAR_INV00000002', ''],
+                           interview_date=['03/01/2023', '2023-03-01', '02/30/2023'],
+                           interview_age=[300.5, 1300, np.nan], gender=['M', 'X', 'O'], handedness=[4, 2, 999],
+                           ofc=['56.5', 'large', '58'], extra=['', '', '']))
+    problems = validate_spreadsheet(df, definitions, 'eeg_details01', first_row=11)
+    assert (problems.spreadsheet == 'eeg_details01').all()
+    assert _problems(problems) == sorted([
+        (0, 'extra', 'not defined in the data dictionary'),
+        (11, 'interview_age', 'not an integer'),
+        (11, 'handedness', 'outside value range 1::3;999'),
+        (12, 'subjectkey', 'longer than 12 characters'),
+        (12, 'interview_date', 'not a date (MM/DD/YYYY)'),
+        (12, 'interview_age', 'outside value range 0::1260'),
+        (12, 'gender', 'outside value range M;F; O; NR'),
+        (12, 'ofc', 'not a number'),
+        (13, 'subjectkey', 'required value is missing'),
+        (13, 'interview_date', 'not a date (MM/DD/YYYY)'),
+        (13, 'interview_age', 'required value is missing'),
+    ])
+    assert sorted(problems.loc[problems.column == 'interview_age', 'value']) == ['', '1300.0', '300.5']
+
+
+def test_missing_required_column(definitions):
+    df = pd.DataFrame(dict(subjectkey=['NDAR_INV0001'], interview_date=['03/01/2023'], interview_age=[300]))
+    assert _problems(validate_spreadsheet(df, definitions, 'eeg_details01')) == [
+        (0, 'gender', 'required column is missing')]
+
+
+def test_check_data_files(capsys):
+    info = pd.DataFrame(dict(data_file1_size=pd.array([10, None, None], dtype='Int64'),
+                             data_file2_size=pd.array([None, None, 5], dtype='Int64')), index=[5, 6, 7])
+    esf = pd.DataFrame(dict(data_file1=['/a.bdf', '/missing.bdf', ''], data_file2=['', '', '/c.json']),
+                       index=[5, 6, 7])
+    problems = check_data_files(esf, info, first_row=1)
+    assert _problems(problems) == [(2, 'data_file1', 'file does not exist')]
+
+    print_problems(problems)
+    out = capsys.readouterr().out
+    assert 'Validation problem: eeg_sub_files01 column data_file1 file does not exist in 1 rows (2)' in out
+    print_problems(problems.iloc[:0])
+    assert 'Validation: No problems found' in capsys.readouterr().out
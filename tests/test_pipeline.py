@@ -0,0 +1,96 @@
+import os
+import csv
+import datetime as dt
+import pandas as pd
+import pytest
+from get_info import EXP_DICT, MONTH_DICT, get_info
+from get_extra_info import calculate_age_in_months, get_extra_info
+from get_filepaths import get_filepaths
+from fill_info import fill_info
+from write_info import write_info
+from synthetic_data import make_synthetic_tree
+
+START, END = dt.date(2023, 3, 1), dt.date(2023, 8, 1)
+
+
+@pytest.fixture(scope='module')
+def paths(tmp_path_factory):
+    return make_synthetic_tree(str(tmp_path_factory.mktemp('synthetic')), scale=0.2, bdf_size=1024)
+
+
+def _run(paths, out_dir, chunk_size=None, **kwargs):
+    """
+    Runs the pipeline stages that build the spreadsheets, writing them in chunks of sessions if a chunk size is given,
+    and returns the paths of the written spreadsheets.
+    """
+    ed = pd.read_csv(paths['eeg_details_path'], header=1, nrows=0)
+    esf = pd.read_csv(paths['eeg_sub_files_path'], header=1, nrows=0)
+    ed_path, esf_path = os.path.join(out_dir, 'eeg_details01.csv'), os.path.join(out_dir, 'eeg_sub_files01.csv')
+    info = get_info(START, END, ltp_path=paths['ltp_path'])
+    chunk_size = len(info) if chunk_size is None else chunk_size
+    for n, i in enumerate(range(0, len(info), chunk_size)):
+        chunk = get_extra_info(info.iloc[i:i + chunk_size], paths['extra_info_path'])
+        chunk = get_filepaths(chunk, ltp_path=paths['ltp_path'], protocols_path=paths['protocols_path'], **kwargs)
+        ed_filled, esf_filled = fill_info(ed, esf, chunk)
+        write_info(ed_filled, ed_path, ed.columns, esf_filled, esf_path, esf.columns, append=n > 0)
+    return ed_path, esf_path
+
+
+def _expected_sessions(ltp_path):
+    """
+    Reads every session in the date range straight from the CMLDB session info files, without the pipeline's code.
+    """
+    sessions = {}
+    for exp in os.listdir(ltp_path):
+        path = os.path.join(ltp_path, exp, 'cmldb_sess_info_%s.txt' % exp)
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            for row in csv.DictReader(f, delimiter='\t'):
+                date = dt.date(int(row['year']), MONTH_DICT[row['month']], int(row['day']))
+                if START <= date <= END:
+                    sessions[(row['subject'], exp, int(row['session']))] = date
+    return sessions
+
+
+def test_spreadsheets_match_the_tree(paths, tmp_path):
+    ed_path, esf_path = _run(paths, str(tmp_path))
+    expected = _expected_sessions(paths['ltp_path'])
+    with open(paths['extra_info_path']) as f:
+        births = dict((line.split('\t')[0], dt.datetime.strptime(line.split('\t')[1], '%m/%d/%Y').date()) for line in f)
+
+    ed = pd.read_csv(ed_path, header=1, dtype=dict(src_subject_id=str))
+    esf = pd.read_csv(esf_path, header=1, dtype=dict(src_subject_id=str))
+    assert len(ed) == len(esf) == len(expected)
+    assert ed.columns.tolist() == pd.read_csv(paths['eeg_details_path'], header=1, nrows=0).columns.tolist()
+    assert (ed[['src_subject_id', 'visit']].to_numpy() == esf[['src_subject_id', 'visit']].to_numpy()).all()
+    with open(ed_path) as f:
+        assert f.readline().startswith('eeg_details,1')
+
+    # Every session is listed once (experiments are told apart by ID, which SFR and FR1_scalp share), with its date and
+    # age, and every listed data file exists
+    expected = dict(((subj, EXP_DICT[exp], sess), date) for (subj, exp, sess), date in expected.items())
+    keys = list(zip(esf.src_subject_id, esf.experiment_id, esf.visit))
+    assert sorted(keys) == sorted(expected)
+    for key, date, age in zip(keys, ed.interview_date, ed.interview_age):
+        d, b = expected[key], births[key[0]]
+        assert date == d.strftime('%m/%d/%Y')
+        assert age == calculate_age_in_months(dict(year=d.year, month=d.month, day=d.day), b.year, b.month, b.day)
+    for n in range(1, 5):
+        listed = esf['data_file%s' % n].dropna()
+        assert all(os.path.isfile(p) for p in listed)
+        assert esf.loc[listed.index, 'data_file%s_type' % n].notna().all()
+    assert esf.data_file1.notna().sum() > 0
+
+
+def test_spreadsheets_do_not_depend_on_how_they_are_built(paths, tmp_path):
+    reference = _run(paths, str(tmp_path))
+    cache_dir = str(tmp_path / 'cache')
+    for name, kwargs in [('parallel', dict(n_workers=4, timeout=60, retries=1)),
+                         ('cached', dict(cache_dir=cache_dir)),
+                         ('from_cache', dict(cache_dir=cache_dir)),
+                         ('chunked', dict(chunk_size=7, n_workers=2))]:
+        (tmp_path / name).mkdir()
+        for ref, path in zip(reference, _run(paths, str(tmp_path / name), **kwargs)):
+            with open(ref, 'rb') as f_ref, open(path, 'rb') as f:
+                assert f.read() == f_ref.read(), name
@@ -0,0 +1,65 @@
+import os
+import bz2
+import pandas as pd
+from get_filepaths import FILEPATH_COLS, FILE_STAT_COLS
+from info_schema import set_info_dtypes
+from staging import stage_files
+
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    st = os.stat(str(path))
+    return str(path), st.st_size, st.st_mtime_ns
+
+
+def _info(sessions):
+    """
+    Builds a session info data frame from a list of (subject, session, [(path, size, mtime), ...]) tuples.
+    """
+    rows = []
+    for subj, sess, files in sessions:
+        row = dict(subject=subj, experiment='ltpFR2', session=sess)
+        row.update(dict((col, '') for col in FILEPATH_COLS))
+        row.update(dict((col, None) for col in FILE_STAT_COLS))
+        for n, (path, size, mtime) in enumerate(files):
+            row[FILEPATH_COLS[2 * n]], row[FILEPATH_COLS[2 * n + 1]] = path, 'EEG'
+            row[FILE_STAT_COLS[2 * n]], row[FILE_STAT_COLS[2 * n + 1]] = size, mtime
+        rows.append(row)
+    return set_info_dtypes(pd.DataFrame(rows).astype(dict((col, object) for col in FILE_STAT_COLS)))
+
+
+def test_stage_files(tmp_path, capsys):
+    src = tmp_path / 'ltp'
+    bdf = _write(src / 's0' / 'LTP001_0.bdf', b'bdf' * 100)
+    bz = _write(src / 's0' / 'LTP001_0b.bdf.bz2', bz2.compress(b'compressed' * 100))
+    log1 = _write(src / 's0' / 'a' / 'session.log', b'log 1')
+    log2 = _write(src / 's0' / 'b' / 'session.log', b'log 2')  # Same name as another file of the session
+    info = _info([('LTP001', 0, [bdf, bz, log1, log2])])
+    staging_dir = str(tmp_path / 'stage')
+
+    staged = stage_files(info, staging_dir, n_workers=2, n_processes=1)
+    sess_dir = os.path.join(staging_dir, 'ltpFR2', 'LTP001', 'session_0')
+    assert staged.loc[0, list(FILEPATH_COLS[::2])].tolist() == [
+        os.path.join(sess_dir, name) for name in ('LTP001_0.bdf', 'LTP001_0b.bdf', 'file3_session.log',
+                                                  'file4_session.log')]
+    with open(staged.data_file2[0], 'rb') as f:
+        assert f.read() == b'compressed' * 100
+    assert staged.data_file2_size[0] == 1000
+    for n, (_, size, mtime) in enumerate((bdf, bz, log1, log2)):
+        path = staged[FILEPATH_COLS[2 * n]][0]
+        assert os.stat(path).st_mtime_ns == mtime == staged[FILE_STAT_COLS[2 * n + 1]][0]
+    assert sorted(os.listdir(sess_dir)) == ['LTP001_0.bdf', 'LTP001_0b.bdf', 'file3_session.log', 'file4_session.log']
+    assert info.data_file1[0] == bdf[0]  # The original data frame is left unchanged
+    assert 'Staged 4 files' in capsys.readouterr().out
+
+    # A second run only stages files that were replaced since the first (staged copies may be hardlinks, so the file is
+    # replaced rather than changed in place)
+    _write(src / 's0' / 'a' / 'new.log', b'log 1, changed')
+    os.utime(str(src / 's0' / 'a' / 'new.log'), ns=(log1[2] + 10 ** 9, log1[2] + 10 ** 9))
+    os.replace(str(src / 's0' / 'a' / 'new.log'), log1[0])
+    changed = (log1[0], 14, log1[2] + 10 ** 9)
+    staged = stage_files(_info([('LTP001', 0, [bdf, bz, changed, log2])]), staging_dir)
+    assert 'Staged 1 files' in capsys.readouterr().out
+    with open(staged.data_file3[0], 'rb') as f:
+        assert f.read() == b'log 1, changed'
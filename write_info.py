@@ -1,4 +1,8 @@
-def write_info(ed, eeg_details_path, ed_col_order, esf, eeg_sub_files_path, esf_col_order):
+import os
+import sys
+
+
+def write_info(ed, eeg_details_path, ed_col_order, esf, eeg_sub_files_path, esf_col_order, append=False):
     """
     Writes the eeg_details01.csv and eeg_sub_files01.csv files using the information in the provided data frames.
 
@@ -8,22 +12,55 @@ def write_info(ed, eeg_details_path, ed_col_order, esf, eeg_sub_files_path, esf_
     :param esf: A data frame containing the complete eeg_sub_files01 information.
     :param eeg_sub_files_path: The path at which to save the eeg_sub_files01 spreadsheet
     :param esf_col_order: A list containing the proper ordering of the eeg_sub_files01 columns.
+    :param append: If True, add the rows to the end of spreadsheets written by an earlier call (Default=False).
     :return: None
     """
-    # Write data frame to spreadsheet and add eeg_details header back on
-    ed.to_csv(eeg_details_path, index=False, columns=ed_col_order)
-    with open(eeg_details_path, 'r+') as f:
-        s = f.readlines()
-        top_header = 'eeg_details,1' + ',' * (s[1].count(',') - 1) + '\n'
-        s.insert(0, top_header)
-        f.seek(0)
-        f.writelines(s)
-
-    # Write data frame to spreadsheet and add eeg_sub_files header back on
-    esf.to_csv(eeg_sub_files_path, index=False, columns=esf_col_order)
-    with open(eeg_sub_files_path, 'r+') as f:
-        s = f.readlines()
-        top_header = 'eeg_sub_files,1' + ',' * (s[1].count(',') - 1) + '\n'
-        s.insert(0, top_header)
-        f.seek(0)
-        f.writelines(s)
+    write_nda_csv(ed, eeg_details_path, ed_col_order, 'eeg_details', append=append)
+    write_nda_csv(esf, eeg_sub_files_path, esf_col_order, 'eeg_sub_files', append=append)
+
+
+def write_nda_csv(df, path_or_buf, col_order, short_name, version=1, append=False):
+    """
+    Writes a data frame as an NDA data structure spreadsheet: a top header line naming the data structure and its
+    version (e.g. "eeg_details,1"), followed by the column headers and data rows. Everything is written in a single
+    pass. When writing to a path, the data is first written to a temporary file in the same directory and then moved
+    into place, so the spreadsheet is never left partially written.
+
+    In append mode, only the data rows are written, at the end of a spreadsheet started by an earlier call. This allows
+    a spreadsheet to be written in chunks; rows appended to a path are written to the file in place.
+
+    :param df: A data frame containing the complete spreadsheet information (or the next chunk of it, when appending).
+    :param path_or_buf: The path at which to save the spreadsheet, an open file-like object, or '-' for stdout.
+    :param col_order: A list containing the proper ordering of the spreadsheet's columns.
+    :param short_name: The NDA short name of the data structure (e.g. 'eeg_details').
+    :param version: The version number of the data structure (Default=1).
+    :param append: If True, write only the data rows, after any existing content (Default=False).
+    :return: None
+    """
+    if path_or_buf == '-':
+        _write_nda_csv(df, sys.stdout, col_order, short_name, version, append)
+    elif hasattr(path_or_buf, 'write'):
+        _write_nda_csv(df, path_or_buf, col_order, short_name, version, append)
+    elif append:
+        with open(path_or_buf, 'a', newline='') as f:
+            _write_nda_csv(df, f, col_order, short_name, version, append)
+    else:
+        tmp_path = path_or_buf + '.tmp'
+        try:
+            with open(tmp_path, 'w', newline='') as f:
+                _write_nda_csv(df, f, col_order, short_name, version, append)
+            os.replace(tmp_path, path_or_buf)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def _write_nda_csv(df, f, col_order, short_name, version, append):
+    """
+    Writes the top header line, column headers, and data rows of an NDA spreadsheet to an open file, or only the data
+    rows when appending.
+    """
+    if not append:
+        top_header = '%s,%s' % (short_name, version) + ',' * (len(col_order) - 2) + '\n'
+        f.write(top_header)
+    df.to_csv(f, index=False, columns=col_order, header=not append)